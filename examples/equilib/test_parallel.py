@@ -0,0 +1,45 @@
+# Include PyFEM libraries
+from pyfem import *
+import multiprocessing
+
+# Compression of an elastic block using serial and parallel element loops.
+# Reports the speedup of the element loops against the serial path.
+
+def solve_block(nprocs):
+    block = Block3D()
+    block.make_box([0,0,0], [1,1,0.5])
+    block.set_divisions(10,10,5)
+
+    mesh = Mesh()
+    mesh.add_blocks(block)
+    mesh.generate()
+
+    domain = Domain()
+    domain.load_mesh(mesh)
+    domain.elems.set_elem_model(EqElasticSolid(E=100.0, nu=0.25))
+    domain.elems.set_state(sxx=0.0, syy=0.0, szz=0.0)
+
+    domain.nodes.sub(z=0.0).set_bc(ux=0, uy=0, uz=0)
+    domain.nodes.sub(z=0.5).set_bc(uz=-0.033)
+    domain.nodes.sub(x=[0.0, 1.0]).set_bc(ux=0, uy=0)
+    domain.nodes.sub(y=[0.0, 1.0]).set_bc(ux=0, uy=0)
+
+    domain.set_solver(SolverEq())
+    domain.solver.set_verbose(False)
+    domain.solver.set_parallel(nprocs)
+    domain.solver.set_incs(4)
+    domain.solver.set_scheme("NR")
+    domain.solver.solve()
+
+    stats = domain.solver.get_elem_loop_stats()
+    U = array([ n.keys["uz"].U for n in domain.nodes ])
+    return U, stats["stiff_time"] + stats["update_time"]
+
+U1, t1 = solve_block(1)
+print "serial element loops: %.3fs" % t1
+
+nprocs = multiprocessing.cpu_count()
+for n in sorted(set([2, max(2, nprocs)])):
+    U, t = solve_block(n)
+    print "%d procs element loops: %.3fs  speedup: %.2f" % (n, t, t1/t)
+    assert (U == U1).all()
@@ -36,5 +36,5 @@ dom.nodes.sub(x=1.5).sub(y=3.5).set_bc(fy=-load)
 # Setting solver 
 solver = SolverEq(dom, scheme="NR")
 #solver.solve()
-solver.solve(to_limit=True)
+solver.solve(to_limit=True, write=True)
 
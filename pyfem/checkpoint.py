@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+import numpy
+
+CHECKPOINT_VERSION = 1
+
+def write_checkpoint(solver, path):
+    """ Writes the state of a staged analysis to a NumPy .npz file: solver
+    counters, dof values and boundary conditions, element activation flags
+    and the state variables of all ips, taken from the IpStateStore arrays.
+    The mesh is not written; a checkpoint is restored by read_checkpoint()
+    into a solver whose domain has the same nodes, elements and models.
+    """
+    nodes = solver.nodes
+    elems = solver.elems
+    dofs  = [ dof for node in nodes for dof in node.dofs ]
+
+    solver.bind_ip_states()
+    if solver.unbound_models:
+        raise Exception("write_checkpoint: Material model without state variables: %s" % solver.unbound_models[0].__class__.__name__)
+
+    data = {}
+    data["version"]  = numpy.array(CHECKPOINT_VERSION)
+    data["counters"] = numpy.array([solver.stage, solver.inc])
+    if isinstance(solver.time, float):
+        data["time"] = numpy.array(solver.time)
+
+    # Nodes and dofs
+    data["X"]        = numpy.array([ node.X for node in nodes ], dtype=float).reshape(len(nodes), 3)
+    data["n_shares"] = numpy.array([ node.n_shares for node in nodes ], dtype=int)
+    data["node_ndofs"] = numpy.array([ len(node.dofs) for node in nodes ], dtype=int)
+    data["dof_keys"] = numpy.array([ dof.strU for dof in dofs ], dtype="S8")
+    data["U"]        = numpy.array([ dof.U    for dof in dofs ], dtype=float)
+    data["F"]        = numpy.array([ dof.F    for dof in dofs ], dtype=float)
+    data["bryU"]     = numpy.array([ dof.bryU for dof in dofs ], dtype=float)
+    data["bryF"]     = numpy.array([ dof.bryF for dof in dofs ], dtype=float)
+    data["prescU"]   = numpy.array([ dof.prescU for dof in dofs ], dtype=bool)
+
+    # Elements
+    data["active"] = numpy.array([ bool(e.elem_model.is_active) for e in elems ], dtype=bool)
+
+    # Ip states
+    stores = solver.ip_state_stores
+    data["ip_models"] = numpy.array([ store.models[0].__class__.__name__ for store in stores ], dtype="S64")
+    data["ip_counts"] = numpy.array([ store.nips for store in stores ], dtype=int)
+    for k, store in enumerate(stores):
+        for name, arr in store.arrays.iteritems():
+            data["ip%d.%s" % (k, name)] = numpy.asarray(arr)
+        data["ip%d.ivs" % k] = store.ivs
+
+    f = open(path, "wb")
+    numpy.savez(f, **data)
+    f.close()
+
+
+def read_checkpoint(solver, path):
+    """ Restores the state saved by write_checkpoint(). Raises an exception
+    if the file version or the sizes of the domain do not match.
+    """
+    data = numpy.load(path)
+    try:
+        version = int(data["version"])
+        if version > CHECKPOINT_VERSION:
+            raise Exception("read_checkpoint: Unsupported checkpoint version %d" % version)
+
+        nodes = solver.nodes
+        elems = solver.elems
+        dofs  = [ dof for node in nodes for dof in node.dofs ]
+
+        # Nodes and dofs
+        if len(data["n_shares"]) != len(nodes) or len(data["active"]) != len(elems):
+            raise Exception("read_checkpoint: Number of nodes or elements does not match the domain")
+        if (data["node_ndofs"] != [ len(node.dofs) for node in nodes ]).any() or \
+           (data["dof_keys"] != numpy.array([ dof.strU for dof in dofs ], dtype="S8")).any():
+            raise Exception("read_checkpoint: Degrees of freedom do not match the domain")
+        X = numpy.array([ node.X for node in nodes ], dtype=float).reshape(len(nodes), 3)
+        if not numpy.allclose(X, data["X"]):
+            raise Exception("read_checkpoint: Node coordinates do not match the domain")
+
+        U, F, bryU, bryF, prescU = [ data[key].tolist() for key in ("U", "F", "bryU", "bryF", "prescU") ]
+        for i, dof in enumerate(dofs):
+            dof.U      = U[i]
+            dof.F      = F[i]
+            dof.bryU   = bryU[i]
+            dof.bryF   = bryF[i]
+            dof.prescU = prescU[i]
+        for node, n in zip(nodes, data["n_shares"].tolist()):
+            node.n_shares = n
+
+        # Elements
+        for e, active in zip(elems, data["active"].tolist()):
+            e.elem_model.is_active = active
+
+        # Ip states
+        solver.bind_ip_states()
+        stores = solver.ip_state_stores
+        names  = [ store.models[0].__class__.__name__ for store in stores ]
+        counts = [ store.nips for store in stores ]
+        if names != data["ip_models"].tolist() or counts != data["ip_counts"].tolist():
+            raise Exception("read_checkpoint: Material models do not match the domain")
+        for k, store in enumerate(stores):
+            for name, arr in store.arrays.iteritems():
+                numpy.copyto(arr, data["ip%d.%s" % (k, name)])
+            numpy.copyto(store.ivs, data["ip%d.ivs" % k])
+
+        solver.stage, solver.inc = data["counters"].tolist()
+        if "time" in data.files:
+            solver.time = float(data["time"])
+    finally:
+        data.close()
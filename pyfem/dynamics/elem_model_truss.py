@@ -2,6 +2,8 @@ from pyfem.tools.matvec import *
 from elem_model_eq import *
 
 class ElemModelTruss(ElemModelEq):
+    group_class = None
+
     def __init__(self, *args):
         ElemModelEq.__init__(self);
         if len(args) != 1: return
@@ -1,6 +1,7 @@
 from pyfem.model import *
 
 class ModelLinElastic(Model):
+    param_vars = ("E", "nu", "A", "Ks", "Kn", "Dm")
 
     def __init__(self, *args):
         Model.__init__(self);
@@ -19,20 +20,6 @@ class ModelLinElastic(Model):
         if len(args)>1:
             self.set_state(args[1])
 
-    def copy(self):
-        the_copy = ModelLinElastic()
-        the_copy.sig = self.sig.copy()
-        the_copy.eps = self.eps.copy()
-        the_copy.E   = self.E  
-        the_copy.nu  = self.nu 
-        the_copy.A   = self.A  
-        the_copy.Ks  = self.Ks 
-        the_copy.Kn  = self.Kn 
-        the_copy.Dm  = self.Dm 
-        the_copy.ndim  = self.ndim
-        the_copy.attr = self.attr.copy()
-        return the_copy
-
     def check(self):
         return True
 
@@ -54,18 +41,25 @@ class ModelLinElastic(Model):
         self.sig[5] = state.get("sxz", 0.0)*sqrt2
 
     def stiff(self):
+        if self.attr.get("plane_stress"):
+            return self.params.cached("De_ps", self.calcDe_ps)
+        return self.params.cached("De", self.calcDe)
+
+    def calcDe_ps(self):
+        E  = self.E
+        nu = self.nu
+        c  = E/(1.0-nu*nu)
+        return array([\
+                [ c    , c*nu , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [ c*nu ,    c , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 , c*(1.0-nu),        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ] ] )
+
+    def calcDe(self):
         E  = self.E
         nu = self.nu
-
-        if self.attr.get("plane_stress"):
-            c = E/(1.0-nu*nu)
-            return array([\
-                    [ c    , c*nu , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [ c*nu ,    c , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 , c*(1.0-nu),        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ] ] )
 
         # For plane strain and 3D:
         c = E/((1.0+nu)*(1.0-2.0*nu))
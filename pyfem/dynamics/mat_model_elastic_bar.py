@@ -2,6 +2,7 @@ from pyfem.model import *
 
 class ModelElasticBar(Model):
     name = "ModelElasticBar"
+    param_vars = ("E", "A")
 
     def __init__(self, *args):
         Model.__init__(self);
@@ -15,16 +16,6 @@ class ModelElasticBar(Model):
         if len(args)>1:
             self.set_state(args[1])
 
-    def copy(self):
-        cp = self.__class__()
-        cp.sig = self.sig.copy()
-        cp.eps = self.eps.copy()
-        cp.E   = self.E  
-        cp.A   = self.A  
-        cp.ndim = self.ndim
-        cp.attr = self.attr.copy()
-        return cp
-
     def prime_and_check(self):
         pass
 
@@ -4,6 +4,7 @@ from math import copysign
 
 class MatModelMohrCoulombJoint(Model):
     name = "MatModelMohrCoulombJoint"
+    param_vars = ("Ks", "Kn", "Dm", "C", "phi", "H")
 
     def __init__(self, *args):
         Model.__init__(self);
@@ -23,21 +24,6 @@ class MatModelMohrCoulombJoint(Model):
             self.set_state(args[1])
 
     
-    def copy(self):
-        cp = MatModelMohrCoulombJoint()
-        cp.ndim = self.ndim
-        cp.sig = self.sig.copy()
-        cp.eps = self.eps.copy()
-        cp.Ks  = self.Ks 
-        cp.Kn  = self.Kn 
-        cp.Dm  = self.Dm 
-        cp.C   = self.C  
-        cp.phi = self.phi
-        cp.z   = self.z  
-        cp.H   = self.H  
-        cp.attr = self.attr.copy()
-        return cp
-
     def prime_and_check(self):
         pass
 
@@ -58,6 +44,9 @@ class MatModelMohrCoulombJoint(Model):
         return abs(tau) - self.C - sign_*tan(self.phi) + self.z
 
     def calcDe(self):
+        return self.params.cached(("De", self.ndim), self.calcDe_)
+
+    def calcDe_(self):
         Ks  = self.Ks
         Kn  = self.Kn
         if self.ndim==2:
@@ -76,6 +65,10 @@ class MatModelMohrCoulombJoint(Model):
         Kn  = self.Kn
         H   = self.H
         F   = self.yield_func(tau)
+
+        # With H = 1e-15*Ks the shear response is perfectly plastic: the
+        # substepped update keeps tau on the yield surface, thus Ksep ~ 0 is
+        # also its algorithmic tangent and no tangent option is needed
         if F < -1.0E-5:
             Ksep = Ks
         else:
@@ -4,6 +4,7 @@ from math import copysign
 
 class MatModelPerfectPlasticBar(Model):
     name = "MatModelPerfectPlasticBar"
+    param_vars = ("E", "A", "sig_max", "H")
 
     def __init__(self, *args):
         Model.__init__(self);
@@ -20,19 +21,6 @@ class MatModelPerfectPlasticBar(Model):
         if len(args)>1:
             self.set_state(args[1])
     
-    def copy(self):
-        cp = self.__class__()
-        cp.ndim = self.ndim
-        cp.sig  = self.sig
-        cp.eps  = self.eps
-        cp.E    = self.E  
-        cp.A    = self.A  
-        cp.z   = self.z  
-        cp.H   = self.H  
-        cp.sig_max = self.sig_max
-        cp.attr    = self.attr.copy()
-        return cp
-
     def prime_and_check(self):
         pass
 
@@ -1,11 +1,11 @@
 from pyfem.solver import *
 from pyfem.tools.matvec import *
+from pyfem.tools.assembler import *
 from elem_model_eq import *
 import math
 from scipy.sparse import lil_matrix
 from scipy import *
 import scipy
-from scipy.sparse.linalg import factorized
 
 class SolverEq(Solver):
     def __init__(self):
@@ -13,12 +13,11 @@ class SolverEq(Solver):
         self.name = "SolverEq"
         self.DU = None
         self.DF = None
-        self.K  = None
         self.K11 = None
         self.K12 = None
         self.K21 = None
         self.K22 = None
-        self.LUsolver = None
+        self.assembler = None
         self.plane_stress = False
     
     def set_plane_stress(self, value):
@@ -66,6 +65,9 @@ class SolverEq(Solver):
                 else:
                     self.udofs.append(dof)
 
+        # Optional bandwidth/fill reducing order of unknowns
+        self.renumber_udofs()
+
         self.dofs = []
         for dof in self.udofs:
             self.dofs.append(dof)
@@ -78,21 +80,15 @@ class SolverEq(Solver):
 
         if not self.pdofs: raise Exception("SolverEq.prime_and_check: No prescribed dofs=")
 
-    def mountK(self):
-        ndofs = len(self.dofs)
-        r, c, v = [], [], []
-
+        # Sparsity patterns of the K11..K22 blocks for current stage
+        self.assembler = PartitionedAssembler(len(self.udofs), self.ndofs)
         for e in self.aelems:
-            Ke = e.elem_model.stiff()
-            loc = e.elem_model.get_eq_loc()
+            self.assembler.add_map(e.elem_model.get_eq_loc())
+        self.assembler.build()
 
-            for i in range(Ke.shape[0]):
-                for j in range(Ke.shape[1]):
-                    r.append(loc[i])
-                    c.append(loc[j])
-                    v.append(Ke[i,j])
-
-        self.K = scipy.sparse.coo_matrix((v, (r,c)), (ndofs, ndofs))
+    def mountK(self):
+        Kes = [ e.elem_model.stiff() for e in self.aelems ]
+        self.K11, self.K12, self.K21, self.K22 = self.assembler.assemble(Kes)
 
     def solve(self):
         scheme = self.scheme
@@ -194,16 +190,7 @@ class SolverEq(Solver):
 
         if calcK:
             if self.verbose and nu>500: print "    building system...", ; sys.stdout.flush()
-            self.mountK()
-            #if self.verbose: print "    done."
-
-            # Mount K11.. K22 matrices
-            cK = self.K.tocsc()
-            self.K11 = cK[:nu , :nu ]
-            self.K12 = cK[:nu ,  nu:]
-            self.K21 = cK[ nu:, :nu ]
-            self.K22 = cK[ nu:,  nu:]
-            cK = None # Free memory
+            self.mountK() # Mounts K11.. K22 matrices
 
         F1 = DF[:nu]
         U2 = DU[nu:]
@@ -212,10 +199,9 @@ class SolverEq(Solver):
         F2 = self.K22*U2  #sparse matrix * dense vector
         if nu:
             if self.verbose and nu>500: print "solving...", ; sys.stdout.flush()
-            if scheme == "MNR" and decompose   : self.LUsolver = factorized(self.K11)
-            if scheme == "NR" or scheme == "FE": self.LUsolver = factorized(self.K11)
+            if decompose: self.linear_solver.set_matrix(self.K11)
             rhs = F1 - self.K12*U2
-            U1 = scipy.sparse.linalg.spsolve(self.K11, rhs)
+            U1 = self.linear_solver.solve(rhs)
             F2 += self.K21*U1
 
         # Complete vectors
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+from tools.matvec import *
+from mesh.shape_functions import *
+
+class ElemGeometry:
+    """ Geometric data of an element evaluated at all its integration points.
+
+    Stores the shape function values N (nips, nnodes), the local derivatives
+    D (nips, ndim_shape, nnodes), the jacobians J, the jacobian determinants
+    detJ and detJ*w (nips), the ip real coordinates X (nips, ndim) and, for
+    elements with square jacobians, the cartesian derivatives dNdX
+    (nips, ndim, nnodes). The nodal coordinates C used in the evaluation are
+    kept to check whether the data is still valid.
+    """
+    def __init__(self, shape_type, ips, C):
+        self.shape_type = shape_type
+        self.C     = C
+        self.nips  = len(ips)
+        self.w     = array([ ip.w for ip in ips ], dtype=float)
+        self.N     = array([ shape_func(shape_type, ip.R) for ip in ips ], dtype=float)
+        self.D     = array([ deriv_func(shape_type, ip.R) for ip in ips ], dtype=float)
+        self.J     = array([ mul(D, C) for D in self.D ], dtype=float)
+        self.X     = array([ mul(N.T, C) for N in self.N ], dtype=float)
+        self.detJ  = array([ pdet(J) for J in self.J ], dtype=float)
+        self.detJw = self.detJ*self.w
+        self.dNdX  = None
+        self._E    = None
+
+        if self.nips and self.J.shape[1] == self.J.shape[2]:
+            self.dNdX = array([ mul(inv(J), D) for J, D in zip(self.J, self.D) ], dtype=float)
+
+    @property
+    def E(self):
+        """ Extrapolation matrix from ip values to nodal values.
+        """
+        if self._E is None:
+            self._E = extrapolator(self.shape_type, self.nips)
+        return self._E
+
+    def is_valid(self, C):
+        """ Returns True if the data was computed for the coordinates C.
+        """
+        return self.C.shape == C.shape and (self.C == C).all()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+from collections import OrderedDict
+
+from tools.matvec import *
+from mesh.shape_functions import *
+
+class ElemGroup:
+    """ A set of elements that share element model class, shape type, number of
+    integration points and material model class. Connectivities and nodal
+    coordinates of all elements are stacked into contiguous arrays so that
+    element quantities can be evaluated for the whole group at once.
+    """
+    def __init__(self, elems):
+        elem_model = elems[0].elem_model
+
+        self.elems      = list(elems)
+        self.shape_type = elem_model.shape_type
+        self.ndim       = elem_model.ndim
+        self.nnodes     = len(elem_model.nodes)
+        self.nips       = len(elem_model.ips)
+        self.nelems     = len(self.elems)
+
+        # Connectivities: (nelems, nnodes)
+        self.conn = array([ [n.id for n in e.elem_model.nodes] for e in self.elems ], dtype=int)
+        self.thickness = array([ e.elem_model.thickness for e in self.elems ], dtype=float)
+
+        # Stacked data from the geometry cache of each element
+        self.geos  = [ e.elem_model.get_geometry() for e in self.elems ]
+        self.C     = array([ geo.C     for geo in self.geos ], dtype=float) # (nelems, nnodes, ndim)
+        self.N     = array([ geo.N     for geo in self.geos ], dtype=float) # (nelems, nips, nnodes)
+        self.detJw = array([ geo.detJw for geo in self.geos ], dtype=float) # (nelems, nips)
+
+    @property
+    def elem_models(self):
+        return [ e.elem_model for e in self.elems ]
+
+    def get_eqn_maps(self):
+        """ Returns a list with the equation map of every element in the group.
+        """
+        return [ e.elem_model.get_eqn_map() for e in self.elems ]
+
+
+def make_elem_groups(elems):
+    """ Splits a list of elements into element groups.
+
+    Elements whose element model defines a group class are grouped by
+    (element model class, shape type, number of ips, material model class).
+
+    Returns:
+        a list of element groups
+        a list with the elements that can not be grouped
+    """
+    keys   = OrderedDict()
+    others = []
+
+    for e in elems:
+        elem_model = e.elem_model
+        if elem_model.group_class is None or not elem_model.ips:
+            others.append(e)
+            continue
+
+        key = (elem_model.__class__, elem_model.group_class, elem_model.shape_type,
+               len(elem_model.ips), elem_model.ips[0].mat_model.__class__)
+        keys.setdefault(key, []).append(e)
+
+    groups = [ key[1](group_elems) for key, group_elems in keys.iteritems() ]
+    return groups, others
+
@@ -11,8 +11,12 @@ from copy import copy
 from tools.matvec import *
 from mesh.shape_functions import *
 from ip import *
+from elem_geometry import *
 
 class ElemModel:
+    group_class = None # element group class for batched evaluation
+    extrapolate_ip_vals = False # nodal values are the dofs and the extrapolated ip values (see PostGroup)
+
     def __init__(self):
         self.id         = -1
         self.name       = ""
@@ -27,6 +31,7 @@ class ElemModel:
         self.tmp_mat_model = None
         self.lnk_elem_models = []
         self.parent = None
+        self.geo    = None # geometry cache
 
     def copy(self):
         cp = self.__class__()
@@ -95,6 +100,30 @@ class ElemModel:
         ndim   = self.ndim
         return array( [n.X[:ndim] for n in self.nodes], dtype=float )
 
+    def geometry_coords(self):
+        """ Returns the nodal coordinates that define the element geometry.
+        """
+        if is_line_joint(self.shape_type):
+            return self.parent.lnk_elems[0].elem_model.coords() # get coordinates from line element
+        return self.coords()
+
+    def calc_geometry(self, C):
+        """ Returns the geometric data at all ips for the coordinates C.
+        """
+        return ElemGeometry(self.shape_type, self.ips, C)
+
+    def get_geometry(self):
+        """ Returns the geometry cache of the element. The cache is rebuilt
+        only if the nodal coordinates have changed.
+        """
+        C = self.geometry_coords()
+        if self.geo is None or not self.geo.is_valid(C):
+            self.geo = self.calc_geometry(C)
+        return self.geo
+
+    def reset_geometry(self):
+        self.geo = None
+
     def config_dofs(self, brys):
         assert False
 
@@ -122,13 +151,9 @@ class ElemModel:
             self.ips.append(ip)
 
         # Finding ips real coords
-        C = self.coords()
-        if is_line_joint(self.shape_type):
-            C = self.parent.lnk_elems[0].elem_model.coords() # get coordinates from line element
-
-        for ip in self.ips:
-            N = shape_func(self.shape_type, ip.R)
-            ip.X = mul(N.T, C)
+        geo = self.get_geometry()
+        for i, ip in enumerate(self.ips):
+            ip.X = geo.X[i].copy()
 
     def __str__(self):
         shape_type = self.shape_type
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+PYFEM - Finite element software
+Raul Durand 2010-2013
+"""
+
+import numpy
+
+from pyfem.elem_group import *
+
+class ElemGroupEq(ElemGroup):
+    """ Element group for equilibrium analysis of solids and trusses.
+    B matrices and element stiffness matrices are evaluated for all elements
+    and integration points of the group with batched array operations.
+    """
+    def __init__(self, elems):
+        ElemGroup.__init__(self, elems)
+        self.is_truss = elems[0].elem_model.is_truss
+
+        if self.is_truss:
+            self.B    = array([ geo.B for geo in self.geos ], dtype=float)
+        else:
+            self.dNdX = array([ geo.dNdX for geo in self.geos ], dtype=float)
+
+        self._batch = None # (store, model, rows) for batched material updates
+
+    def calcB(self):
+        """ Returns the B matrices (nelems, nips, nrows, nnodes*ndim) for all
+        elements in the group.
+        """
+        ndim   = self.ndim
+        nnodes = self.nnodes
+        ne     = self.nelems
+        nips   = self.nips
+
+        # B matrix for truss elements
+        if self.is_truss:
+            return self.B
+
+        # B matrix for solid elements
+        dNdX  = self.dNdX
+        sqrt2 = 1.41421356237
+
+        B = zeros(ne, nips, 6, ndim*nnodes)
+        if ndim==2:
+            dNdx = dNdX[:,:,0,:]
+            dNdy = dNdX[:,:,1,:]
+            B[:,:,0,0::2] = dNdx
+            B[:,:,1,1::2] = dNdy
+            B[:,:,3,0::2] = dNdy/sqrt2;   B[:,:,3,1::2] = dNdx/sqrt2
+        else:
+            dNdx = dNdX[:,:,0,:]
+            dNdy = dNdX[:,:,1,:]
+            dNdz = dNdX[:,:,2,:]
+            B[:,:,0,0::3] = dNdx
+            B[:,:,1,1::3] = dNdy
+            B[:,:,2,2::3] = dNdz
+            B[:,:,3,0::3] = dNdy/sqrt2;   B[:,:,3,1::3] = dNdx/sqrt2
+            B[:,:,4,1::3] = dNdz/sqrt2;   B[:,:,4,2::3] = dNdy/sqrt2
+            B[:,:,5,0::3] = dNdz/sqrt2;   B[:,:,5,2::3] = dNdx/sqrt2
+
+        return B
+
+    def get_batch_model(self):
+        """ Returns the material model used for batched material updates and
+        the rows (nelems, nips) of all ips of the group in its state store.
+        Batched updates require that all ip models are bound to the same
+        IpStateStore, share the same parameters and that the material model
+        class implements stress_update_batch. Returns (None, None) otherwise.
+        """
+        mdl0  = self.elems[0].elem_model.ips[0].mat_model
+        store = mdl0.state_store
+        if store is None or not hasattr(mdl0, "stress_update_batch"):
+            return None, None
+        if self._batch is not None and self._batch[0] is store:
+            return self._batch[1:]
+
+        mdls = [ ip.mat_model for e in self.elems for ip in e.elem_model.ips ]
+        if all(mdl.state_store is store and mdl0.same_params(mdl) for mdl in mdls):
+            rows = array([ mdl.state_row for mdl in mdls ], dtype=int).reshape(self.nelems, self.nips)
+            self._batch = (store, mdl0, rows)
+        else:
+            self._batch = (store, None, None)
+        return self._batch[1:]
+
+    def calcD(self):
+        """ Returns the constitutive matrices at all ips (nelems, nips, nrows, nrows).
+        """
+        mdl, rows = self.get_batch_model()
+        if mdl is not None and hasattr(mdl, "stiff_batch"):
+            state = mdl.state_store.gather(rows.ravel())
+            D = mdl.stiff_batch(state)
+            return D.reshape(self.nelems, self.nips, D.shape[-2], D.shape[-1])
+
+        Ds = [ [ ip.mat_model.stiff() for ip in e.elem_model.ips ] for e in self.elems ]
+        D  = array(Ds, dtype=float)
+        if self.is_truss:
+            D = D.reshape(self.nelems, self.nips, 1, 1)
+        return D
+
+    def stiff(self):
+        """ Returns the stiffness matrices (nelems, nnodes*ndim, nnodes*ndim)
+        for all elements in the group.
+        """
+        B    = self.calcB()
+        D    = self.calcD()
+        coef = self.detJw*self.thickness[:,None]
+        if self.is_truss:
+            A     = [ [ ip.mat_model.A for ip in e.elem_model.ips ] for e in self.elems ]
+            coef *= array(A, dtype=float)
+
+        DB = numpy.matmul(D, B)
+        BT = B.transpose(0,1,3,2)*coef[:,:,None,None]
+        return numpy.matmul(BT, DB).sum(axis=1)
+
+
+    def calc_update(self, DU):
+        """ Updates the material models at all ips of the group with the
+        incremental displacements DU and returns the internal force increments
+        (nelems, nnodes*ndim). Stresses are updated for all ips at once when
+        the material model supports batched updates.
+        """
+        maps = array(self.get_eqn_maps(), dtype=int)
+        B    = self.calcB()
+        deps = numpy.einsum("eird,ed->eir", B, DU[maps])
+
+        mdl, rows = self.get_batch_model()
+        if mdl is not None:
+            store = mdl.state_store
+            state = store.gather(rows.ravel())
+            dsig  = mdl.stress_update_batch(state, deps.reshape(-1, deps.shape[-1]))
+            store.scatter(rows.ravel(), state)
+            dsig  = dsig.reshape(deps.shape)
+        else:
+            dsig = zeros(*deps.shape)
+            for j, e in enumerate(self.elems):
+                for i, ip in enumerate(e.elem_model.ips):
+                    dsig[j,i] = ip.mat_model.stress_update(deps[j,i])
+
+        coef = self.detJw
+        if self.is_truss:
+            A    = [ [ ip.mat_model.A for ip in e.elem_model.ips ] for e in self.elems ]
+            coef = coef*array(A, dtype=float)
+
+        return numpy.einsum("eird,eir,ei->ed", B, dsig, coef)
+
+    def update(self, DU, DF):
+        """ Updates all elements of the group and adds the internal force
+        increments to DF.
+        """
+        dF = self.calc_update(DU)
+        numpy.add.at(DF, array(self.get_eqn_maps(), dtype=int), dF)
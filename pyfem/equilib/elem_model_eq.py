@@ -9,8 +9,12 @@ from numpy import average
 
 from pyfem.tools.matvec import *
 from pyfem.elem_model import *
+from elem_group_eq import *
 
 class ElemModelEq(ElemModel):
+    group_class = ElemGroupEq
+    extrapolate_ip_vals = True
+
     def __init__(self, *args, **kwargs):
         """ Element model class for equilibrium analysis of solids and trusses
         """
@@ -23,9 +27,6 @@ class ElemModelEq(ElemModel):
         self.gamma = props.get("gamma", 10.0)
         self.A     = props.get("A"    , 10.0)
 
-        # temporary vars
-        self.memo = {}
-
     def copy(self):
         cp = ElemModel.copy(self)
         return cp
@@ -56,33 +57,51 @@ class ElemModelEq(ElemModel):
             n.remove_dof("uy", "fy")
             if ndim==3: n.remove_dof("uz", "fz")
 
+    def calc_geometry(self, C):
+        geo = ElemModel.calc_geometry(self, C)
+
+        # B matrices of truss elements depend only on geometry
+        if self.is_truss:
+            geo.B = [ self.mountB(geo.D[i], geo.J[i]) for i in range(geo.nips) ]
+        return geo
+
+    def ip_B(self, geo, i):
+        """ Returns the B matrix at the i-th ip using the geometry cache.
+        """
+        if self.is_truss:
+            return geo.B[i]
+        return self.mountB(geo.D[i], geo.J[i], geo.dNdX[i])
+
     def stiff(self):
         nnodes = len(self.nodes)
         ndim   = self.ndim
-        C = self.coords()
+        geo = self.get_geometry()
         K = zeros(nnodes*ndim, nnodes*ndim)
-        for ip in self.ips:
-            B, detJ = self.calcB(ip.R, C)
+        for i, ip in enumerate(self.ips):
+            B       = self.ip_B(geo, i)
             mdl     = ip.mat_model
             Dep     = mdl.stiff()
             thk     = self.thickness
-            coef    = detJ*ip.w*thk
+            coef    = geo.detJw[i]*thk
             if self.is_truss: coef *= mdl.A
             K += mul(B.T, Dep, B)*coef
 
         return K
 
     def calcB(self, R, C):
+        D = deriv_func(self.shape_type, R)
+        J = mul(D, C)
+        return self.mountB(D, J), pdet(J)
+
+    def mountB(self, D, J, dNdX=None):
+        """ Mounts the B matrix from the local derivatives D, the jacobian J
+        and optionally the cartesian derivatives dNdX.
+        """
         nnodes = len(self.nodes)
         ndim   = self.ndim
 
         # B matrix for truss elements
         if self.is_truss:
-            saved = self.memo.get(tuple(R))
-            if saved: return saved[0], saved[1]
-
-            D = deriv_func(self.shape_type, R)
-            J = mul(D, C)
             detJ = pdet(J)
 
             B = zeros(ndim, ndim*nnodes)
@@ -97,42 +116,31 @@ class ElemModelEq(ElemModel):
                     B[2,2+i*ndim] = D[0,i]
 
             B = mul(J, B)*(1.0/detJ**2.0)
-            self.memo[tuple(R)] = (B, detJ)
-            return B, detJ
+            return B
 
         # B matrix for solid elements
-        saved = self.memo.get(tuple(R))
-        if saved:
-            dNdX = saved[0]
-            detJ = saved[1]
-        else:
-            D = deriv_func(self.shape_type, R)
-            J = mul(D, C)
+        if dNdX is None:
             dNdX = mul(inv(J),D)
-            detJ = det(J)
-            self.memo[tuple(R)] = (dNdX, detJ)
 
         B = zeros(6, ndim*nnodes)
         sqrt2 = 1.41421356237
 
         if ndim==2:
-            for i in range(nnodes):
-                B[0,0+i*ndim] = dNdX[0,i]
-                B[1,1+i*ndim] = dNdX[1,i]
-                B[3,0+i*ndim] = dNdX[1,i]/sqrt2; B[3,1+i*ndim] = dNdX[0,i]/sqrt2
+            B[0,0::2] = dNdX[0]
+            B[1,1::2] = dNdX[1]
+            B[3,0::2] = dNdX[1]/sqrt2; B[3,1::2] = dNdX[0]/sqrt2
         else:
-            for i in range(nnodes):
-                dNdx = dNdX[0,i]
-                dNdy = dNdX[1,i]
-                dNdz = dNdX[2,i]
-                B[0,0+i*ndim] = dNdx
-                B[1,1+i*ndim] = dNdy
-                B[2,2+i*ndim] = dNdz
-                B[3,0+i*ndim] = dNdy/sqrt2;   B[3,1+i*ndim] = dNdx/sqrt2
-                B[4,1+i*ndim] = dNdz/sqrt2;   B[4,2+i*ndim] = dNdy/sqrt2
-                B[5,0+i*ndim] = dNdz/sqrt2;   B[5,2+i*ndim] = dNdx/sqrt2;
-
-        return B, detJ
+            dNdx = dNdX[0]
+            dNdy = dNdX[1]
+            dNdz = dNdX[2]
+            B[0,0::3] = dNdx
+            B[1,1::3] = dNdy
+            B[2,2::3] = dNdz
+            B[3,0::3] = dNdy/sqrt2;   B[3,1::3] = dNdx/sqrt2
+            B[4,1::3] = dNdz/sqrt2;   B[4,2::3] = dNdy/sqrt2
+            B[5,0::3] = dNdz/sqrt2;   B[5,2::3] = dNdx/sqrt2
+
+        return B
 
     def get_eqn_map(self):
         dof_keys = ["ux", "uy", "uz"][:self.ndim]
@@ -155,13 +163,13 @@ class ElemModelEq(ElemModel):
         #if self.id==6:
             #OUT("dU")
 
-        C = self.coords()
-        for ip in self.ips:
-            B, detJ = self.calcB(ip.R, C)
+        geo = self.get_geometry()
+        for i, ip in enumerate(self.ips):
+            B    = self.ip_B(geo, i)
             deps = mul(B,dU)
             mdl  = ip.mat_model
             dsig = mdl.stress_update(deps)
-            coef = detJ*ip.w
+            coef = geo.detJw[i]
             if self.is_truss: coef *= mdl.A
             dF += mul(B.T, dsig)*coef
 
@@ -195,13 +203,13 @@ class ElemModelEq(ElemModel):
         # Calculating deactivation forces
         ndim   = self.ndim
         nnodes = len(self.nodes)
-        C  = self.coords()
-        dF = zeros(nnodes*ndim)
+        geo = self.get_geometry()
+        dF  = zeros(nnodes*ndim)
 
-        for ip in self.ips:
-            B, detJ = self.calcB(ip.R, C)
+        for i, ip in enumerate(self.ips):
+            B       = self.ip_B(geo, i)
             sig     = ip.mat_model.sig
-            coef    = detJ*ip.w
+            coef    = geo.detJw[i]
             dF     += mul(B.T, sig)*coef
 
         # Set node boundary conditions
@@ -344,14 +352,12 @@ class ElemModelEq(ElemModel):
 
         F = zeros(nnodes, ndim)
 
-        C = self.coords()
+        geo = self.get_geometry()
 
         # Loop along integration points
-        for ip in self.ips:
-            S = shape_func(self.shape_type, ip.R)
-            D = deriv_func(self.shape_type, ip.R)
-            detJ = pdet(mul(D,C))
-            coef = detJ*ip.w
+        for i, ip in enumerate(self.ips):
+            S = geo.N[i]
+            coef = geo.detJw[i]
             if self.is_truss: coef *= ip.mat_model.A
 
             F += mul(as_col(S), as_row(MF))*coef; # Calculate the nodal body forces matrix
@@ -397,7 +403,7 @@ class ElemModelEq(ElemModel):
             for j, val in enumerate(ip_vals.values()):
                 IP[i,j] = val
 
-        E = extrapolator(self.shape_type, nips)
+        E = self.get_geometry().E
         N = mul(E, IP)
 
         # Filling nodal_values dict
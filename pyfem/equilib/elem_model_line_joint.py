@@ -11,6 +11,9 @@ from pyfem.tools.matvec import *
 from elem_model_eq import *
 
 class ElemModelLineJoint(ElemModelEq):
+    group_class = None
+    extrapolate_ip_vals = False
+
     def __init__(self, *args, **kwargs):
         ElemModel.__init__(self);
         self.truss = None
@@ -32,17 +35,42 @@ class ElemModelLineJoint(ElemModelEq):
         self.truss = self.lnk_elem_models[0]
         self.hook  = self.lnk_elem_models[1]
 
+    def geometry_coords(self):
+        Ct = ElemModel.geometry_coords(self)
+        if self.hook is None:
+            return Ct
+        return numpy.vstack((Ct, self.hook.coords()))
+
+    def calc_geometry(self, C):
+        if self.hook is None:
+            return ElemModel.calc_geometry(self, C)
+
+        ntnodes = len(self.truss.nodes)
+        Ct  = C[:ntnodes]
+        Ch  = C[ntnodes:]
+        geo = ElemModel.calc_geometry(self, Ct)
+        geo.C = C # coordinates from line and tresspased elements
+
+        # B matrices and operators for confinement stress at all ips
+        geo.B  = [ self.calcB(ip.R, Ch, Ct)[0] for ip in self.ips ]
+        geo.Ts = []
+        geo.ME = []
+        for ip in self.ips:
+            Ts, ME = self.calc_sigc_operators(ip.R, Ch, Ct)
+            geo.Ts.append(Ts)
+            geo.ME.append(ME)
+        return geo
+
     def stiff(self):
         nnodes = len(self.nodes)
         ndim   = self.ndim
-        Ct = self.truss.coords()
-        Ch = self.hook.coords()
+        geo = self.get_geometry()
         K = zeros(nnodes*ndim, nnodes*ndim)
-        for ip in self.ips:
-            B, detJ = self.calcB(ip.R, Ch, Ct)
+        for i, ip in enumerate(self.ips):
+            B    = geo.B[i]
             M    = ip.mat_model
-            Dep  = M.stiff()
-            coef = detJ*ip.w
+            Dep  = M.stiff().copy()
+            coef = geo.detJw[i]
 
             Dep[0,0] *= M.h
             K += mul(B.T, Dep, B)*coef
@@ -165,6 +193,13 @@ class ElemModelLineJoint(ElemModelEq):
         return concatenate([L0, L1, L2], axis=0)
 
     def calc_sigc(self, R, Ch, Ct):
+        Ts, ME = self.calc_sigc_operators(R, Ch, Ct)
+        return self.eval_sigc(Ts, ME)
+
+    def calc_sigc_operators(self, R, Ch, Ct):
+        """ Returns the stress rotation matrix Ts and the vector M.T*E that
+        interpolates stresses from the tresspased element ips at point R.
+        """
 
         # Mounting Ts matrix
         D = deriv_func(self.shape_type, R)
@@ -198,6 +233,9 @@ class ElemModelLineJoint(ElemModelEq):
         hook_nips = len(self.hook.ips)
         E = extrapolator(self.hook.shape_type, hook_nips)
 
+        return Ts, mul(M.T, E)
+
+    def eval_sigc(self, Ts, ME):
         #Mounting Sig matrix
         stack = []
         for ip in self.hook.ips:
@@ -206,7 +244,7 @@ class ElemModelLineJoint(ElemModelEq):
         Sig = concatenate(stack, axis=0)
 
         # Calculating stresses at current link ip
-        sig = mul(Ts, mul(M.T, E, Sig).T); # stress vector at link ip
+        sig = mul(Ts, mul(ME, Sig).T); # stress vector at link ip
 
         # Calculating average confinement stress
         #sigc = 1/3.*(sig[0]+sig[1]+sig[2])
@@ -225,15 +263,14 @@ class ElemModelLineJoint(ElemModelEq):
         for i in range(ndim*nnodes):
             dU[i] = DU[loc[i]]
 
-        Ct = self.truss.coords()
-        Ch = self.hook.coords()
-        for ip in self.ips:
-            B, detJ = self.calcB(ip.R, Ch, Ct)
+        geo = self.get_geometry()
+        for i, ip in enumerate(self.ips):
+            B    = geo.B[i]
             deps = mul(B, dU)
             M    = ip.mat_model
-            M.sigc = self.calc_sigc(ip.R, Ch, Ct)
+            M.sigc = self.eval_sigc(geo.Ts[i], geo.ME[i])
             dsig = M.stress_update(deps)
-            coef = detJ*ip.w
+            coef = geo.detJw[i]
 
             dsig[0] *= M.h  # h is the perimeter
             dF += mul(B.T, dsig)*coef
@@ -287,7 +324,7 @@ class ElemModelLineJoint(ElemModelEq):
             for j, val in enumerate(ip_vals.values()):
                 IP[i,j] = val
 
-        E = extrapolator(self.shape_type, nips)
+        E = self.get_geometry().E
         N = mul(E, IP)
 
         # Increment zeros for values related to tresspased element nodes
@@ -8,6 +8,8 @@ from pyfem.tools.matvec import *
 from elem_model_eq import *
 
 class ElemModelNewlLineJoint(ElemModelEq):
+    group_class = None
+
     def __init__(self, *args):
         ElemModel.__init__(self);
         self.truss = None
@@ -10,6 +10,9 @@ from elem_model_eq import *
 from numpy import hstack, linalg
 
 class ElemModelPunctualJoint(ElemModelEq):
+    group_class = None
+    extrapolate_ip_vals = False
+
     def __init__(self, *args, **kwargs):
         ElemModel.__init__(self);
         self.truss = None
@@ -39,22 +42,37 @@ class ElemModelPunctualJoint(ElemModelEq):
         self.ip.id = 0
         self.ip.owner_id = self.id
 
+    def geometry_coords(self):
+        Ct = self.truss.coords()
+        Ch = self.hook.coords()
+        Xj = self.nodes[-1].X[:self.ndim]
+        return numpy.vstack((Ct, Ch, Xj))
+
+    def calc_geometry(self, C):
+        ntnodes = len(self.truss.nodes)
+        nhnodes = len(self.hook.nodes)
+        Ct = C[:ntnodes]
+        Ch = C[ntnodes:ntnodes+nhnodes]
+
+        # The joint has a single ip at the joint node
+        geo = ElemGeometry(self.shape_type, [], C)
+        geo.l = linalg.norm(Ct[0]-Ct[1])  # truss length
+        geo.R = inverse_map(self.truss.shape_type, Ct, self.nodes[-1].X)
+        geo.B = self.calcB(geo.R, Ch, Ct)
+        geo.Ts, geo.ME = self.calc_sign_operators(geo.R, Ch, Ct)
+        return geo
+
     def stiff(self):
         nnodes = len(self.nodes)
         ntnodes = len(self.truss.nodes)
         ndim   = self.ndim
         mmodel = self.ip.mat_model
 
-        Ct = self.truss.coords()
-        Ch = self.hook.coords()
-        l  = linalg.norm(Ct[0]-Ct[1])  # truss length
-
-        X = self.nodes[-1].X
-        R = inverse_map(self.truss.shape_type, Ct, X)
-        B = self.calcB(R, Ch, Ct)
-        self.ip.mat_model.attr["sign"] = self.calc_sign(R, Ch, Ct)
+        geo = self.get_geometry()
+        B   = geo.B
+        self.ip.mat_model.attr["sign"] = self.eval_sign(geo.Ts, geo.ME)
         Dep  = self.ip.mat_model.stiff()
-        coef = mmodel.stiff_coef()*l/ntnodes
+        coef = mmodel.stiff_coef()*geo.l/ntnodes
         K = mul(B.T, Dep, B)*coef
 
         return K
@@ -150,6 +168,13 @@ class ElemModelPunctualJoint(ElemModelEq):
                   Sig: Matrix with all stresses from all ips of the
                        tresspased element
         """
+        Ts, ME = self.calc_sign_operators(R, Ch, Ct)
+        return self.eval_sign(Ts, ME)
+
+    def calc_sign_operators(self, R, Ch, Ct):
+        """ Returns the stress rotation matrix Ts and the vector M.T*E that
+        interpolates stresses from the tresspased element ips at point R.
+        """
 
         # Mounting direction cosines matrix
         D = deriv_func(self.truss.shape_type, R)
@@ -179,8 +204,11 @@ class ElemModelPunctualJoint(ElemModelEq):
         M = shape_func(self.hook.shape_type, R);      # Shape function of tresspased element
 
         # Mounting extrapolator matrix E
-        E = extrapolator(self.hook.shape_type)
+        E = extrapolator(self.hook.shape_type, len(self.hook.ips))
+
+        return Ts, mul(M.T, E)
 
+    def eval_sign(self, Ts, ME):
         # Mounting Sig matrix (stresses at ips of tresspased element)
         stack = []
         for ip in self.hook.ips:
@@ -188,7 +216,7 @@ class ElemModelPunctualJoint(ElemModelEq):
         Sig = concatenate(stack, axis=0)
 
         # Extrapolating, interpolating and rotating stresses
-        sig = mul(Ts, mul(M.T, E, Sig).T); # stress vector at point of interest
+        sig = mul(Ts, mul(ME, Sig).T); # stress vector at point of interest
 
         # Calculating average confinement stress
         sign = 0.5*(sig[0]+sig[1])
@@ -202,24 +230,19 @@ class ElemModelPunctualJoint(ElemModelEq):
         ndim = self.ndim
         nnodes = len(self.nodes)
         ntnodes = len(self.truss.nodes)
-        Ct = self.truss.coords()
-        Ch = self.hook.coords()
+        geo = self.get_geometry()
         mmodel = self.ip.mat_model
 
-        l = linalg.norm(Ct[0]-Ct[1])  # truss length
-
         # Mount incremental displacement vector
         loc = self.get_eqn_map()
         dU = [DU[loc[i]] for i in range(ndim*nnodes)]
         dF = zeros(nnodes*ndim)
 
 
-        X = self.nodes[-1].X
-        R = inverse_map(self.truss.shape_type, Ct, X)
-        B    = self.calcB(R, Ch, Ct)
+        B    = geo.B
         deps = mul(B, dU)
         dsig = self.ip.mat_model.stress_update(deps)
-        coef = mmodel.stiff_coef()*l/ntnodes
+        coef = mmodel.stiff_coef()*geo.l/ntnodes
         dF   = mul(B.T, dsig)*coef
 
         for i in range(ndim*nnodes):
@@ -5,7 +5,6 @@ Raul Durand & Dorival Pedroso
 Copyright 2010-2013.
 """
 
-from copy import deepcopy
 from math import tan, copysign
 
 from pyfem.model import *
@@ -14,6 +13,9 @@ class ModelConcreteTruss(Model):
     """ Constitutive models for Elastic Plastic 1D materials
     """
 
+    state_vars = ("s", "e", "e_pa", "dg", "sig", "s_yt")
+    param_vars = ("E", "A", "H", "s_yc", "COEF")
+
     name = "ModelConcreteTruss"
 
     def __init__(self, *args, **kwargs):
@@ -23,7 +25,7 @@ class ModelConcreteTruss(Model):
         self.s    = 0.0    # σ
         self.e    = 0.0    # ε
         self.s_yc = 0.0    # σy0
-        self.s_yt = 0.0    # σy0
+        self.s_yt = 0.0    # σyt (per ip, reduced after cracking)
         self.e_pa = 0.0    # εp¯ 
         self.dg   = 0.0    # Δγ
         self.H    = 0.0
@@ -36,9 +38,6 @@ class ModelConcreteTruss(Model):
             self.set_params(**data)
             self.set_state (**data)
 
-    def copy(self):
-        return deepcopy(self)
-
     def prime_and_check(self):
         pass
 
@@ -89,6 +88,8 @@ class ModelConcreteTruss(Model):
             return self.E
         else:
             #print "Plastic", self.dg, self.yield_func(self.s)
+            # dσ/dε of the return; tension and compression yield stresses
+            # harden with the same H
             E = self.E
             H = self.H
             return E*H/(E+H)
@@ -4,11 +4,15 @@ PYFEM - Finite element software
 Raul Durand 2010-2013.
 """
 
+import numpy
+
 from pyfem.model import *
 from pyfem.tools.tensor import *
 from math import copysign
 
 class MatModelDruckerPrager(Model):
+    state_vars = ("sig", "eps", "plast", "dg")
+    param_vars = ("E", "nu", "alpha", "kappa", "T", "C", "phi", "tangent")
 
     def __init__(self, *args, **kwargs):
         Model.__init__(self);
@@ -20,6 +24,7 @@ class MatModelDruckerPrager(Model):
         self.kappa = 0.0
         self.plast = False
         self.dg    = 0.0
+        self.tangent = "consistent"
 
         data = args[0] if args else kwargs
 
@@ -31,32 +36,20 @@ class MatModelDruckerPrager(Model):
     def name(self):
         return "MatModelDruckerPrager"
 
-    def copy(self):
-        cp     = self.__class__()
-        cp.sig = self.sig.copy()
-        cp.eps = self.eps.copy()
-        cp.E   = self.E
-        cp.nu  = self.nu
-        cp.alpha = self.alpha
-        cp.kappa = self.kappa
-        cp.plast = self.plast
-        cp.ndim  = self.ndim
-        cp.dg    = self.dg
-        cp.attr  = self.attr.copy()
-        cp.T= self.T
-        return cp
-
     def prime_and_check(self):
-        self.calcDe_()
+        self.calcDe()
         return True
 
     def set_params(self, **params):
         self.E  = params.get("E" , 0.0)
         self.nu = params.get("nu", 0.0)
         self.T  = params.get("T" , 0.0)
+        self.tangent = params.get("tangent", "consistent")
         assert self.nu>=0.0 and self.nu<0.5
         assert self.E>0
         assert self.T>=0
+        if self.tangent not in ("continuum", "consistent"):
+            raise Exception("MatModelDruckerPrager.set_params: Invalid tangent: " + str(self.tangent))
 
         if set(params.keys()) >= {"alpha", "kappa"}:
             self.alpha = params.get("alpha", 0.0)
@@ -116,7 +109,7 @@ class MatModelDruckerPrager(Model):
         nu = self.nu
         c  = E/((1.0+nu)*(1.0-2.0*nu))
         # For plane strain and 3D:
-        self.De = tensor4([\
+        return tensor4([\
                 [ c*(1.0-nu),  c*nu ,      c*nu ,            0.0,            0.0,            0.0 ], \
                 [ c*nu ,  c*(1.0-nu),      c*nu ,            0.0,            0.0,            0.0 ], \
                 [ c*nu ,       c*nu , c*(1.0-nu),            0.0,            0.0,            0.0 ], \
@@ -125,7 +118,7 @@ class MatModelDruckerPrager(Model):
                 [  0.0 ,        0.0 ,       0.0 ,            0.0,            0.0, c*(1.0-2.0*nu) ]] )
 
     def calcDe(self):
-        return self.De
+        return self.params.cached("De", self.calcDe_)
 
     def yield_deriv(self, sig):
         p = sig.J1()/3.0
@@ -168,6 +161,9 @@ class MatModelDruckerPrager(Model):
         if not self.plast:
             return De
 
+        if self.tangent == "consistent":
+            return tensor4(self.stiff_batch(self.get_batch_state())[0])
+
         # Plastic stiffness
         v = self.yield_deriv(self.sig) # Derivatives
 
@@ -261,14 +257,19 @@ class MatModelDruckerPrager(Model):
         v_tr = self.yield_deriv(sig_tr)
         De_v_tr = D.dot(v_tr)
         a  = 0.0
-        #b  = norm(sig_tr.S())/norm(De_v_tr)
-        b  = norm(sig_tr)/norm(De_v_tr)
+        # The deviatoric part of sig_tr - g*De_v_tr vanishes at b, where f is
+        # minimum along the return if the cone is not too flat; f grows again
+        # beyond it, thus the root is bracketed by a and b.
+        J2D_v = tensor2(De_v_tr).J2D()
+        b  = (sig_tr.J2D()/J2D_v)**0.5 if J2D_v>0.0 else norm(sig_tr)/norm(De_v_tr)
         fa = self.yield_func(sig_tr - a*De_v_tr)
         fb = self.yield_func(sig_tr - b*De_v_tr)
 
         while fb>0.0:
             b *= 1.2
             fb = self.yield_func(sig_tr - b*De_v_tr)
+            if not numpy.isfinite(fb):
+                raise Exception("MatModelDruckerPrager.stress_update: Return point not found")
 
         if fa*fb>0:
             OUT("v_tr")
@@ -283,6 +284,7 @@ class MatModelDruckerPrager(Model):
 
         # Bisection iterations
         sig1 = sig_tr - a*De_v_tr
+        self.dg = a
         while abs(fa)>FTOL:
             self.dg   = (a+b)/2.0
             sig1  = sig_tr - self.dg*De_v_tr
@@ -321,6 +323,199 @@ class MatModelDruckerPrager(Model):
         return dsig
 
 
+    def same_params(self, other):
+        """ Returns True if other has the same parameters as this model.
+        """
+        return self.__class__ is other.__class__ and (self.params is other.params or \
+               (self.E, self.nu, self.alpha, self.kappa, self.T, self.tangent) == \
+               (other.E, other.nu, other.alpha, other.kappa, other.T, other.tangent))
+
+    def yield_func_batch(self, sig):
+        """ Yield function for n stress states given as an (n, 6) array.
+        """
+        sr2 = 1.414213562373
+        J1  = sig[:,0] + sig[:,1] + sig[:,2]
+        p   = J1/3.0
+        t0  = sig[:,0] - p;  t1  = sig[:,1] - p;  t2  = sig[:,2] - p
+        t3  = sig[:,3]/sr2;  t4  = sig[:,4]/sr2;  t5  = sig[:,5]/sr2
+        J2D = 0.5*t0*t0 + 0.5*t1*t1 + 0.5*t2*t2 + t3*t3+ t4*t4 + t5*t5
+
+        F = self.alpha*J1 + J2D**0.5 - self.kappa
+        cut = p > self.T
+        F[cut] = 3.*p[cut] - 3.*self.T
+        return F
+
+    def yield_deriv_batch(self, sig):
+        """ Yield function derivatives for n stress states (n, 6).
+        """
+        sr2 = 1.414213562373
+        J1  = sig[:,0] + sig[:,1] + sig[:,2]
+        p   = J1/3.0
+        S   = sig.copy()
+        S[:,:3] -= p[:,None]
+        t3  = S[:,3]/sr2;  t4  = S[:,4]/sr2;  t5  = S[:,5]/sr2
+        J2D = 0.5*S[:,0]*S[:,0] + 0.5*S[:,1]*S[:,1] + 0.5*S[:,2]*S[:,2] + t3*t3+ t4*t4 + t5*t5
+        srJ2D = J2D**0.5
+
+        V = numpy.tile([1., 1., 1., 0., 0., 0.], (len(sig), 1))
+        m = (p <= self.T) & (srJ2D != 0.0)
+        V[m] = self.alpha*tensor2.I + 0.5*S[m]/srJ2D[m,None]
+        return V
+
+    def stress_update_batch(self, state, deps):
+        """ Batched version of stress_update for n ips with the parameters of
+        this model. state is a dictionary with the arrays sig (n,6), eps
+        (n,6), plast (n,) and dg (n,), which are updated in place; deps is
+        the (n, 6) array of strain increments. Returns the stress increments.
+        """
+        FTOL = 1.0E-3
+        T    = self.T
+        sig  = numpy.asarray(state["sig"])
+        plast, dg = state["plast"], state["dg"]
+
+        state["eps"] += deps
+        sig_ini = sig.copy()
+        F = self.yield_func_batch(sig)
+        if (F>FTOL).any():
+            raise Exception("MatModelDruckerPrager.stress_update_batch: Invalid stress tensor at beginning of integration. F = ", F.max())
+
+        # Trial
+        D      = numpy.asarray(self.calcDe())
+        dsig   = numpy.dot(deps, D.T)
+        sig_tr = sig + dsig
+        p      = (sig_tr[:,0] + sig_tr[:,1] + sig_tr[:,2])/3.0
+
+        # Tension cut-off
+        cut = abs(p - T) < FTOL
+        if cut.any():
+            J1    = sig[cut,0] + sig[cut,1] + sig[cut,2]
+            J1_tr = sig_tr[cut,0] + sig_tr[cut,1] + sig_tr[cut,2]
+            beta  = (3*T - J1)/J1_tr
+            sig_int = sig[cut] + beta[:,None]*sig_tr[cut]
+            inside  = self.yield_func_batch(sig_int) <= 0
+            sig_int[~inside] = [T, T, T, 0., 0., 0.]
+            sig [cut] = sig_int
+            dsig[cut] = sig_int - sig_ini[cut]
+            plast[cut] = True
+            dg   [cut] = 0.00001
+
+        # Elastic integration
+        elastic = ~cut & (self.yield_func_batch(sig_tr) <= 0.0)
+        sig  [elastic] = sig_tr[elastic]
+        plast[elastic] = False
+        dg   [elastic] = 0.0
+
+        sig[:,:3] = numpy.minimum(sig[:,:3], T)
+
+        # Plastic integration
+        plastic = ~cut & ~elastic
+        if plastic.any():
+            plast[plastic] = True
+            s_tr = sig_tr[plastic]
+            DV   = numpy.dot(self.yield_deriv_batch(s_tr), D.T)
+
+            # Brackets start where the deviatoric part vanishes, see stress_update
+            a  = numpy.zeros(len(s_tr))
+            b  = numpy.sqrt((s_tr*s_tr).sum(axis=1))/numpy.sqrt((DV*DV).sum(axis=1))
+            J2D_v = J2D_batch(DV)
+            dev   = J2D_v>0.0
+            b[dev] = numpy.sqrt(J2D_batch(s_tr[dev])/J2D_v[dev])
+            fa = self.yield_func_batch(s_tr - a[:,None]*DV)
+            fb = self.yield_func_batch(s_tr - b[:,None]*DV)
+
+            m = fb>0.0
+            while m.any():
+                b [m] *= 1.2
+                fb[m]  = self.yield_func_batch(s_tr[m] - b[m,None]*DV[m])
+                if not numpy.isfinite(fb[m]).all():
+                    raise Exception("MatModelDruckerPrager.stress_update_batch: Return point not found")
+                m = fb>0.0
+
+            if (fa*fb>0).any():
+                raise Exception("MatModelDruckerPrager.stress_update_batch: Invalid root")
+
+            # Bisection iterations for all ips not yet converged
+            sig1 = s_tr.copy()
+            g    = a.copy()
+            m    = abs(fa)>FTOL
+            while m.any():
+                gm    = (a[m]+b[m])/2.0
+                s1    = s_tr[m] - gm[:,None]*DV[m]
+                fsig1 = self.yield_func_batch(s1)
+                g[m], sig1[m] = gm, s1
+
+                ma = fa[m]*fsig1>0.0
+                mb = fb[m]*fsig1>0.0
+                idx = numpy.flatnonzero(m)
+                a[idx[ma]] = gm[ma];  fa[idx[ma]] = fsig1[ma]
+                b[idx[mb]] = gm[mb];  fb[idx[mb]] = fsig1[mb]
+                m = abs(fa)>FTOL
+
+            dg[plastic] = g
+            sig1[:,:3]  = numpy.minimum(sig1[:,:3], T)
+
+            F = self.yield_func_batch(sig1)
+            if (F>FTOL).any():
+                raise Exception("MatModelDruckerPrager.stress_update_batch: Invalid stress tensor at end of integration. F = ", F.max())
+
+            sig [plastic] = sig1
+            dsig[plastic] = sig1 - sig_ini[plastic]
+
+        state["sig"][:] = sig
+        return dsig
+
+    def stiff_batch(self, state):
+        """ Returns the tangent stiffness (n, 6, 6) for n ips given the state
+        arrays sig (n,6), plast (n,) and dg (n,), as stiff() does for each ip.
+        """
+        sig   = numpy.asarray(state["sig"])
+        plast = numpy.asarray(state["plast"], dtype=bool)
+        De    = numpy.asarray(self.calcDe())
+
+        D = numpy.empty((len(sig), 6, 6))
+        D[:] = De
+        if not plast.any():
+            return D
+
+        V   = self.yield_deriv_batch(sig[plast])
+        DV  = numpy.dot(V, De)                # v.De = De.v
+        vDv = (DV*V).sum(axis=1)
+        Dp  = De - DV[:,:,None]*DV[:,None,:]/vDv[:,None,None]
+
+        if self.tangent == "consistent":
+            # Linearization of sig = sig_tr - dg*De.v(sig_tr) for returns to the
+            # cone: M = De - dg*De.dv/dsig.De, D = M - (De.v)x(M.v)/(v.De.v).
+            # The trial deviator is parallel to the final one with
+            # |S_tr| = |S| + dg*2G. Returns at the tension cut-off are kept.
+            s   = sig[plast]
+            dg  = numpy.asarray(state["dg"])[plast]
+            p   = s[:,:3].sum(axis=1)/3.0
+            S   = s.copy()
+            S[:,:3] -= p[:,None]
+            q   = (0.5*(S*S).sum(axis=1))**0.5
+            m   = (dg > 0.0) & (q > 0.0) & (p < self.T - 1.0E-3)
+            if m.any():
+                G    = self.E/(2.0*(1.0+self.nu))
+                I    = numpy.array([1., 1., 1., 0., 0., 0.])
+                P    = numpy.eye(6) - numpy.outer(I, I)/3.0
+                q_tr = q[m] + dg[m]*G
+                S_tr = S[m]*(q_tr/q[m])[:,None]
+                H    = P/(2.0*q_tr[:,None,None]) - S_tr[:,:,None]*S_tr[:,None,:]/(4.0*q_tr**3)[:,None,None]
+                M    = De - dg[m,None,None]*numpy.matmul(numpy.matmul(De, H), De)
+                Mv   = numpy.einsum("nij,nj->ni", M, V[m])
+                Dp[m] = M - DV[m,:,None]*Mv[:,None,:]/vDv[m,None,None]
+
+        D[plast] = Dp
+        return D
+
+    def get_batch_state(self):
+        """ Returns the state of this model as a batch of a single ip.
+        """
+        return { "sig"  : numpy.array([self.sig]),
+                 "eps"  : numpy.array([self.eps]),
+                 "plast": numpy.array([float(self.plast)]),
+                 "dg"   : numpy.array([self.dg]) }
+
     def stress_update2(self, deps):
         FTOL = 1.0E-4
         F    =  self.yield_func(self.sig)
@@ -418,6 +613,35 @@ class MatModelDruckerPrager(Model):
 
         return vals
 
+    def get_vals_batch(self, state):
+        """ Returns the values given by get_vals() for n ips at once from a
+        state with (n, 6) arrays.
+        """
+        sig = state["sig"]
+        eps = state["eps"]
+
+        vals = {}
+        if self.ndim==3:
+            sqrt2 = 2.0**0.5
+            vals["sxx"] = sig[:,0]
+            vals["syy"] = sig[:,1]
+            vals["szz"] = sig[:,2]
+            vals["sxy"] = sig[:,3]/sqrt2
+            vals["syz"] = sig[:,4]/sqrt2
+            vals["sxz"] = sig[:,5]/sqrt2
+            vals["exx"] = eps[:,0]
+            vals["eyy"] = eps[:,1]
+            vals["ezz"] = eps[:,2]
+            vals["exy"] = eps[:,3]/sqrt2
+            vals["eyz"] = eps[:,4]/sqrt2
+            vals["exz"] = eps[:,5]/sqrt2
+            vals["J1" ]   = J1_batch(sig)
+            vals["F" ]   = self.yield_func_batch(sig)
+            vals["J2D"] = J2D_batch(sig)
+            vals["srJ2D"] = vals["J2D"]**0.5
+
+        return vals
+
     def __str__(self, margin=""):
         sqrt2 = 2.0**0.5
         os = StringIO()
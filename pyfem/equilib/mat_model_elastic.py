@@ -7,6 +7,8 @@ Raul Durand 2010-2013.
 from pyfem.model import *
 
 class ModelLinElastic(Model):
+    state_vars = ("sig", "eps")
+    param_vars = ("E", "nu", "A")
 
     def __init__(self, *args, **kwargs):
         Model.__init__(self);
@@ -25,17 +27,6 @@ class ModelLinElastic(Model):
     def name(self):
         return "MatModelLinElastic"
 
-    def copy(self):
-        the_copy = ModelLinElastic()
-        the_copy.sig = self.sig.copy()
-        the_copy.eps = self.eps.copy()
-        the_copy.E   = self.E
-        the_copy.nu  = self.nu
-        the_copy.A   = self.A
-        the_copy.ndim  = self.ndim
-        the_copy.attr = self.attr.copy()
-        return the_copy
-
     def check(self):
         return True
 
@@ -54,18 +45,25 @@ class ModelLinElastic(Model):
         self.sig[5] = state.get("sxz", 0.0)*sqrt2
 
     def stiff(self):
+        if self.attr.get("plane_stress"):
+            return self.params.cached("De_ps", self.calcDe_ps)
+        return self.params.cached("De", self.calcDe)
+
+    def calcDe_ps(self):
+        E  = self.E
+        nu = self.nu
+        c  = E/(1.0-nu*nu)
+        return array([\
+                [ c    , c*nu , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [ c*nu ,    c , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 , c*(1.0-nu),        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ] ] )
+
+    def calcDe(self):
         E  = self.E
         nu = self.nu
-
-        if self.attr.get("plane_stress"):
-            c = E/(1.0-nu*nu)
-            return array([\
-                    [ c    , c*nu , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [ c*nu ,    c , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 , c*(1.0-nu),        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ] ] )
 
         # For plane strain and 3D:
         c = E/((1.0+nu)*(1.0-2.0*nu))
@@ -84,6 +82,7 @@ class ModelLinElastic(Model):
         return dsig
 
     def get_state(self):
+        sqrt2 = 2.0**0.5
         return {
                 "sxx" : self.sig[0],
                 "syy" : self.sig[1],
@@ -129,6 +128,33 @@ class ModelLinElastic(Model):
 
         return vals
 
+    def get_vals_batch(self, state):
+        """ Returns the values given by get_vals() for n ips at once from a
+        state with (n, 6) arrays.
+        """
+        sig = state["sig"]
+        eps = state["eps"]
+
+        sqrt2 = 2.0**0.5
+        vals = {}
+        vals["sxx"] = sig[:,0]
+        vals["syy"] = sig[:,1]
+        vals["szz"] = sig[:,2]
+        vals["sxy"] = sig[:,3]/sqrt2
+        vals["exx"] = eps[:,0]
+        vals["eyy"] = eps[:,1]
+        vals["ezz"] = eps[:,2]
+        vals["exy"] = eps[:,3]/sqrt2
+        vals["sig_m"] = (sig[:,0]+sig[:,1]+sig[:,2])/3.0
+
+        if self.ndim==3:
+            vals["syz"] = sig[:,4]/sqrt2
+            vals["sxz"] = sig[:,5]/sqrt2
+            vals["eyz"] = eps[:,4]/sqrt2
+            vals["exz"] = eps[:,5]/sqrt2
+
+        return vals
+
     def __str__(self, margin=""):
         os = StringIO()
         print >> os, margin, "<ModelLinElastic> (",
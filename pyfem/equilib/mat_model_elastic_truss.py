@@ -5,13 +5,15 @@ Raul Durand & Dorival Pedroso
 Copyright 2010-2013.
 """
 
-from copy import deepcopy
 from pyfem.model import *
 
 class ModelElasticTruss(Model):
     """ Constitutive models for Elastic 1D materials
     """
 
+    state_vars = ("s", "e", "sig")
+    param_vars = ("E", "A")
+
     #name = "ModelElasticTruss"
 
     def __init__(self, *args, **kwargs):
@@ -31,9 +33,6 @@ class ModelElasticTruss(Model):
             self.set_params(**data)
             self.set_state (**data)
 
-    def copy(self):
-        return deepcopy(self)
-
     def prime_and_check(self):
         pass
 
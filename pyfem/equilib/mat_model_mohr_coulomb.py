@@ -1,22 +1,29 @@
+import numpy
+
 from pyfem.model import *
 from pyfem.tools.tensor import *
-from math import copysign
 from math import sin
 from math import cos
 from math import tan
+from math import pi
 
-class ParamsMohrCoulomb:
+class ParamsMohrCoulomb(ModelParams):
     def __init__(self, **params):
+        ModelParams.__init__(self)
         self.E   = params.get("E", 0.0)
         self.nu  = params.get("nu", 0.0)
         self.phi = params.get("phi", 0.0)
         self.coh = params.get("C", params.get("c", 0.0))
         self.a   = self.coh/5.*0
+        self.tangent = params.get("tangent", "consistent")
         assert self.nu>=0.0 and self.nu<0.5
         assert self.E>0
         assert self.phi>0
         assert self.coh>0
+        if self.tangent not in ("consistent", "continuum"):
+            raise Exception("ParamsMohrCoulomb: Invalid tangent: " + str(self.tangent))
         self.De = self.calcDe()
+        self.calc_return_data()
 
     def calcDe(self):
         E  = self.E
@@ -31,7 +38,94 @@ class ParamsMohrCoulomb:
                 [  0.0 ,        0.0 ,       0.0 ,            0.0, c*(1.0-2.0*nu),            0.0 ], \
                 [  0.0 ,        0.0 ,       0.0 ,            0.0,            0.0, c*(1.0-2.0*nu) ]] )
 
+    def calc_return_data(self):
+        """ Computes the data used by the return mapping in principal stress
+        space. Principal values are in ascending order (s3, s2, s1), thus the
+        yield function is f = N.sp - 2*c*cos(phi) with N = [-1+sin(phi), 0,
+        1+sin(phi)]. Returns are labeled: 1 main plane, 2 edge s1=s2, 3 edge
+        s2=s3 and 4 apex. Dp[ret] is the principal consistent tangent.
+        """
+        E   = self.E
+        nu  = self.nu
+        sph = sin(self.phi)
+        K   = E/(3.0*(1.0-2.0*nu))
+        G   = E/(2.0*(1.0+nu))
+        self.G   = G
+        self.fc  = 2.*self.coh*cos(self.phi)
+        self.p_apex = self.coh*cos(self.phi)/sph
+        self.De3 = numpy.array([\
+                [ K+4.*G/3., K-2.*G/3., K-2.*G/3. ], \
+                [ K-2.*G/3., K+4.*G/3., K-2.*G/3. ], \
+                [ K-2.*G/3., K-2.*G/3., K+4.*G/3. ]])
+
+        Na  = numpy.array([ -1.+sph,     0.0, 1.+sph ])
+        N12 = numpy.array([ -1.+sph,  1.+sph,    0.0 ]) # s1=s2 edge: f = s2-s3 + (s2+s3)*sin(phi) - fc
+        N23 = numpy.array([     0.0, -1.+sph, 1.+sph ]) # s2=s3 edge: f = s1-s2 + (s1+s2)*sin(phi) - fc
+
+        self.Na = Na
+        self.Aa = self.De3.dot(Na)
+        self.Dp = [ self.De3, self.De3 - numpy.outer(self.Aa, self.Aa)/Na.dot(self.Aa) ]
+
+        # Two-surface returns at edges
+        self.Nm = {}
+        self.Am = {}
+        self.Ai = {}
+        for ret, Nb in ((2, N12), (3, N23)):
+            Nm = numpy.array([Na, Nb])
+            Am = Nm.dot(self.De3)
+            Ai = inv(Am.dot(Nm.T))
+            self.Nm[ret], self.Am[ret], self.Ai[ret] = Nm, Am, Ai
+            self.Dp.append(self.De3 - Am.T.dot(Ai).dot(Am))
+
+        # Perfectly plastic apex
+        self.Dp.append(numpy.zeros((3,3)))
+
+
+def principal_batch(sig):
+    """ Returns the principal values (n, 3) in ascending order and the
+    eigenvectors (n, 3, 3) for n stress states given as an (n, 6) array.
+    """
+    sr2 = 1.414213562373
+    M = numpy.empty((len(sig), 3, 3))
+    M[:,0,0] = sig[:,0]
+    M[:,1,1] = sig[:,1]
+    M[:,2,2] = sig[:,2]
+    M[:,0,1] = M[:,1,0] = sig[:,3]/sr2
+    M[:,1,2] = M[:,2,1] = sig[:,4]/sr2
+    M[:,0,2] = M[:,2,0] = sig[:,5]/sr2
+    return numpy.linalg.eigh(M)
+
+
+def principal_basis_batch(V):
+    """ Returns the orthogonal matrices Q (n, 6, 6) that map tensors given
+    in the principal frame to the global frame in Mandel notation. Columns 0-2
+    are the eigenprojections and columns 3-5 the shear bases of the pairs
+    (0,1), (1,2) and (0,2).
+    """
+    sr2 = 1.414213562373
+    Q = numpy.empty((len(V), 6, 6))
+    for k in range(3):
+        v = V[:,:,k]
+        Q[:,0,k] = v[:,0]*v[:,0]
+        Q[:,1,k] = v[:,1]*v[:,1]
+        Q[:,2,k] = v[:,2]*v[:,2]
+        Q[:,3,k] = sr2*v[:,0]*v[:,1]
+        Q[:,4,k] = sr2*v[:,1]*v[:,2]
+        Q[:,5,k] = sr2*v[:,0]*v[:,2]
+    for k, (a, b) in enumerate(((0,1), (1,2), (0,2))):
+        va = V[:,:,a]
+        vb = V[:,:,b]
+        Q[:,0,3+k] = sr2*va[:,0]*vb[:,0]
+        Q[:,1,3+k] = sr2*va[:,1]*vb[:,1]
+        Q[:,2,3+k] = sr2*va[:,2]*vb[:,2]
+        Q[:,3,3+k] = va[:,0]*vb[:,1] + vb[:,0]*va[:,1]
+        Q[:,4,3+k] = va[:,1]*vb[:,2] + vb[:,1]*va[:,2]
+        Q[:,5,3+k] = va[:,0]*vb[:,2] + vb[:,0]*va[:,2]
+    return Q
+
+
 class MatModelMohrCoulomb(Model):
+    state_vars = ("sig", "eps", "plast", "sig_tr", "ret")
 
     def __init__(self, *args, **kwargs):
         Model.__init__(self);
@@ -42,6 +136,8 @@ class MatModelMohrCoulomb(Model):
         #self.phi = 0.0
         #self.coh = 0.0
         self.plast = False
+        self.sig_tr = tensor2() # trial stress of the last update
+        self.ret    = 0         # return type of the last update
         self.params = None
 
         if args: data = args[0]
@@ -55,20 +151,12 @@ class MatModelMohrCoulomb(Model):
     def name(self):
         return "MatModelMohrCoulomb"
 
-    def copy(self):
-        cp     = self.__class__()
-        cp.sig = self.sig.copy()
-        cp.eps = self.eps.copy()
-        cp.params = self.params # Shared parameters data
-        #cp.E   = self.E  
-        #cp.nu  = self.nu 
-        #cp.phi = self.phi
-        #cp.coh = self.coh
-        #cp.a   = self.a
-        cp.plast = self.plast
-        cp.ndim  = self.ndim
-        cp.attr  = self.attr.copy()
-        return cp
+    def same_params(self, other):
+        """ Returns True if other has the same parameters as this model.
+        """
+        if self.__class__ is not other.__class__: return False
+        p, q = self.params, other.params
+        return p is q or (p.E, p.nu, p.phi, p.coh, p.tangent) == (q.E, q.nu, q.phi, q.coh, q.tangent)
 
     def prime_and_check(self):
         #self.calcDe_()
@@ -116,43 +204,6 @@ class MatModelMohrCoulomb(Model):
         #OUT("f")
         return f
 
-    def yield_deriv(self):
-        """ Returns the yield function derivatives
-            df/dsig = df/ds1 * ds1/dsig  +  df/ds3 * ds3/dsig
-
-            beta = (s1+s3 - 2*cot(phi))**0.5
-            df/ds1 =  1 - sin(phi)*dbeta/ds1
-            df/ds3 = -1 - sin(phi)*dbeta/ds3
-            dbeta/ds1 = dbeta/ds3 = 1/beta * (s1+s3 -2*c*cot(phi))
-
-            ds1/dsig = p1 = e1(x)e1 <-- Eigenprojector
-            ds3/dsig = p3 = e3(x)e3
-        """
-        coh = self.params.coh
-        phi = self.params.phi
-        a   = self.params.a
-
-        sp, Vp = self.sig.principal()
-        s1 = sp[2]
-        s3 = sp[0]
-        e1 = Vp[:,2]
-        e3 = Vp[:,0]
-        #p1 = ndarray.dot(e1[None].T, e1[None])
-        #p3 = ndarray.dot(e3[None].T, e3[None])
-        #OUT("s1","e1")
-        #OUT("s3","e3")
-        p1 = dyad(e1,e1)
-        p3 = dyad(e3,e3)
-
-        return (1.+sin(phi))*p1 +(-1.+sin(phi))*p3
-
-        # _2c_cot_phi = 2.*coh/tan(phi)
-        # beta = ((s1+s3 - _2c_cot_phi)**2 - a**2)**0.5 
-        # dbeta_ds1 = 1./beta * (s1+s3 - _2c_cot_phi)
-        # df_ds1 =  1. - sin(phi)*dbeta_ds1
-        # df_ds3 = -1. - sin(phi)*dbeta_ds1
-        # return df_ds1*p1 + df_ds3*p3
-
     #def calcDe(self):
     #    E  = self.E
     #    nu = self.nu
@@ -167,140 +218,151 @@ class MatModelMohrCoulomb(Model):
     #            [  0.0 ,        0.0 ,       0.0 ,            0.0,            0.0, c*(1.0-2.0*nu) ]] )
 
 
-    def stiff(self):
-        # Elastic stiffness
-        #De = self.calcDe()
-        De = self.params.De
-        if not self.plast:
-            return De
-
-        # Plastic stiffness
-        v = self.yield_deriv() # Derivatives
+    def invariants_batch(self, sig):
+        """ Returns the mean stress p, the deviatoric stress q and the Lode
+        angle theta in [0, pi/3] for n stress states given as an (n, 6) array.
+        """
+        sr2 = 1.414213562373
+        p   = (sig[:,0] + sig[:,1] + sig[:,2])/3.0
+        s0  = sig[:,0] - p;  s1  = sig[:,1] - p;  s2  = sig[:,2] - p
+        s3  = sig[:,3]/sr2;  s4  = sig[:,4]/sr2;  s5  = sig[:,5]/sr2
+        J2D = 0.5*(s0*s0 + s1*s1 + s2*s2) + s3*s3 + s4*s4 + s5*s5
+        J3D = s0*(s1*s2 - s4*s4) - s3*(s3*s2 - s4*s5) + s5*(s3*s4 - s1*s5)
+        q   = (3.0*J2D)**0.5
+
+        c3t = numpy.zeros(len(sig))
+        m   = J2D > 1.0E-10
+        c3t[m] = 1.5*3.0**0.5*J3D[m]/J2D[m]**1.5
+        theta  = numpy.arccos(numpy.clip(c3t, -1.0, 1.0))/3.0
+        return p, q, theta
+
+    def yield_func_batch(self, sig):
+        """ Returns the yield function for n stress states (n, 6) in terms of
+        p, q and the Lode angle:
+            f = 2q/sqrt(3)*sin(theta+pi/3) + (2p + 2q/3*cos(theta+pi/3))*sin(phi) - 2c*cos(phi)
+        """
+        P = self.params
+        p, q, theta = self.invariants_batch(sig)
+        t = theta + pi/3.
+        return 2.*q/3.**0.5*numpy.sin(t) + (2.*p + 2.*q/3.*numpy.cos(t))*sin(P.phi) - P.fc
+
+    def stress_update_batch(self, state, deps):
+        """ Updates n ips with the parameters of this model using a return
+        mapping in principal stress space. state is a dictionary with the
+        arrays sig, eps, sig_tr (n,6), plast and ret (n,), which are updated
+        in place; deps is the (n, 6) array of strain increments. Ips are
+        returned to the main plane, to one of the edges or to the apex using
+        masks. Returns the stress increments.
+        """
+        P    = self.params
+        sig  = state["sig"]
+        state["eps"] += deps
+
+        sig_ini = sig.copy()
+        sig_tr  = sig + numpy.dot(deps, P.De.T)
+        state["sig_tr"][:] = sig_tr
+
+        ret = numpy.zeros(len(sig))
+        sig[:] = sig_tr
+        plastic = numpy.flatnonzero(self.yield_func_batch(sig_tr) > 0.0)
+        if len(plastic):
+            sp_tr, V = principal_batch(sig_tr[plastic])
+            f_tr = sp_tr.dot(P.Na) - P.fc
+            TOL  = 1.0E-10*numpy.abs(sp_tr).max(axis=1).clip(1.0)
+
+            # Main plane return
+            sp = sp_tr - numpy.outer(f_tr/P.Na.dot(P.Aa), P.Aa)
+            r  = numpy.ones(len(sp), dtype=int)
+
+            # Edge returns where the principal order is lost
+            sph = sin(P.phi)
+            bad = (sp[:,2]-sp[:,1] < -TOL) | (sp[:,1]-sp[:,0] < -TOL)
+            r[bad] = numpy.where((1.-sph)*sp_tr[bad,2] - 2.*sp_tr[bad,1] + (1.+sph)*sp_tr[bad,0] < 0.0, 2, 3)
+            for k in (2, 3):
+                m = numpy.flatnonzero(r==k)
+                if not len(m): continue
+                fm = sp_tr[m].dot(P.Nm[k].T) - P.fc
+                dg = fm.dot(P.Ai[k].T)
+                sp[m] = sp_tr[m] - dg.dot(P.Am[k])
+
+            # Apex return where edge returns are beyond the apex
+            bad = (r>1) & ((sp[:,2]-sp[:,1] < -TOL) | (sp[:,1]-sp[:,0] < -TOL) | (sp.sum(axis=1)/3. > P.p_apex))
+            r [bad] = 4
+            sp[bad] = P.p_apex
+
+            Q = principal_basis_batch(V)
+            sig[plastic] = numpy.einsum("nij,nj->ni", Q[:,:,:3], sp)
+            ret[plastic] = r
+
+        state["ret"][:]   = ret
+        state["plast"][:] = ret>0
+        return sig - sig_ini
+
+    def stiff_batch(self, state):
+        """ Returns the tangent (n, 6, 6) for n ips from the state arrays sig,
+        sig_tr and ret left by stress_update_batch. With tangent="continuum"
+        the elastoplastic tangent of the main plane is used for all plastic
+        ips instead of the consistent one.
+        """
+        P   = self.params
+        ret = numpy.asarray(state["ret"]).astype(int)
+        D   = numpy.empty((len(ret), 6, 6))
+        D[:] = P.De
+
+        plastic = numpy.flatnonzero(ret>0)
+        if not len(plastic):
+            return D
+
+        sp_tr, V = principal_batch(numpy.asarray(state["sig_tr"])[plastic])
+        Q  = principal_basis_batch(V)
+        sp = numpy.einsum("nji,nj->ni", Q[:,:,:3], numpy.asarray(state["sig"])[plastic])
+
+        Dp = numpy.zeros((len(plastic), 6, 6))
+        if P.tangent == "continuum":
+            Dp[:,:3,:3] = P.Dp[1]
+            for k in range(3):
+                Dp[:,3+k,3+k] = 2.*P.G
+            D[plastic] = numpy.matmul(numpy.matmul(Q, Dp), Q.transpose(0,2,1))
+            return D
+
+        Dp[:,:3,:3] = numpy.array(P.Dp)[ret[plastic]]
+
+        # Shear terms from the rotation of the principal directions
+        for k, (a, b) in enumerate(((0,1), (1,2), (0,2))):
+            dtr = sp_tr[:,a] - sp_tr[:,b]
+            lim = Dp[:,a,a] - Dp[:,a,b]
+            m   = abs(dtr) > 1.0E-10*numpy.abs(sp_tr).max(axis=1).clip(1.0)
+            Dp[:,3+k,3+k] = lim
+            Dp[m,3+k,3+k] = 2.*P.G*(sp[m,a] - sp[m,b])/dtr[m]
+
+        D[plastic] = numpy.matmul(numpy.matmul(Q, Dp), Q.transpose(0,2,1))
+        return D
+
+    def get_batch_state(self):
+        """ Returns the state of this model as a batch of a single ip.
+        """
+        return { "sig"   : array([self.sig]),
+                 "eps"   : array([self.eps]),
+                 "plast" : array([float(self.plast)]),
+                 "sig_tr": array([self.sig_tr]),
+                 "ret"   : array([float(self.ret)]) }
 
-        Dep = De - (De.dot(v)).dyad(v.dot(De)) / (v.dot(De)).dot(v)
-        return Dep
+    def stiff(self):
+        return tensor4(self.stiff_batch(self.get_batch_state())[0])
             
     def stiff_coef(self):
         return 1.0;
 
-    def find_intersection(self, sig_ini, dsig):
-        sig0  = sig_ini.copy()
-        aint = 0.0
-        coef = 1.0
-        F    = self.yield_func(sig0)
-        F2   = self.yield_func(sig0+dsig)
-
-        # Bissection method
-        if F*F2>0.0:
-            raise Exception("MatModelMohrCoulomb.find_intersection: Invalid segment with F = ", F, "and", F2)
-
-        MAXIT = 50
-        TOL   = 1.0E-5
-        sigm  = self.sig.trace()/3.0
-        DEN   = max(1.0, abs(sigm))
-        dire  = -copysign(1.0, F)
-        for i in range(MAXIT):
-            coef  = -copysign(0.5*coef, F)
-            aint += dire*coef
-            sig0 = sig_ini + aint*dsig
-            F = self.yield_func(sig0)
-            #OUT("F", "coef", "aint")
-            if abs(F)/DEN < TOL and F > 0.0: 
-                return aint, sig0
-        else:
-            raise Exception("MatModelMohrCoulombJoint.stress_update: Yield function intersection not found")
-
     def stress_update(self, deps):
-        FTOL = 1.0E-4
-        F    =  self.yield_func(self.sig)
-        if F>FTOL:
-            OUT("self.sig")
-            raise Exception("MatModelMohrCoulomb.stress_update: Invalid stress tensor at beginning of integration. F = ", F)
-
-        # Check trial
-        D = self.params.De
-        dsig   = D.dot(deps)     # dsig = D . deps
-        sig_tr = self.sig + dsig # sig_tr = sig + dsig;
-
-        # Elastic integration
-        if self.yield_func(sig_tr) <= 0.0:
-            self.sig  = sig_tr
-            self.eps += deps
-            self.plast = False
-            return dsig
-
-        # Finding intersection and elastic integration
-        sig_ini = self.sig.copy()
-        if F < 0.0:
-            aint, self.sig = self.find_intersection(sig_ini, dsig)
-            # Elastic integration
-            deps_e = aint*deps
-            self.eps += deps_e
-        else:
-            deps_e  = tensor2()
-
-        #OUT('self.yield_func(self.sig)')
-
-        # Plastic integration FE
-        self.plast = True;
-        NINCS      = 20
-        deps_inc   = (deps - deps_e)/NINCS
-
-        print "xxxxxxxxxxxx"
-        for i in range(NINCS):
-            D = self.stiff()
-            dsig      = D.dot(deps_inc)
-            self.eps += deps_inc
-            self.sig += dsig
-            OUT('self.yield_func(self.sig)')
-
-        # Modified Euler steps
-        #for i in range(NINCS):
-        #    sig_bk = self.sig.copy()
-        #    D0 = self.stiff()
-        #    dsig      = D0.dot(deps_inc)
-        #    self.sig += dsig
-        #    D1 = self.stiff()
-        #    D = 0.5*(D0 + D1)
-        #    dsig      = D.dot(deps_inc)
-        #    self.sig = sig_bk + dsig
-
-        #    self.eps += deps_inc
-        #    #self.sig += dsig
-        #    #OUT('self.yield_func(self.sig)')
-
-        # Return algorithm
-        F = self.yield_func(self.sig)
-        if F>FTOL:
-            # Find a point inside the plastification function
-            v = self.yield_deriv()
-            b = 1.0E-4
-            MAXIT = 20
-            #F = self.yield_func(sig_tr)
-            #for i in range(MAXIT):
-            #    sig_tr = self.sig - b*v
-            #    F = self.yield_func(sig_tr)
-            #    OUT("F")
-            #    b *= 1.1
-            #    if F<0.0: break
-            #else:
-            #    raise Exception("MatModelMohrCoulomb.stress_update: Return algorithm failed")
-            #aint, self.sig = self.find_intersection(sig_tr, self.sig-sig_tr)
-
-            #sigh = self.sig.trace()*tensor2.I
-            sigh = (self.sig.trace()/3.)*tensor2.I
-            #sigh = (self.sig.trace()/3.)/1.732*tensor2.I
-
-            #OUT('self.yield_func(sigh)')
-            sig_tr = sigh - self.sig
-            #print v
-            #print sig_tr
-            aint, self.sig = self.find_intersection(self.sig, sig_tr)
-            #OUT('self.yield_func(self.sig)')
-        
-        dsig = self.sig - sig_ini;
-        return dsig
-    
+        state = self.get_batch_state()
+        dsig  = self.stress_update_batch(state, array([deps], dtype=float))
+        self.sig    = tensor2(state["sig"][0])
+        self.eps    = tensor2(state["eps"][0])
+        self.sig_tr = tensor2(state["sig_tr"][0])
+        self.ret    = int(state["ret"][0])
+        self.plast  = self.ret>0
+        return tensor2(dsig[0])
+
     def get_vals(self):
         sig = self.sig
         eps = self.eps
@@ -335,6 +397,34 @@ class MatModelMohrCoulomb(Model):
 
         return vals
 
+    def get_vals_batch(self, state):
+        """ Returns the values given by get_vals() for n ips at once from a
+        state with (n, 6) arrays.
+        """
+        sig = state["sig"]
+        eps = state["eps"]
+
+        vals = {}
+        if self.ndim==3:
+            sqrt2 = 2.0**0.5
+            vals["sxx"] = sig[:,0]
+            vals["syy"] = sig[:,1]
+            vals["szz"] = sig[:,2]
+            vals["sxy"] = sig[:,3]/sqrt2
+            vals["syz"] = sig[:,4]/sqrt2
+            vals["sxz"] = sig[:,5]/sqrt2
+            vals["exx"] = eps[:,0]
+            vals["eyy"] = eps[:,1]
+            vals["ezz"] = eps[:,2]
+            vals["exy"] = eps[:,3]/sqrt2
+            vals["eyz"] = eps[:,4]/sqrt2
+            vals["exz"] = eps[:,5]/sqrt2
+            vals["sig_m"] = sig[:,0]+sig[:,1]+sig[:,2]
+            vals["J1" ]   = J1_batch(sig)
+            vals["srJ2D"] = J2D_batch(sig)**0.5
+
+        return vals
+
     def __str__(self, margin=""):
         sqrt2 = 2.0**0.5
         os = StringIO()
@@ -5,6 +5,8 @@ from math import pi
 
 class MatModelMohrCoulombJoint(Model):
     name = "MatModelMohrCoulombJoint"
+    state_vars = ("sig", "eps", "z")
+    param_vars = ("Ks", "Kn", "Dm", "C", "phi", "H", "h")
 
     def __init__(self, *args, **kwargs):
         Model.__init__(self);
@@ -25,23 +27,6 @@ class MatModelMohrCoulombJoint(Model):
             self.set_params(**data)
             self.set_state(**data)
 
-    def copy(self):
-        cp = MatModelMohrCoulombJoint()
-        cp.ndim = self.ndim
-        cp.sig = self.sig.copy()
-        cp.eps = self.eps.copy()
-        cp.Ks  = self.Ks
-        cp.Kn  = self.Kn
-        cp.Dm  = self.Dm
-        cp.C   = self.C
-        cp.phi = self.phi
-        cp.z   = self.z
-        cp.H   = self.H
-        cp.attr = self.attr.copy()
-
-        cp.h   = self.h
-        return cp
-
     def prime_and_check(self):
         pass
 
@@ -64,6 +49,9 @@ class MatModelMohrCoulombJoint(Model):
         return abs(tau) - self.C - sign_*tan(self.phi) + self.z
 
     def calcDe(self):
+        return self.params.cached(("De", self.ndim), self.calcDe_)
+
+    def calcDe_(self):
         Ks  = self.Ks
         Kn  = self.Kn
         if self.ndim==2:
@@ -83,6 +71,9 @@ class MatModelMohrCoulombJoint(Model):
         H   = self.H
         F   = self.yield_func(tau)
 
+        # With H = 1e-15*Ks the shear response is perfectly plastic: the
+        # substepped update keeps tau on the yield surface, thus Ksep ~ 0 is
+        # also its algorithmic tangent and no tangent option is needed
         if F < -1.0E-5:
             Ksep = Ks
         else:
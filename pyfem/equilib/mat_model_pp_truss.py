@@ -5,7 +5,6 @@ Raul Durand & Dorival Pedroso
 Copyright 2010-2013.
 """
 
-from copy import deepcopy
 from math import tan, copysign
 
 from pyfem.model import *
@@ -14,6 +13,9 @@ class ModelPPTruss(Model):
     """ Constitutive models for Elastic Plastic 1D materials
     """
 
+    state_vars = ("s", "e", "e_pa", "dg", "sig")
+    param_vars = ("E", "A", "H", "s_y0", "COEF")
+
     #name = "ModelPPTruss"
 
     def __init__(self, *args, **kwargs):
@@ -37,9 +39,6 @@ class ModelPPTruss(Model):
             self.set_params(**data)
             self.set_state (**data)
 
-    def copy(self):
-        return deepcopy(self)
-
     def prime_and_check(self):
         pass
 
@@ -83,6 +82,7 @@ class ModelPPTruss(Model):
         if self.dg==0.:
             return self.E
         else:
+            # dσ/dε of the return σ = σtr - E*Δγ with Δγ = ftr/(E+H)
             E = self.E
             H = self.H
             return E*H/(E+H)
@@ -11,6 +11,8 @@ from math import copysign
 
 class ModelPPTruss(Model):
     name = "ModelPPTruss"
+    state_vars = ("sig", "eps", "z")
+    param_vars = ("E", "A", "sig_max", "H")
 
     def __init__(self, *args, **kwargs):
         Model.__init__(self);
@@ -29,9 +31,6 @@ class ModelPPTruss(Model):
             self.set_params(**data)
             self.set_state(**data)
 
-    def copy(self):
-        return deepcopy(self)
-
     def prime_and_check(self):
         pass
 
@@ -73,7 +72,7 @@ class ModelPPTruss(Model):
             return dsig
 
         # Finding intersection and elastic integration
-        sig_ini = self.sig
+        sig_ini = self.sig.copy()
         aint    = 0.0
         F = self.yield_func(self.sig)
 
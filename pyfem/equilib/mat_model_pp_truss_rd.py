@@ -11,6 +11,8 @@ from math import copysign
 
 class ModelPPTruss(Model):
     name = "ModelPPTruss"
+    state_vars = ("sig", "eps")
+    param_vars = ("E", "A", "sig_y", "H", "TOL")
 
     def __init__(self, *args, **kwargs):
         Model.__init__(self);
@@ -29,9 +31,6 @@ class ModelPPTruss(Model):
             self.set_params(**data)
             self.set_state (**data)
 
-    def copy(self):
-        return deepcopy(self)
-
     def prime_and_check(self):
         pass
 
@@ -44,7 +43,7 @@ class ModelPPTruss(Model):
         if self.E    <=0.0: raise Exception("ModelPPTruss:: Invalid value for E.")
 
     def set_state(self, **state):
-        if "sa" in state: self.sig[0] = state["sa"]
+        if "sa" in state: self.sig = state["sa"]
 
     def yield_func(self, sig):
         return abs(sig) - self.sig_y
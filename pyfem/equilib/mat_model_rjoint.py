@@ -8,11 +8,12 @@ Copyright 2010-2013.
 from math import tan
 from math import copysign
 from math import pi
-from copy import deepcopy
 
 from pyfem.model import *
 
 class MatModelMohrCoulombJoint(Model):
+    state_vars = ("sig", "eps", "w_pa", "dg")
+    param_vars = ("ks", "kh", "Kn", "Dm", "C", "mu", "h")
     name = "MatModelMohrCoulombJoint"
 
     def __init__(self, *args, **kwargs):
@@ -40,9 +41,6 @@ class MatModelMohrCoulombJoint(Model):
             self.set_params(**data)
             self.set_state(**data)
 
-    def copy(self):
-        return deepcopy(self)
-
     def prime_and_check(self):
         if self.ndim==2 and self.sig.size==3:
             self.sig = array([self.sig[0], self.sig[1]])
@@ -72,8 +70,8 @@ class MatModelMohrCoulombJoint(Model):
 
     def get_state(self):
         return {
-                "sig"  : self.sig,
-                "eps"  : self.eps,
+                "sig"  : self.sig.copy(),
+                "eps"  : self.eps.copy(),
                 "w_pa" : self.w_pa,
                 "dg"   : self.dg,
                 "sigc" : self.sigc
@@ -86,28 +84,20 @@ class MatModelMohrCoulombJoint(Model):
         return f
 
     def calcDe(self):
-        ks  = self.ks
-        Kn  = self.Kn
-        if self.ndim==2:
-            return  array([\
-                    [   ks, 0.0 ], \
-                    [  0.0,   Kn ] ] )
-        else:
-            return  array([\
-                    [   ks, 0.0, 0.0 ], \
-                    [  0.0,  Kn, 0.0 ], \
-                    [  0.0, 0.0,  Kn ]])
+        return self.params.cached(("De", self.ndim), lambda: self.calcD(self.ks))
 
     def stiff(self):
+        if self.dg == 0.0:
+            return self.calcDe()
+
+        # With linear hardening the continuum and the consistent tangents
+        # of the 1D return are the same
         ks  = self.ks
         kh  = self.kh
-        Kn  = self.Kn
-
-        if self.dg == 0.0:
-            Ksep = ks
-        else:
-            Ksep = ks*kh/(ks + kh)
+        return self.params.cached(("Dep", self.ndim), lambda: self.calcD(ks*kh/(ks + kh)))
 
+    def calcD(self, Ksep):
+        Kn  = self.Kn
         if self.ndim==2:
             return  array([\
                     [ Ksep, 0.0 ], \
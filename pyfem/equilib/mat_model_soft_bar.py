@@ -4,6 +4,8 @@ from math import copysign
 
 class ModelPlasticBar(Model):
     name = "ModelPlasticBar"
+    state_vars = ("sig", "eps", "z")
+    param_vars = ("E", "A", "sig_max", "H")
 
     def __init__(self, *args, **kwargs):
         Model.__init__(self);
@@ -22,19 +24,6 @@ class ModelPlasticBar(Model):
             self.set_params(**data)
             self.set_state(**data)
 
-    def copy(self):
-        cp = self.__class__()
-        cp.sig  = self.sig.copy()
-        cp.eps  = self.eps.copy()
-        cp.E    = self.E  
-        cp.A    = self.A  
-        cp.ndim = self.ndim
-        cp.z    = self.z  
-        cp.H    = self.H  
-        cp.sig_max = self.sig_max
-        cp.attr    = self.attr.copy()
-        return cp
-
     def prime_and_check(self):
         pass
 
@@ -79,7 +68,7 @@ class ModelPlasticBar(Model):
 
 
         # Finding intersection and elastic integration
-        sig_ini = self.sig
+        sig_ini = self.sig.copy()
         aint    = 0.0
         F = self.yield_func(self.sig)
 
@@ -5,7 +5,6 @@ import math
 from scipy.sparse import lil_matrix
 from scipy import *
 import scipy
-from scipy.sparse.linalg import factorized
 
 class SolverEq(Solver):
     def __init__(self):
@@ -21,7 +20,6 @@ class SolverEq(Solver):
         self.G12 = None
         self.G21 = None
         self.G22 = None
-        self.LUsolver = None
         self.plane_stress = False
         self.gamma = 0.5
         self.beta  = 0.25
@@ -71,6 +69,9 @@ class SolverEq(Solver):
                 else:
                     self.udofs.append(dof)
 
+        # Optional bandwidth/fill reducing order of unknowns
+        self.renumber_udofs()
+
         self.dofs = []
         for dof in self.udofs:
             self.dofs.append(dof)
@@ -260,9 +261,8 @@ class SolverEq(Solver):
         RHS2 = self.G22*Ua2  #sparse matrix * dense vector
         if nu:
             if self.verbose and nu>500: print "solving...", ; sys.stdout.flush()
-            if scheme == "MNR" and decompose   : self.LUsolver = factorized(self.G11)
-            if scheme == "NR" or scheme == "FE": self.LUsolver = factorized(self.G11)
-            U1 = scipy.sparse.linalg.spsolve(self.G11, RHS1 - self.G12*Ua2)
+            if decompose: self.linear_solver.set_matrix(self.G11)
+            U1 = self.linear_solver.solve(RHS1 - self.G12*Ua2)
             RHS2 += self.G21*Ua1
 
         # updating disp, vel and accel
@@ -1,5 +1,7 @@
 from pyfem.solver import *
 from pyfem.tools.matvec import *
+from pyfem.tools.assembler import *
+from pyfem.elem_group import *
 from elem_model_eq import *
 import math
 from scipy.sparse import lil_matrix
@@ -7,7 +9,6 @@ from scipy import *
 import scipy
 
 from numpy import linalg
-from scipy.sparse.linalg import factorized
 import time, datetime
 
 def secs2time(secs):
@@ -26,19 +27,91 @@ class SolverEq(Solver):
         self.name = "SolverEq"
         self.DU = None
         self.DF = None
-        self.K  = None
         self.K11 = None
         self.K12 = None
         self.K21 = None
         self.K22 = None
-        self.LUsolver = None
+        self.assembler = None
+        self.elem_groups = []
+        self.other_elems = []
         self.plane_stress = False
         self.nmaxits = 100
+        self.nits    = 0 # NR iterations in last solve
+
+        # Automatic increments
+        self.auto_incs   = False
+        self.dlam_min    = 1.0E-4 # minimum increment of the load factor
+        self.dlam_max    = 1.0    # maximum increment of the load factor
+        self.nits_fast   = 4      # increments converged within nits_fast iterations are enlarged
+        self.nits_inc    = 20     # maximum iterations per increment before a cutback
+        self.growth      = 1.5
+        self.inc_history = []     # (load factor, increment, iterations) of accepted increments
+        self.inc_stats   = []     # iterations, factorizations and time of each increment
+
+        # BFGS scheme and line search
+        self.bfgs_pairs = []
+        self.line_search = False
+        self.ls_tol      = 0.8    # tolerance on the energy residual relative to the initial one
+        self.ls_nmaxits  = 4
+        self.ls_min      = 0.1
+        self.ls_max      = 2.0
+
+        # Arc-length method for limit analyses
+        self.psi       = 0.0      # load term of the arc-length constraint, 0 for cylindrical
+        self.dl_min    = 1.0E-3   # minimum arc length relative to the first one
+        self.dl_max    = 100.0    # maximum arc length relative to the first one
+        self.stiff_tol = 1.0E-3   # minimum stiffness of the path relative to the initial one
+        self.nmaxsteps = 200
+        self.limit_factor = None
         self.time0 = time.time()
 
     def time(self):
         return secs2time(time.time() - self.time0)
 
+    def set_auto_incs(self, auto=True, dlam_min=1.0E-4, dlam_max=1.0, nits_fast=4, nits_inc=20, growth=1.5):
+        """ Enables automatic increments for the NR, MNR and BFGS schemes. The stage
+        starts with an increment of 1/nincs of the load. Increments that fail
+        to converge within nits_inc iterations are restored and halved; the
+        increment is enlarged by growth after convergence within nits_fast
+        iterations. Increments are kept within dlam_min and dlam_max.
+        """
+        if dlam_min<=0.0 or dlam_max<dlam_min:
+            raise Exception("SolverEq.set_auto_incs: Invalid increment limits")
+        self.auto_incs = auto
+        self.dlam_min  = dlam_min
+        self.dlam_max  = dlam_max
+        self.nits_fast = nits_fast
+        self.nits_inc  = nits_inc
+        self.growth    = growth
+
+    def set_line_search(self, line_search=True, tol=0.8, nmaxits=4, eta_min=0.1, eta_max=2.0):
+        """ Enables an energy based line search in the NR, MNR and BFGS
+        iterations. The step along each correction is accepted when the energy
+        residual is below tol times the initial one; eta is kept within
+        eta_min and eta_max.
+        """
+        self.line_search = line_search
+        self.ls_tol      = tol
+        self.ls_nmaxits  = nmaxits
+        self.ls_min      = eta_min
+        self.ls_max      = eta_max
+
+    def set_arc_length(self, psi=0.0, dl_min=1.0E-3, dl_max=100.0, stiff_tol=1.0E-3, nmaxsteps=200):
+        """ Sets the arc-length method used by solve(to_limit=True). psi=0 gives
+        the cylindrical constraint and psi=1 the spherical one. The arc length
+        is kept within dl_min and dl_max times the first arc length. The limit
+        is also taken as reached when the stiffness of the path, i.e. the
+        load factor per unit arc length of a step, falls below stiff_tol
+        times the one of the first step.
+        """
+        if dl_min<=0.0 or dl_max<dl_min:
+            raise Exception("SolverEq.set_arc_length: Invalid arc length limits")
+        self.psi       = psi
+        self.dl_min    = dl_min
+        self.dl_max    = dl_max
+        self.stiff_tol = stiff_tol
+        self.nmaxsteps = nmaxsteps
+
     def set_plane_stress(self, value):
         self.plane_stress = True
 
@@ -67,6 +140,9 @@ class SolverEq(Solver):
         for e in self.elems:
             e.elem_model.prime_and_check()
 
+        # Contiguous storage for ip states
+        self.bind_ip_states()
+
         # Fill active elements collection
         self.aelems = []
         for e in self.elems:
@@ -87,6 +163,9 @@ class SolverEq(Solver):
                 else:
                     self.udofs.append(dof)
 
+        # Optional bandwidth/fill reducing order of unknowns
+        self.renumber_udofs()
+
         self.dofs = []
         for dof in self.udofs:
             self.dofs.append(dof)
@@ -99,22 +178,24 @@ class SolverEq(Solver):
 
         if not self.pdofs: raise Exception("SolverEq.prime_and_check: No prescribed dofs=")
 
-    def mountK(self):
-        ndofs = len(self.dofs)
-        r, c, v = [], [], []
+        # Node of each unknown dof for block aware linear solvers
+        self.linear_solver.set_dof_blocks([dof.owner_id for dof in self.udofs])
 
-        for e in self.aelems:
-            Ke = e.elem_model.stiff()
-            loc = e.elem_model.get_eqn_map()
-            nr, nc = Ke.shape
+        # Element groups for batched evaluation
+        self.elem_groups, self.other_elems = make_elem_groups(self.aelems)
 
-            for i in range(Ke.shape[0]):
-                for j in range(Ke.shape[1]):
-                    r.append(loc[i])
-                    c.append(loc[j])
-                    v.append(Ke[i,j])
+        # Sparsity patterns of the K11..K22 blocks for current stage
+        self.assembler = PartitionedAssembler(len(self.udofs), self.ndofs)
+        for g in self.elem_groups:
+            for loc in g.get_eqn_maps():
+                self.assembler.add_map(loc)
+        for e in self.other_elems:
+            self.assembler.add_map(e.elem_model.get_eqn_map())
+        self.assembler.build()
 
-        self.K = scipy.sparse.coo_matrix((v, (r,c)), (ndofs, ndofs))
+    def mountK(self):
+        Kes = self.elem_loop.stiff(self.elem_groups, self.other_elems)
+        self.K11, self.K12, self.K21, self.K22 = self.assembler.assemble(Kes)
 
     def solve(self, to_limit=False, write=False):
         scheme = self.scheme
@@ -129,6 +210,11 @@ class SolverEq(Solver):
 
         # Initialize SolverEq object and check
         self.prime_and_check()
+        self.commit_state()
+        self.linear_solver.reset_stats()
+        self.elem_loop.reset_stats()
+        self.nits = 0
+        self.inc_stats = []
 
         #if self.stage==0:
             #self.write_history()
@@ -144,16 +230,27 @@ class SolverEq(Solver):
             U[i] = dof.bryU
             F[i] = dof.bryF
 
+        # Workers for the element loops of the stage
+        self.elem_loop.start(self.elem_groups, self.other_elems, self.ndofs)
+
         # Solve stage
-        if not to_limit:
-            self.solve_stage(U, F, raise_error=True)
-            if write:
-                self.write_output()
-        else:
-            self.solve_to_limit(U, F, write)
+        try:
+            if not to_limit:
+                self.solve_stage(U, F, raise_error=True)
+                if write:
+                    self.write_output()
+            else:
+                self.solve_to_limit(U, F, write)
+        finally:
+            self.elem_loop.close()
+            self.close_output()
 
         # Clear boundary conditions
         self.nodes.clear_bc()
+        if self.verbose:
+            if self.nits: print "  iterations:", self.nits
+            print "  linear solver:", self.linear_solver
+            print "  element loops:", self.elem_loop
         print "  solver time:", secs2time(time.time() - self.time0), "\n"
 
     def solve_stage(self, U, F, raise_error=True):
@@ -163,6 +260,9 @@ class SolverEq(Solver):
         if self.verbose:
             print "  stage", self.stage, ":"
 
+        if self.auto_incs and scheme in ("NR", "MNR", "BFGS"):
+            return self.solve_stage_auto(U, F, raise_error)
+
         # Incremental vectors
         nu = len(self.udofs)
         lam = 1.0/self.nincs
@@ -172,54 +272,14 @@ class SolverEq(Solver):
         R     = None
         #force = 0.0
 
-        if scheme == "MNR" or scheme == "NR":
-            UNK_map = [dof.eq_id for dof in self.udofs]
-            force = linalg.norm(F[UNK_map])
-
-            #if force==0.0: raise Exception("SolverEq.solve: Select scheme needs dofs with prescribed forces")
-
         # Solve accros increments
         for self.inc in range(1, self.nincs+1):
-            if scheme == "MNR" or scheme == "NR":
+            if scheme in ("NR", "MNR", "BFGS"):
                 if self.verbose: print "  increment", self.inc, ":"
                 DU = lam*U
                 DF = lam*F
-                calcK    = True
-                converged = False
-                DFi = DF.copy()
-                DFint_ac = zeros(self.ndofs)
-
-                for it in range(self.nmaxits):
-                    if it: DU *= 0.0
-
-                    DFint, R = self.solve_inc(DU, DFi, calcK) # Calculates DU, DFint and completes DFi
-                    if scheme=="MNR": calcK = False
-
-                    DFi       = DFi - DFint
-                    DFint_ac += DFint
-
-                    self.residue = 0.0
-
-                    #for dof in self.udofs:
-                    #    self.residue += abs(DF[dof.eq_id] - DFint_ac[dof.eq_id])/force
-
-                    #self.residue = linalg.norm(DF[UNK_map] - DFint_ac[UNK_map])/force
-
-                    #self.residue = numpy.amax(numpy.fabs(DF[UNK_map] - DFint_ac[UNK_map]))
-
-                    self.residue = abs(DF[UNK_map] - DFint_ac[UNK_map]).max()
-
-                    if self.verbose: print "    it", it+1, " residual =", self.residue
-
-                    if math.isnan(self.residue): raise Exception("SolverEq.solve: Solver failed")
-
-                    if self.residue < self.precision:
-                        converged = True
-                        break
-
-                    if self.residue > 100.0:
-                        converged = False
-                        break
+                converged = self.iterate_inc(DU, DF, self.nmaxits)
+                if math.isnan(self.residue): raise Exception("SolverEq.solve: Solver failed")
 
                 if not converged:
                     if raise_error:
@@ -243,12 +303,188 @@ class SolverEq(Solver):
 
             if self.track_per_inc:
                 self.write_history()
+            if self.output_per_inc:
+                self.write_frame(self.stage - 1 + float(self.inc)/self.nincs)
 
         if self.verbose: print "  end stage", self.stage
         return True
 
 
-    def solve_inc(self, DU, DF, calcK=True):
+    def iterate_inc(self, DU, DF, nmaxits):
+        """ Performs up to nmaxits NR, MNR or BFGS iterations for an increment
+        with prescribed displacements DU and external forces DF. Every
+        iteration is a trial update from the committed state with the total
+        increment. Returns True if the increment converged, in which case the
+        state is committed; otherwise it is rolled back. The iterations stop
+        early if the residue is NaN or larger than 100.
+        """
+        nu       = len(self.udofs)
+        UNK_map  = [dof.eq_id for dof in self.udofs]
+        calcK    = True
+        converged = False
+        DU       = DU.copy()
+        DFi      = DF.copy()
+        DU_ac    = zeros(self.ndofs) # total increments from the committed state
+        DFint_ac = zeros(self.ndofs)
+        nits0    = self.nits
+        nsetups0 = self.linear_solver.nsetups
+        t0       = time.time()
+        self.bfgs_pairs = []
+        self.linear_solver.reset_residual()
+
+        for it in range(nmaxits):
+            if it: DU *= 0.0
+
+            self.solve_system(DU, DFi, calcK) # Calculates DU and completes DFi
+            self.nits += 1
+            if self.scheme in ("MNR", "BFGS"): calcK = False
+
+            if self.verbose and nu>2000: print "updating..." ; sys.stdout.flush()
+            if self.line_search and not DU[nu:].any():
+                DFint = self.line_search_update(DU_ac, DU, DF, DFi)
+            else:
+                DFint = self.update_trial(DU_ac + DU)
+
+            if self.scheme=="BFGS" and not DU[nu:].any():
+                self.add_bfgs_pair(DU[:nu], DFint[:nu] - DFint_ac[:nu])
+
+            DU_ac   += DU
+            DFint_ac = DFint
+            DFi      = DF - DFint_ac
+
+            self.residue = abs(DF[UNK_map] - DFint_ac[UNK_map]).max()
+
+            if self.verbose: print "    it", it+1, " residual =", self.residue
+
+            if math.isnan(self.residue): break
+            self.linear_solver.set_residual(self.residue)
+
+            if self.residue < self.precision:
+                converged = True
+                break
+
+            if self.residue > 100.0:
+                break
+
+        if converged:
+            self.commit_inc(DU_ac, DFint_ac)
+        else:
+            self.rollback_state()
+        self.add_inc_stats(self.nits - nits0, nsetups0, t0, converged)
+        return converged
+
+    def add_inc_stats(self, nits, nsetups0, t0, converged):
+        stats = { "stage"    : self.stage,
+                  "inc"      : self.inc,
+                  "its"      : nits,
+                  "nfactors" : self.linear_solver.nsetups - nsetups0,
+                  "time"     : time.time() - t0,
+                  "converged": converged }
+        self.inc_stats.append(stats)
+        if self.verbose:
+            print "    its: %d factorizations: %d time: %.3fs" % (stats["its"], stats["nfactors"], stats["time"])
+
+    def add_bfgs_pair(self, s, y):
+        """ Stores the correction s of the unknown displacements and the
+        corresponding change y of the internal forces for the BFGS update of
+        the inverse of K11. Pairs that do not satisfy s.y > 0 are skipped.
+        """
+        sy = dot(s, y)
+        if sy > 0.0:
+            self.bfgs_pairs.append((s.copy(), y.copy(), 1.0/sy))
+
+    def solve_K11(self, rhs):
+        """ Solves K11.U1 = rhs with the current factorization. With the BFGS
+        scheme the inverse of the factorized K11 is corrected by the stored
+        pairs using the two-loop recursion.
+        """
+        if self.scheme!="BFGS" or not self.bfgs_pairs:
+            return self.linear_solver.solve(rhs)
+
+        q = array(rhs, dtype=float)
+        alphas = []
+        for s, y, rho in reversed(self.bfgs_pairs):
+            a  = rho*dot(s, q)
+            q -= a*y
+            alphas.append(a)
+        z = self.linear_solver.solve(q)
+        for (s, y, rho), a in zip(self.bfgs_pairs, reversed(alphas)):
+            b  = rho*dot(y, z)
+            z += (a - b)*s
+        return z
+
+    def line_search_update(self, DU_ac, DU, DF, DFi):
+        """ Performs a trial update with DU_ac + eta*DU, where the step eta is
+        found by secant iterations on the energy residual G(eta) = DU.R(eta)
+        of the unknown dofs, R being the unbalanced forces DF - DFint(eta)
+        and DFi the ones before the correction DU. DU is scaled by eta.
+        Returns the internal force increments from the committed state.
+        """
+        nu = len(self.udofs)
+        dU = DU[:nu]
+        G0 = dot(dU, DFi[:nu])
+
+        eta   = 1.0
+        DFint = self.update_trial(DU_ac + DU)
+        G     = dot(dU, DF[:nu] - DFint[:nu])
+        for i in range(self.ls_nmaxits):
+            if G0 <= 0.0 or abs(G) <= self.ls_tol*abs(G0) or G == G0:
+                break
+            eta_new = min(max(eta*G0/(G0 - G), self.ls_min), self.ls_max)
+            if eta_new == eta:
+                break
+            eta = eta_new
+            DFint = self.update_trial(DU_ac + eta*DU)
+            G     = dot(dU, DF[:nu] - DFint[:nu])
+
+        if self.verbose and eta != 1.0: print "    line search: eta =", eta
+        DU *= eta
+        return DFint
+
+    def solve_stage_auto(self, U, F, raise_error=True):
+        """ Solves the stage with automatic increments of the load factor.
+        """
+        lam  = 0.0
+        dlam = min(1.0/self.nincs, self.dlam_max)
+        self.inc_history = []
+
+        while lam < 1.0:
+            last = dlam >= 1.0 - lam
+            if last: dlam = 1.0 - lam
+
+            self.inc = len(self.inc_history) + 1
+            if self.verbose: print "  increment", self.inc, ": load factor", lam+dlam
+            nits0 = self.nits
+            converged = self.iterate_inc(dlam*U, dlam*F, self.nits_inc)
+            nits = self.nits - nits0
+
+            # Cutback (the failed increment was already rolled back)
+            if not converged:
+                dlam *= 0.5
+                if self.verbose: print "    cutback: increment", dlam
+                if dlam < self.dlam_min:
+                    if raise_error:
+                        raise Exception("SolverEq.solve: Increment size below minimum")
+                    self.stage -= 1
+                    return False
+                continue
+
+            lam = 1.0 if last else lam + dlam
+            self.inc_history.append((lam, dlam, nits))
+
+            if self.track_per_inc:
+                self.write_history()
+            if self.output_per_inc:
+                self.write_frame(self.stage - 1 + lam)
+
+            # Growth
+            if nits <= self.nits_fast:
+                dlam = min(dlam*self.growth, self.dlam_max)
+
+        if self.verbose: print "  end stage", self.stage
+        return True
+
+    def solve_system(self, DU, DF, calcK=True):
         """
           [  K11   K12 ]  [ U1? ]    [ F1  ]
           [            ]  [     ] =  [     ]
@@ -265,16 +501,7 @@ class SolverEq(Solver):
 
         if calcK:
             if self.verbose and nu>nverbose: print "    building system...", ; sys.stdout.flush()
-            self.mountK()
-
-            # Mount K11.. K22 matrices
-            cK = self.K.tocsc()
-            if nu:
-                self.K11 = cK[:nu , :nu ]
-                self.K12 = cK[:nu ,  nu:]
-                self.K21 = cK[ nu:, :nu ]
-            self.K22 = cK[ nu:,  nu:]
-            cK = None # Free memory
+            self.mountK() # Mounts K11.. K22 matrices
 
         F1 = DF[:nu]
         U2 = DU[nu:]
@@ -283,106 +510,194 @@ class SolverEq(Solver):
         F2 = self.K22*U2  #sparse matrix * dense vector
         if nu:
             if self.verbose and nu>nverbose: print "solving...", ; sys.stdout.flush()
-            if scheme == "MNR" and decompose   : self.LUsolver = factorized(self.K11)
-            if scheme == "NR" or scheme == "FE": self.LUsolver = factorized(self.K11)
+            if decompose: self.linear_solver.set_matrix(self.K11) # K11 is reused while unchanged
             rhs = F1 - self.K12*U2
-            #OUT("rhs")
-            #OUT("F1")
-            #OUT("self.K11")
-            U1 = scipy.sparse.linalg.spsolve(self.K11, rhs)
+            U1 = self.solve_K11(rhs)
             F2 += self.K21*U1
 
         # Complete vectors
         for i, dof in enumerate(self.udofs): DU[dof.eq_id] = U1[i]
         for i, dof in enumerate(self.pdofs): DF[dof.eq_id] = F2[i]
 
-        if self.verbose and nu>nverbose: print "updating..." ; sys.stdout.flush()
+    def solve_inc(self, DU, DF, calcK=True):
+        """ Solves the linear system for DU and DF as in solve_system() and
+        updates elements and nodes. Returns the internal force increments and
+        the unbalanced forces.
+        """
+        self.solve_system(DU, DF, calcK)
+
+        if self.verbose and len(self.udofs)>2000: print "updating..." ; sys.stdout.flush()
         #from numpy import linalg
         DFint = self.update_elems_and_nodes(DU) # Also calculates DFint
 
         R = DF - DFint
         return DFint, R
 
-    def save_state(self):
-        # Save state for elements
-        self.elems_state = []
-        for e in self.elems:
-            e_st = []
-            for ip in e.elem_model.ips:
-                e_st.append(ip.mat_model.get_state())
-
-            self.elems_state.append(e_st)
-
-        # Save state for nodes
-        self.bkU = [dof.U for dof in self.dofs]
-        self.bkF = [dof.F for dof in self.dofs]
-
-
-    def restore_state(self):
-        #S = [ip.mat_model.s for ip in self.elems.ips]
-        # Restore elements state
-        for e, e_st in zip(self.elems, self.elems_state):
-            for ip, ip_st in zip(e.elem_model.ips, e_st):
-                ip.mat_model.set_state(**ip_st)
-
+    def update_trial(self, DU):
+        """ Discards previous trial updates and updates the elements from the
+        committed state with the total increments DU. Dofs are not changed.
+        Returns the internal force increments from the committed state.
+        """
+        self.rollback_state()
+        DFint = zeros(len(self.dofs))
+        self.elem_loop.update(self.elem_groups, self.other_elems, DU, DFint)
+        return DFint
 
-        # Restore nodes state
+    def commit_inc(self, DU, DFint):
+        """ Accepts the trial update with total increments DU and DFint: dofs
+        are updated and the state of the ips is committed.
+        """
         for i, dof in enumerate(self.dofs):
-            dof.U = self.bkU[i]
-            dof.F = self.bkF[i]
-
-        Ur = [dof.U for dof in self.dofs]
-        Fr = [dof.F for dof in self.dofs]
-
-        #S = [ip.mat_model.s for ip in self.elems.ips]
+            dof.U += DU[i]
+            dof.F += DFint[i]
+        self.commit_state()
 
     def solve_to_limit(self, U, F, write):
+        """ Follows the equilibrium path of the load factor lam applied to the
+        prescribed displacements U and forces F with an arc-length method,
+        using the constraint |DU1|^2 + psi^2*lam^2*|F1|^2 = dl^2 on the
+        unknown displacements DU1 and forces F1. The first arc length gives
+        a load factor of 1/nincs in the linear range. Arc lengths are halved
+        if a step does not converge as in iterate_inc() and enlarged as in
+        the automatic increments. Every iteration is a trial update with the
+        total increment of the step; failed steps are rolled back. With write,
+        every converged arc step is written as a stage. The path is followed
+        until the load factor decreases, the path becomes flat or no further
+        step converges; the maximum load factor is returned. Steps are solved
+        with the NR scheme; the scheme of the solver is restored on return.
+        """
+        scheme = self.scheme
         self.scheme = "NR"
-        lf     = 1.0  # Load factor (safety factor)
-        d_lf  = 0.5
-        eps    = 0.001
-        factor = 1.1
-
-        self.save_state()
-
-        for i in range(self.nmaxits):
-            #OUT("lf*F")
-
-            success = self.solve_stage(U, lf*F, raise_error=False)
-
-            if not success:
-                factor = 0.5
-
-            d_lf = factor*d_lf
-            if d_lf<eps:
-                break
-
-            if success:
-                self.write_output()
-                lf  += d_lf
+        try:
+            nu = len(self.udofs)
+            F1 = F[:nu]
+            U2 = U[nu:]
+            psi2 = self.psi**2
+            FF   = dot(F1, F1)
+
+            lam      = 0.0
+            lam_max  = 0.0
+            dl       = None
+            dl0      = None
+            DU1_last = None
+            Fint_c   = zeros(self.ndofs) # committed internal forces from the start of the stage
+            self.inc_history = []
+
+            for step in range(self.nmaxsteps):
+                self.inc = len(self.inc_history) + 1
+                if self.verbose: print "  arc step", self.inc, ":"
+                converged = False
+                nits0     = self.nits
+                nsetups0  = self.linear_solver.nsetups
+                t0        = time.time()
+                try:
+                    # Predictor
+                    self.mountK()
+                    self.linear_solver.set_matrix(self.K11)
+                    dUt = self.linear_solver.solve(F1 - self.K12*U2)
+                    norm_t = (dot(dUt, dUt) + psi2*FF)**0.5
+                    if dl is None:
+                        dl0 = dl = norm_t/self.nincs
+                    dlam = dl/norm_t
+                    if DU1_last is not None and dot(DU1_last, dUt) < 0.0:
+                        dlam = -dlam
+
+                    DU1, Dlam = dlam*dUt, dlam
+                    DFint = self.update_trial(concatenate([DU1, Dlam*U2]))
+                    self.nits += 1
+
+                    # Corrector iterations
+                    for it in range(self.nits_inc):
+                        R1 = (lam+Dlam)*F1 - Fint_c[:nu] - DFint[:nu]
+                        self.residue = abs(R1).max() if nu else 0.0
+                        if self.verbose: print "    it", it+1, " residual =", self.residue
+                        if math.isnan(self.residue) or self.residue > 100.0: break
+                        if self.residue < self.precision:
+                            converged = True
+                            break
+
+                        self.mountK()
+                        self.linear_solver.set_matrix(self.K11)
+                        dUt = self.linear_solver.solve(F1 - self.K12*U2)
+                        dUr = self.linear_solver.solve(R1)
+
+                        # Load factor correction from the constraint
+                        A  = DU1 + dUr
+                        a1 = dot(dUt, dUt) + psi2*FF
+                        a2 = 2.0*dot(dUt, A) + 2.0*psi2*Dlam*FF
+                        a3 = dot(A, A) + psi2*Dlam**2*FF - dl**2
+                        disc = a2**2 - 4.0*a1*a3
+                        if disc < 0.0: break
+                        roots = [ (-a2 + sgn*disc**0.5)/(2.0*a1) for sgn in (1.0, -1.0) ]
+                        dlam  = max(roots, key=lambda r: dot(A + r*dUt, DU1) + psi2*(Dlam + r)*Dlam*FF)
+
+                        # Trial update from the state at the start of the step
+                        DU1  += dUr + dlam*dUt
+                        Dlam += dlam
+                        DFint = self.update_trial(concatenate([DU1, Dlam*U2]))
+                        self.nits += 1
+                except RuntimeError: # e.g. singular stiffness at a mechanism
+                    if dl is None: raise # no arc length to cut back
+                    converged = False
+                nits = self.nits - nits0
+                self.add_inc_stats(nits, nsetups0, t0, converged)
+
+                # Cutback
+                if not converged:
+                    self.rollback_state()
+                    dl *= 0.5
+                    if self.verbose: print "    cutback: arc length", dl
+                    if dl < self.dl_min*dl0:
+                        break
+                    continue
+
+                self.commit_inc(concatenate([DU1, Dlam*U2]), DFint)
+                Fint_c  += DFint
+                lam     += Dlam
+                DU1_last = DU1
+                self.stage += 1
+                self.inc_history.append((lam, Dlam, nits))
+                if write:
+                    self.write_output()
+                if self.track_per_inc:
+                    self.write_history()
+                if self.verbose: print "    load factor", lam
+
+                # Limit point
+                if lam < lam_max:
+                    break
+                lam_max = lam
+
+                stiff = Dlam/dl
+                if len(self.inc_history)==1:
+                    stiff0 = stiff
+                elif stiff < self.stiff_tol*stiff0:
+                    break
+
+                if nits <= self.nits_fast:
+                    dl = min(dl*self.growth, self.dl_max*dl0)
             else:
-                lf  -= d_lf
-
-            self.restore_state()
-        else:
-            raise Exception("SolverEq.solve: Solver reached maximum number of iterations.")
+                raise Exception("SolverEq.solve_to_limit: Limit point not found within the maximum number of arc steps")
+        finally:
+            self.scheme = scheme
 
-        print "  Maximum load factor :", lf,"\n"
-        return lf
+        self.limit_factor = lam_max
+        print "  Maximum load factor :", lam_max,"\n"
+        return lam_max
 
 
     def update_elems_and_nodes(self, DU):
         DFint = zeros(len(self.dofs))
 
         # Updating elements
-        for e in self.aelems:
-            e.elem_model.update(DU, DFint)
+        self.elem_loop.update(self.elem_groups, self.other_elems, DU, DFint)
 
         # Updating dofs
         for i, dof in enumerate(self.dofs):
             dof.U += DU[i]
             dof.F += DFint[i]
 
+        self.commit_state()
         return DFint
 
     def reset_displacements(self):
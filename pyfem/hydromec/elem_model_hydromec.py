@@ -67,12 +67,15 @@ class ElemModelHydromec(ElemModel):
             if ndim==3: n.remove_dof("uz", "fz")
 
     def calcB(self, R, C):
-        nnodes = len(self.nodes)
-        ndim   = self.ndim
         D = deriv_func(self.shape_type, R)
         J = mul(D, C)
-        detJ = det(J)
-        dNdX = mul(inv(J),D)
+        return self.mountB(mul(inv(J),D)), det(J)
+
+    def mountB(self, dNdX):
+        """ Mounts the B matrix from the cartesian derivatives dNdX.
+        """
+        nnodes = len(self.nodes)
+        ndim   = self.ndim
 
         B = zeros(6, ndim*nnodes)
         sqrt2 = 2.0**0.5
@@ -94,7 +97,7 @@ class ElemModelHydromec(ElemModel):
                 B[4,1+i*ndim] = dNdz/sqrt2;   B[4,2+i*ndim] = dNdy/sqrt2
                 B[5,2+i*ndim] = dNdx/sqrt2;   B[5,0+i*ndim] = dNdz/sqrt2
 
-        return B, detJ
+        return B
 
 
     def calcBp(self, R, C):
@@ -117,14 +120,14 @@ class ElemModelHydromec(ElemModel):
     def calcK(self):
         nnodes = len(self.nodes)
         ndim   = self.ndim
-        C = self.coords()
+        geo = self.get_geometry()
         K = zeros(nnodes*ndim, nnodes*ndim)
-        for ip in self.ips:
-            B, detJ = self.calcB(ip.R, C)
+        for i, ip in enumerate(self.ips):
+            B    = self.mountB(geo.dNdX[i])
             M    = ip.mat_model
             Dep  = M.stiff()
             thk  = self.thickness
-            coef = detJ*ip.w*thk*M.stiff_coef()
+            coef = geo.detJw[i]*thk*M.stiff_coef()
             K += mul(B.T, Dep, B)*coef
 
         return K
@@ -155,15 +158,15 @@ class ElemModelHydromec(ElemModel):
         """
 
         nnodes = len(self.nodes)
-        C      = self.coords()
+        geo    = self.get_geometry()
         H      = zeros(nnodes, nnodes)
         thk    = self.thickness
 
-        for ip in self.ips:
-            B, detJ = self.calcBp(ip.R, C)
+        for i, ip in enumerate(self.ips):
+            B       = geo.dNdX[i]
             mdl     = ip.mat_model
             K       = mdl.calcK()
-            coef    = detJ*ip.w*thk
+            coef    = geo.detJw[i]*thk
             H      += mul(B.T, K, B)/self.gamw*coef
 
         return H
@@ -198,17 +201,15 @@ class ElemModelHydromec(ElemModel):
         """
 
         nnodes = len(self.nodes)
-        C      = self.coords()
+        geo    = self.get_geometry()
         M      = zeros(nnodes, nnodes)
         thk    = self.thickness
 
-        for ip in self.ips:
-            N        = shape_func(self.shape_type, ip.R)
-            D        = deriv_func(self.shape_type, ip.R)
-            detJ     = det(mul(D, C))
+        for i, ip in enumerate(self.ips):
+            N        = geo.N[i]
             mdl      = ip.mat_model
             n_dSr_dp = mdl.n_dSr_dp()
-            coef     = detJ*ip.w*thk
+            coef     = geo.detJw[i]*thk
             M       += mul(N.T, N)*n_dSr_dp*coef
 
         return M
@@ -246,21 +247,18 @@ class ElemModelHydromec(ElemModel):
         """
 
         nnodes = len(self.nodes)
-        C      = self.coords()
+        geo    = self.get_geometry()
         ndim   = self.ndim
         L      = zeros(nnodes, ndim*nnodes)
         thk    = self.thickness
 
         m     = array([[1.0, 1.0, 1.0, 0.0, 0.0, 0.0]]).T
 
-        for ip in self.ips:
-            N        = shape_func(self.shape_type, ip.R)
-            N        = as_row(N)
-            D        = deriv_func(self.shape_type, ip.R)
-            Bu, detJ = self.calcB (ip.R, C)
-            Bp, detJ = self.calcBp(ip.R, C)
+        for i, ip in enumerate(self.ips):
+            N        = as_row(geo.N[i])
+            Bu       = self.mountB(geo.dNdX[i])
             mdl      = ip.mat_model
-            coef     = detJ*ip.w*thk
+            coef     = geo.detJw[i]*thk
             #L       += -mul(Bu.T, mT, N)*coef
             #OUT('N.T')
             #OUT('m.T')
@@ -300,19 +298,19 @@ class ElemModelHydromec(ElemModel):
     def calcQh(self):
         nnodes = len(self.nodes)
         ndim   = self.ndim
-        C      = self.coords()
+        geo    = self.get_geometry()
         Qh     = zeros(nnodes)
         b      = zeros(ndim)
         b[-1]  = self.gamw
         thk    = self.thickness
 
-        for ip in self.ips:
-            Bp, detJ = self.calcBp(ip.R, C)
+        for i, ip in enumerate(self.ips):
+            Bp      = geo.dNdX[i]
             mdl     = ip.mat_model
             #mcoef   = mdl.stiff_coef()
             #K       = mdl.permeability()
             K       = mdl.calcK()
-            coef    = detJ*ip.w*thk
+            coef    = geo.detJw[i]*thk
             Qh     += mul(Bp.T, K, b)*coef/self.gamw
 
         return Qh
@@ -349,16 +347,16 @@ class ElemModelHydromec(ElemModel):
         # Mount total P vector
         P = [ node.keys["wp"].U for node in self.nodes ]
 
-        C = self.coords()
+        geo = self.get_geometry()
 
         m = array([1.0, 1.0, 1.0, 0.0, 0.0, 0.0])
 
-        for ip in self.ips:
-            B,detJ  = self.calcB(ip.R, C)
+        for i, ip in enumerate(self.ips):
+            B       = self.mountB(geo.dNdX[i])
             deps    = mul(B,dU)
 
-            Bp,detJ = self.calcBp(ip.R, C)
-            N       = shape_func(self.shape_type, ip.R)
+            Bp      = geo.dNdX[i]
+            N       = geo.N[i]
             dwp     = float(mul(N.T,dP))       # Increment in pore-pressure
             mdl     = ip.mat_model
 
@@ -367,7 +365,7 @@ class ElemModelHydromec(ElemModel):
             dsig, dnSr, V  = mdl.update_state(deps, dwp, G)
 
             mcoef   = 1.0
-            coef    = detJ*ip.w*mcoef
+            coef    = geo.detJw[i]*mcoef
             dnSr    = 0.0
 
             #_dsig = dsig + dwp*m
@@ -487,14 +485,12 @@ class ElemModelHydromec(ElemModel):
 
         F = zeros(nnodes, ndim)
 
-        C = self.coords()
+        geo = self.get_geometry()
 
         # Loop along integration points
-        for ip in self.ips:
-            S = shape_func(self.shape_type, ip.R)
-            D = deriv_func(self.shape_type, ip.R)
-            detJ = pdet(mul(D,C))
-            coef = detJ*ip.mat_model.stiff_coef()*ip.w
+        for i, ip in enumerate(self.ips):
+            S = geo.N[i]
+            coef = geo.detJ[i]*ip.mat_model.stiff_coef()*ip.w
 
             F += mul(as_col(S), as_row(MF))*coef; # Calculate the nodal body forces matrix
 
@@ -549,7 +545,7 @@ class ElemModelHydromec(ElemModel):
             for j, val in enumerate(ip_vals.values()):
                 IP[i,j] = val
 
-        E = extrapolator(self.shape_type)
+        E = self.get_geometry().E
         N = mul(E, IP)
 
         # Filling nodal_values dict
@@ -571,7 +567,7 @@ class ElemModelHydromec(ElemModel):
             for j, val in enumerate(ip_vals.values()):
                 IP[i,j] = val
 
-        E = extrapolator(self.shape_type)
+        E = self.get_geometry().E
         N = mul(E, IP)
 
         # Filling nodal_values dict
@@ -2,6 +2,8 @@ from pyfem.model import *
 from numpy import fill_diagonal
 
 class ModelLinHydromec(Model):
+    state_vars = ("sig", "eps", "wp")
+    param_vars = ("E", "nu", "k", "gw")
 
     def __init__(self, *args, **kwargs):
         Model.__init__(self);
@@ -26,20 +28,6 @@ class ModelLinHydromec(Model):
     def name(self):
         return "MatModelLinHydromec"
 
-    def copy(self):
-        the_copy        = ModelLinHydromec()
-        the_copy.sig = self.sig.copy()
-        the_copy.eps = self.eps.copy()
-        the_copy.E   = self.E
-        the_copy.nu  = self.nu
-
-        the_copy.k      = self.k
-        the_copy.wp     = self.wp
-        the_copy.gw     = self.gw
-        the_copy.attr = self.attr.copy()
-        the_copy.ndim   = self.ndim
-        return the_copy
-
     def check(self):
         return True
 
@@ -63,18 +51,25 @@ class ModelLinHydromec(Model):
         return 0.0
 
     def stiff(self):
+        if self.attr.get("plane_stress"):
+            return self.params.cached("De_ps", self.calcDe_ps)
+        return self.params.cached("De", self.calcDe)
+
+    def calcDe_ps(self):
+        E  = self.E
+        nu = self.nu
+        c  = E/(1.0-nu*nu)
+        return array([\
+                [ c    , c*nu , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [ c*nu ,    c , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 , c*(1.0-nu),        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
+                [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ] ] )
+
+    def calcDe(self):
         E  = self.E
         nu = self.nu
-
-        if self.attr.get("plane_stress"):
-            c = E/(1.0-nu*nu)
-            return array([\
-                    [ c    , c*nu , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [ c*nu ,    c , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 , c*(1.0-nu),        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ], \
-                    [  0.0 ,  0.0 , 0.0 ,        0.0,        0.0,        0.0 ] ] )
 
         # For plane strain and 3D:
         c = E/((1.0+nu)*(1.0-2.0*nu))
@@ -100,7 +95,9 @@ class ModelLinHydromec(Model):
         RETURNS:
             K: An ndim x ndim numpy array as the permeability matrix
         """
-        
+        return self.params.cached(("K", self.ndim), self.calcK_)
+
+    def calcK_(self):
         ndim = self.ndim
         K = zeros((ndim, ndim))
         fill_diagonal(K, self.k)
@@ -1,5 +1,6 @@
 from pyfem.solver import *
 from pyfem.tools.matvec import *
+from pyfem.tools.assembler import *
 from pyfem.equilib.elem_model_eq   import *
 from pyfem.seepage.elem_model_seep import *
 from elem_model_hydromec import *
@@ -9,20 +10,22 @@ from numpy.linalg import norm
 import scipy
 from scipy.sparse import lil_matrix
 from scipy import *
-from scipy.sparse.linalg import factorized
 
 class SolverHydromec(Solver):
+    # Element matrices and their index maps
+    calc_funcs = [ "calcH"      , "calcK"    , "calcM"    , "calcL"    , "calcC" ]
+    loc_funcs  = [ "get_H_loc"  , "get_K_loc", "get_M_loc", "get_L_loc", "get_C_loc"]
+
     def __init__(self):
         Solver.__init__(self)
         self.name = "SolverHydromec"
         self.DU   = None
         self.DF   = None
-        self.K    = None
         self.K11  = None
         self.K12  = None
         self.K21  = None
         self.K22  = None
-        self.LUsolver = None
+        self.assembler = None
         self.plane_stress = False
         self.time_lapse = 0.0
 
@@ -44,6 +47,9 @@ class SolverHydromec(Solver):
         for e in self.elems:
             e.elem_model.prime_and_check()
 
+        # Contiguous storage for ip states
+        self.bind_ip_states()
+
         # Fill active elements collection
         self.aelems = []
         for e in self.elems:
@@ -67,6 +73,9 @@ class SolverHydromec(Solver):
                 else:
                     self.udofs.append(dof)
 
+        # Optional bandwidth/fill reducing order of unknowns
+        self.renumber_udofs()
+
         self.dofs = []
         for dof in self.udofs:
             self.dofs.append(dof)
@@ -79,34 +88,30 @@ class SolverHydromec(Solver):
 
         if not self.pdofs: raise Exception("SolveHydromec.prime_and_check: No prescribed dofs=")
 
-    def mountK(self, dt):
-        ndofs = len(self.dofs)
-        r, c, v = [], [], []
-        self.alpha = 1.0
-
-        calc_funcs = [ "calcH"      , "calcK"    , "calcM"    , "calcL"    , "calcC" ]
-        loc_funcs  = [ "get_H_loc"  , "get_K_loc", "get_M_loc", "get_L_loc", "get_C_loc"]
-        matr_coefs = [ self.alpha*dt, 1.0        , 1.0        , 1.0        , 1.0 ]
-
+        # Sparsity patterns of the K11..K22 blocks for current stage
+        self.assembler = PartitionedAssembler(len(self.udofs), self.ndofs)
         for e in self.aelems:
-            for func, lfunc, coef in zip(calc_funcs, loc_funcs, matr_coefs):
+            for func, lfunc in zip(self.calc_funcs, self.loc_funcs):
                 if hasattr(e.elem_model, func):
-                    M   = getattr(e.elem_model, func)()*coef
                     loc = getattr(e.elem_model, lfunc)()
                     if isinstance(loc, tuple):
-                        rloc = loc[0]
-                        cloc = loc[1]
+                        self.assembler.add_map(loc[0], loc[1])
                     else:
-                        rloc = loc
-                        cloc = loc
+                        self.assembler.add_map(loc)
+        self.assembler.build()
 
-                    for i in range(M.shape[0]):
-                        for j in range(M.shape[1]):
-                            r.append(rloc[i])
-                            c.append(cloc[j])
-                            v.append(M[i,j])
+    def mountK(self, dt):
+        self.alpha = 1.0
+        matr_coefs = [ self.alpha*dt, 1.0        , 1.0        , 1.0        , 1.0 ]
+
+        # Matrices in the same order as the maps given to the assembler
+        Mes = []
+        for e in self.aelems:
+            for func, coef in zip(self.calc_funcs, matr_coefs):
+                if hasattr(e.elem_model, func):
+                    Mes.append(getattr(e.elem_model, func)()*coef)
 
-        self.K = scipy.sparse.coo_matrix((v, (r,c)), (ndofs, ndofs))
+        self.K11, self.K12, self.K21, self.K22 = self.assembler.assemble(Mes)
 
     def add_submatrix(self, r,c,v, M, rloc, cloc):
         for i in range(M.shape[0]):
@@ -157,6 +162,7 @@ class SolverHydromec(Solver):
 
         # Initialize SolveHydromec object and check
         self.prime_and_check()
+        self.linear_solver.reset_stats()
 
         if self.verbose:
             print "  active elems:", len(self.aelems)
@@ -240,8 +246,14 @@ class SolverHydromec(Solver):
 
             if self.track_per_inc:
                 self.write_history()
+            if self.output_per_inc:
+                self.write_frame(self.stage - 1 + float(self.inc)/self.nincs)
 
-        if self.verbose: print "  end stage:", self.stage
+        self.close_output()
+
+        if self.verbose:
+            print "  linear solver:", self.linear_solver
+            print "  end stage:", self.stage
 
     def solve_inc(self, DU, DF, dt, calcK=True):
         """
@@ -258,15 +270,7 @@ class SolverHydromec(Solver):
 
         if calcK:
             if incver: print "    building system...", ; sys.stdout.flush()
-            self.mountK(dt)
-
-            # Mount K11.. K22 matrices
-            cK = self.K.tocsc()
-            self.K11 = cK[:nu , :nu ]
-            self.K12 = cK[:nu ,  nu:]
-            self.K21 = cK[ nu:, :nu ]
-            self.K22 = cK[ nu:,  nu:]
-            cK = None # Free memory
+            self.mountK(dt) # Mounts K11.. K22 matrices
 
         DF = self.mountRHS(DF, dt)
         #OUT("DF")
@@ -279,14 +283,11 @@ class SolverHydromec(Solver):
         if nu:
             if incver: print "solving...", ; sys.stdout.flush()
 
-            if scheme == "MNR" and decomp: 
-                self.LUsolver = factorized(self.K11)
-
-            if scheme == "NR" or scheme == "FE": 
-                self.LUsolver = factorized(self.K11)
+            if decomp:
+                self.linear_solver.set_matrix(self.K11)
 
             RHS = F1 - self.K12*U2
-            U1  = scipy.sparse.linalg.spsolve(self.K11, RHS)
+            U1  = self.linear_solver.solve(RHS)
             F2 += self.K21*U1
 
         # Complete vectors
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+from collections import OrderedDict
+
+import numpy
+
+from tools.parallel import shared_array
+
+class IpStateStore:
+    """ Contiguous storage for the state variables of a set of material models
+    of the same class (e.g. all ips of a material group).
+
+    Array variables (e.g. sig and eps) are stored in arrays with shape
+    (nips, ...) and scalar variables (e.g. plast, dg) in the columns of an
+    (nips, k) array. Bound material models keep only their parameters; state
+    variables are accessed as views into the store rows, so the models work
+    as before while material updates may operate on whole arrays at once.
+    The arrays live in shared memory so that forked workers can update them.
+
+    >>> store = IpStateStore([ ip.mat_model for ip in ips ])
+    >>> store.arrays["sig"]       # (nips, 6) stresses
+    >>> store.column("plast")     # (nips,) plastic flags
+    >>> state = store.gather(rows) # copies for a batched material update
+    >>> store.commit()             # keeps the converged state
+    >>> store.rollback()           # discards trial updates after the commit
+    """
+    def __init__(self, models):
+        self.models = list(models)
+        self.nips   = len(self.models)
+        self.names  = []
+        self.arrays = OrderedDict() # name: (nips, ...) array
+        self.cols   = OrderedDict() # name: column in ivs
+        self.types  = {}            # name: type of scalar variable
+        self.ivs    = None          # (nips, k) scalar variables
+        self.committed = None       # copies of the arrays and ivs at the last commit
+
+        mdl0 = self.models[0]
+        n    = self.nips
+        for name in state_var_names(mdl0.__class__):
+            val = getattr(mdl0, name)
+            if isinstance(val, numpy.ndarray):
+                arr = shared_array(n*val.size).reshape((n,)+val.shape)
+                if type(val) is not numpy.ndarray:
+                    arr = arr.view(type(val))
+                self.arrays[name] = arr
+            else:
+                self.cols [name] = len(self.cols)
+                self.types[name] = type(val)
+            self.names.append(name)
+
+        self.ivs = shared_array(n*len(self.cols)).reshape(n, len(self.cols))
+
+        # Move current values into the store and bind models
+        for i, mdl in enumerate(self.models):
+            if mdl.state_store is not None:
+                raise Exception("IpStateStore: Material model is already bound to a store")
+            for name in self.names:
+                val = mdl.__dict__.pop(name)
+                if name in self.arrays:
+                    self.arrays[name][i] = val
+                else:
+                    self.ivs[i, self.cols[name]] = val
+            mdl.state_store = self
+            mdl.state_row   = i
+
+    def get(self, name, row):
+        arr = self.arrays.get(name)
+        if arr is not None:
+            return arr[row]
+        return self.types[name](self.ivs[row, self.cols[name]])
+
+    def get_copy(self, name, row):
+        val = self.get(name, row)
+        return val.copy() if name in self.arrays else val
+
+    def set(self, name, row, val):
+        arr = self.arrays.get(name)
+        if arr is not None:
+            arr[row] = val
+        else:
+            self.ivs[row, self.cols[name]] = val
+
+    def gather(self, rows):
+        """ Returns a dictionary with copies of all state variables at the given
+        rows. Scalar variables are returned as float arrays.
+        """
+        state = OrderedDict()
+        for name in self.names:
+            if name in self.arrays:
+                state[name] = numpy.array(self.arrays[name][rows])
+            else:
+                state[name] = self.ivs[rows, self.cols[name]]
+        return state
+
+    def scatter(self, rows, state):
+        """ Writes back the state variables gathered with gather(rows).
+        """
+        for name, vals in state.iteritems():
+            self.set(name, rows, vals)
+
+    def commit(self):
+        """ Keeps the current state as the converged one. Material updates after
+        the commit are trial updates that are discarded by rollback(). Both
+        copy whole arrays, regardless of the number of ips.
+        """
+        arrays = self.arrays.values() + [ self.ivs ]
+        if self.committed is None:
+            self.committed = [ arr.copy() for arr in arrays ]
+            return
+        for arr, val in zip(arrays, self.committed):
+            numpy.copyto(val, arr)
+
+    def rollback(self):
+        """ Restores the state saved by the last commit().
+        """
+        if self.committed is None:
+            raise Exception("IpStateStore.rollback: State was not committed")
+        for arr, val in zip(self.arrays.values() + [ self.ivs ], self.committed):
+            numpy.copyto(arr, val)
+
+    def column(self, name):
+        """ Returns a view with the values of a scalar state variable for all ips.
+        """
+        return self.ivs[:, self.cols[name]]
+
+    def unbind(self):
+        """ Moves the state values back into the material models.
+        """
+        for i, mdl in enumerate(self.models):
+            if mdl.state_store is not self: continue
+            del mdl.state_store
+            del mdl.state_row
+            for name in self.names:
+                mdl.__dict__[name] = self.get_copy(name, i)
+
+    @property
+    def nbytes(self):
+        return sum(arr.nbytes for arr in self.arrays.values()) + self.ivs.nbytes
+
+
+def state_var_names(cls):
+    """ Returns the names of the state variables of a material model class,
+    including the ones inherited.
+    """
+    names = []
+    for c in reversed(cls.__mro__):
+        for name in c.__dict__.get("state_vars", ()):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def make_ip_state_stores(models):
+    """ Splits material models by class and by shape of the state variables
+    and returns a list with one IpStateStore for each set.
+    """
+    sets = OrderedDict()
+    for mdl in models:
+        key = [ mdl.__class__ ]
+        for name in state_var_names(mdl.__class__):
+            val = mdl.__dict__.get(name)
+            key.append(val.shape if isinstance(val, numpy.ndarray) else type(val))
+        sets.setdefault(tuple(key), []).append(mdl)
+
+    return [ IpStateStore(mdls) for mdls in sets.values() if state_var_names(mdls[0].__class__) ]
@@ -11,6 +11,7 @@ from collections import Counter
 from pyfem.tools.matvec import *
 from pyfem.tools.stream import *
 from pyfem.tools.collection import *
+from pyfem.tools.spatial_hash import *
 from shape_types import *
 from shape_functions import *
 
@@ -46,7 +47,7 @@ class Point:
             return False
 
     def __hash__(self):
-        return int(self.x*1001 + self.y*1000001 + self.z*1000000001)
+        return hash((self.x, self.y, self.z))
 
     def __str__(self): # called by print and str
         os = Stream()
@@ -61,9 +62,17 @@ class Point:
 
 
 class CollectionPoint(Collection):
+    """ List of points with spatial indexes (see SpatialHash) of all points
+    and of the points on block borders, used by get_from_all() and
+    get_from_border() to find points by their coordinates without scanning
+    the collection. Indexes are updated by append() and add_new(); the
+    index of all points is rebuilt if the list was changed otherwise.
+    """
     def __init__(self, *args):
         list.__init__(self, *args)
         self.border_points = set()
+        self.border_index  = SpatialHash()
+        self.index         = None # SpatialHash of all points
 
     def add_new(self, X, border=False):
         if isinstance(X, Point):
@@ -77,30 +86,53 @@ class CollectionPoint(Collection):
 
         if border:
             self.border_points.add(P)
+            self.border_index.add((P.x, P.y, P.z), P)
 
         return P
 
     def append(self, P):
         P.id = len(self)
         list.append(self, P)
+        if self.index is not None:
+            self.index.add((P.x, P.y, P.z), P)
+
+    def get_index(self):
+        """ Returns the spatial index of all points.
+        """
+        if self.index is None or len(self.index) != len(self):
+            self.index = SpatialHash()
+            for P in self:
+                self.index.add((P.x, P.y, P.z), P)
+        return self.index
 
     def in_border(self, P):
         return True if P in self.border_points else False
 
-    def get_from_border(self, X):
+    def get_from_border(self, X, tol=Point.TOL):
+        """ Returns the border point with coordinates X within tol, or None.
+        """
         tmpP = Point(X)
-        if tmpP in self.border_points:
-            return tmpP._match  # a bit of black magic
-        else:
-            return None
+        return self.border_index.find((tmpP.x, tmpP.y, tmpP.z), tol)
+
+    def get_from_all(self, X, tol=Point.TOL):
+        """ Returns the point with coordinates X within tol, or None.
+        """
+        tmpP = Point(X)
+        return self.get_index().find((tmpP.x, tmpP.y, tmpP.z), tol)
 
-    def get_from_all(self, X):
+    def get_nearest(self, X):
+        """ Returns the point closest to X, or None if the collection is empty.
+        """
         tmpP = Point(X)
-        all = set(self)
-        if tmpP in all:
-            return tmpP._match  # a bit of black magic
-        else:
-            return None
+        return self.get_index().nearest((tmpP.x, tmpP.y, tmpP.z))[0]
+
+    def get_within(self, X, radius):
+        """ Returns a collection with the points at a distance from X not
+        greater than radius, in the order of the collection.
+        """
+        tmpP  = Point(X)
+        found = self.get_index().within((tmpP.x, tmpP.y, tmpP.z), radius)
+        return CollectionPoint(sorted(found, key=lambda P: P.id))
 
     def set_tag(self, tag):
         for p in self:
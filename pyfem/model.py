@@ -5,25 +5,128 @@ Raul Durand & Dorival Pedroso.
 Copyright 2010-2013.
 """
 
+from copy import deepcopy
+
 from tools.matvec import *
 from tools.stream import *
 
-class Model:
+class ModelParams(object):
+    """ Parameters of a material model. A single instance is shared by the
+    model given to the elements and by the copies made for every ip, so ips
+    hold only state. Derived data, e.g. elastic matrices, are computed once
+    per parameter set with cached(); the cache is cleared when a parameter
+    changes.
+    """
+    def __init__(self, **params):
+        self.__dict__.update(params)
+        self.cache = {}
+
+    def __setattr__(self, name, val):
+        object.__setattr__(self, name, val)
+        if name != "cache":
+            self.cache = {}
+
+    def cached(self, key, func):
+        """ Returns the value stored under key, calling func to compute it
+        the first time.
+        """
+        val = self.cache.get(key)
+        if val is None:
+            val = self.cache[key] = func()
+            if isinstance(val, numpy.ndarray):
+                val.flags.writeable = False # shared by all ips
+        return val
+
+
+class ParamVar(object):
+    """ Descriptor for a parameter of a material model. The value is kept in
+    the shared parameters object of the model.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, mdl, cls=None):
+        if mdl is None:
+            return self
+        return getattr(mdl.params, self.name)
+
+    def __set__(self, mdl, val):
+        setattr(mdl.params, self.name, val)
+
+
+class StateVar(object):
+    """ Descriptor for a state variable of a material model. The value is
+    kept in the instance dictionary or, once the model is bound to an
+    IpStateStore, in a row of the store arrays.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, mdl, cls=None):
+        if mdl is None:
+            return self
+        store = mdl.__dict__.get("state_store")
+        if store is not None:
+            return store.get(self.name, mdl.__dict__["state_row"])
+        try:
+            return mdl.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+    def __set__(self, mdl, val):
+        store = mdl.__dict__.get("state_store")
+        if store is not None:
+            store.set(self.name, mdl.__dict__["state_row"], val)
+        else:
+            mdl.__dict__[self.name] = val
+
+
+class ModelMeta(type):
+    """ Installs a StateVar descriptor for every name listed in the
+    state_vars attribute of a model class and a ParamVar descriptor for
+    every name in param_vars.
+    """
+    def __init__(cls, name, bases, dct):
+        type.__init__(cls, name, bases, dct)
+        for var in dct.get("state_vars", ()):
+            setattr(cls, var, StateVar(var))
+        for var in dct.get("param_vars", ()):
+            setattr(cls, var, ParamVar(var))
+
+
+class Model(object):
+    __metaclass__ = ModelMeta
+
     name = ""
+    state_vars  = () # names of the variables that change with the state
+    param_vars  = () # names of the parameters kept in the shared params
+    state_store = None
+    state_row   = -1
 
     def __init__(self):
-        self.name = ""
-        self.ndim = 0
-        self.attr = {}
+        self.ndim   = 0
+        self.attr   = {}
+        self.params = ModelParams()
+
+    def __getstate__(self):
+        # Copies and pickles of a bound model hold their own state values
+        state = self.__dict__.copy()
+        store = state.pop("state_store", None)
+        row   = state.pop("state_row", None)
+        if store is not None:
+            for var in store.names:
+                state[var] = store.get_copy(var, row)
+        return state
 
     def name(self):
         return str(self.__class__)
 
     def copy(self):
-        cp = self.__class__()
-        cp.ndim = self.ndim
-        cp.attr = self.attr.copy()
-        return cp
+        """ Returns a copy of the model with its own state that shares the
+        parameters object with this model.
+        """
+        params = self.__dict__.get("params")
+        return deepcopy(self, {id(params): params})
 
     def set_params(self, params):
         pass
@@ -31,6 +134,27 @@ class Model:
     def set_state(self, **state):
         pass
 
+    def has_state_pair(self):
+        """ Returns True if the class of the model defines both get_state()
+        and set_state(), which commit_state() and rollback_state() require.
+        """
+        return hasattr(self, "get_state") and type(self).set_state is not Model.set_state
+
+    def commit_state(self):
+        """ Keeps a copy of the current state to be restored by
+        rollback_state(). Models bound to an IpStateStore are committed
+        together with the whole store by IpStateStore.commit(); other models
+        must define get_state() and set_state() for the whole state.
+        """
+        if not self.has_state_pair():
+            raise Exception("Model.commit_state: %s has no state_vars nor get_state/set_state methods" % self.__class__.__name__)
+        self.committed_state = deepcopy(self.get_state())
+
+    def rollback_state(self):
+        """ Restores the state kept by commit_state().
+        """
+        self.set_state(**self.committed_state)
+
     def prime_and_check(self):
         pass
 
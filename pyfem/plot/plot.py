@@ -9,6 +9,8 @@ import json
 import numpy
 import pylab
 
+from pyfem.tools.table import *
+
 class Plotter:
     def __init__(self):
         self.databook = []
@@ -17,14 +19,18 @@ class Plotter:
         # Adds data from Python objects
 
         # Check type of data
-        is_table = True if isinstance(data, dict) else False
+        is_table = True if isinstance(data, (dict, Table)) else False
         is_book  = True if is_table is False else False
 
         if is_table: self.databook.append(data)
         if is_book : self.databook.extend(data)
 
     def load_data(self, filename):
-        # Adds data from a json file
+        # Adds data from a json file or from a binary file written by flush()
+
+        if filename.endswith(".npy"):
+            self.add_data(read_book(filename))
+            return
 
         file = open(filename, 'r')
         data = json.load(file)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+from collections import OrderedDict
+
+import numpy
+from scipy.sparse import coo_matrix
+
+class PostGroup:
+    """ A set of active elements with the same element model class, shape
+    type, number of ips and material model class, used to evaluate nodal
+    and element values for all of them at once. A sparse operator P with
+    shape (nnodes, nelems*nips) holds the extrapolation matrices of all
+    elements, so that the nodal sums of every field are obtained with a
+    single product P*V from the ip values V (nelems*nips, nfields); count
+    gives the number of element contributions at each node for averaging.
+
+    >>> nodal_sums = group.P.dot(group.get_ip_vals())
+    """
+    def __init__(self, elems, nnodes):
+        elem_model = elems[0].elem_model
+
+        self.elems = list(elems)
+        self.ids   = numpy.array([ e.id for e in self.elems ], dtype=int)
+        self.nips  = len(elem_model.ips)
+        ne, nips   = len(self.elems), self.nips
+
+        # Labels in the same order as given by the element models
+        e_nodal_vals, e_vals = elem_model.get_nodal_and_elem_vals()
+        self.nodal_labels = list(e_nodal_vals.keys())
+        self.ip_labels    = list(e_vals.keys())
+
+        # Extrapolation operator
+        conn = numpy.array([ [ n.id for n in e.elem_model.nodes ] for e in self.elems ], dtype=int)
+        E    = numpy.array([ e.elem_model.get_geometry().E for e in self.elems ], dtype=float) # (ne, nnodes, nips)
+        rows = numpy.repeat(conn[:,:,None], nips, axis=2)
+        cols = numpy.arange(ne*nips).reshape(ne, 1, nips) + numpy.zeros_like(rows)
+        self.P     = coo_matrix((E.ravel(), (rows.ravel(), cols.ravel())), shape=(nnodes, ne*nips)).tocsr()
+        self.count = numpy.bincount(conn.ravel(), minlength=nnodes)
+
+        self.models = [ ip.mat_model for e in self.elems for ip in e.elem_model.ips ]
+        self._batch = None # (store, rows) for batched ip values
+
+    def get_batch_rows(self):
+        """ Returns the rows of all ips in the state store of the material
+        models if the values can be evaluated by get_vals_batch(); None
+        otherwise.
+        """
+        mdl0  = self.models[0]
+        store = mdl0.state_store
+        if store is None or not hasattr(mdl0, "get_vals_batch"):
+            return None
+        if self._batch is not None and self._batch[0] is store:
+            return self._batch[1]
+
+        same = getattr(mdl0, "same_params", lambda mdl: True)
+        rows = None
+        if all(mdl.state_store is store and same(mdl) for mdl in self.models):
+            rows = numpy.array([ mdl.state_row for mdl in self.models ], dtype=int)
+        self._batch = (store, rows)
+        return rows
+
+    def get_ip_vals(self):
+        """ Returns the values of all ips (nelems*nips, nfields) in the order
+        of ip_labels.
+        """
+        if not self.ip_labels:
+            return numpy.zeros((len(self.models), 0))
+
+        rows = self.get_batch_rows()
+        if rows is not None:
+            mdl0 = self.models[0]
+            vals = mdl0.get_vals_batch(mdl0.state_store.gather(rows))
+            return numpy.column_stack([ vals[label] for label in self.ip_labels ])
+
+        all_ip_vals = [ mdl.get_vals() for mdl in self.models ]
+        return numpy.array([ [ ip_vals[label] for label in self.ip_labels ] for ip_vals in all_ip_vals ], dtype=float)
+
+
+def make_post_units(elems, nnodes):
+    """ Splits a list of active elements into post groups and returns them,
+    together with the elements evaluated one by one, in the order of their
+    first element. Elements are grouped if their element model sets
+    extrapolate_ip_vals.
+    """
+    units = []
+    keys  = OrderedDict()
+    for e in elems:
+        elem_model = e.elem_model
+        if not getattr(elem_model, "extrapolate_ip_vals", False) or not elem_model.ips:
+            units.append(e)
+            continue
+
+        key = (elem_model.__class__, elem_model.shape_type, len(elem_model.nodes),
+               len(elem_model.ips), elem_model.ips[0].mat_model.__class__)
+        if key not in keys:
+            keys[key] = []
+            units.append(key)
+        keys[key].append(e)
+
+    return [ PostGroup(keys[unit], nnodes) if isinstance(unit, tuple) else unit for unit in units ]
@@ -93,15 +93,15 @@ class ElemModelSeep(ElemModel):
         """
         
         nnodes = len(self.nodes)
-        C      = self.coords()
+        geo    = self.get_geometry()
         P      = zeros(nnodes, nnodes)
         thk    = self.thickness
 
-        for ip in self.ips:
-            B, detJ = self.calcB(ip.R, C)
+        for i, ip in enumerate(self.ips):
+            B       = geo.dNdX[i]
             mdl     = ip.mat_model
             K       = mdl.calcK()
-            coef    = detJ*ip.w*thk*mdl.K_coef()
+            coef    = geo.detJw[i]*thk*mdl.K_coef()
             P      += mul(B.T, K, B)/self.gamw*coef
 
         return P
@@ -140,34 +140,32 @@ class ElemModelSeep(ElemModel):
         """
         
         nnodes = len(self.nodes)
-        C      = self.coords()
+        geo    = self.get_geometry()
         M      = zeros(nnodes, nnodes)
         thk    = self.thickness
 
-        for ip in self.ips:
-            N        = shape_func(self.shape_type, ip.R)
-            D        = deriv_func(self.shape_type, ip.R)
-            detJ     = det(mul(D, C))
+        for i, ip in enumerate(self.ips):
+            N        = geo.N[i]
             mdl      = ip.mat_model
             n_dSr_dp = mld.n_dSr_dp()
-            coef     = detJ*ip.w*thk
+            coef     = geo.detJw[i]*thk
             M       += mul(N.T, N)*n_dSr_dp*coef
 
         return P
 
     def calcQh(self):
         ndim  = self.ndim
-        C     = self.coords()
+        geo   = self.get_geometry()
         Qh    = zeros(nnodes)
         b     = zeros(ndim)
         b[-1] = self.gamw
         thk   = self.thickness
 
-        for ip in self.ips:
-            B, detJ = self.calcB(ip.R, C)
+        for i, ip in enumerate(self.ips):
+            B       = geo.dNdX[i]
             mcoef   = mdl.stiff_coef()
             K       = mdl.permeability()
-            coef    = detJ*ip.w*thk*mcoef
+            coef    = geo.detJw[i]*thk*mcoef
             Qh     += mul(B.T, K, b)*coef/self.gamw
 
         return Qh
@@ -206,11 +204,11 @@ class ElemModelSeep(ElemModel):
         # Mount total U vector
         U = self.U()
 
-        C = self.coords()
+        geo = self.get_geometry()
 
-        for ip in self.ips:
-            B,detJ = self.calcB(ip.R, C)
-            N      = shape_func(self.shape_type, ip.R)
+        for i, ip in enumerate(self.ips):
+            B      = geo.dNdX[i]
+            N      = geo.N[i]
             dwp    = float(mul(N.T,dU))       # Increment in pore-pressure
             mdl    = ip.mat_model
 
@@ -221,7 +219,7 @@ class ElemModelSeep(ElemModel):
 
             dT = 1
             mcoef  = mdl.K_coef()
-            coef   = detJ*ip.w*mcoef
+            coef   = geo.detJw[i]*mcoef
             dnSr   = 0.0
             dF    += N.T*dnSr*coef - mul(B.T,V)*dT*coef
 
@@ -311,7 +309,7 @@ class ElemModelSeep(ElemModel):
             for j, val in enumerate(ip_vals.values()):
                 IP[i,j] = val
 
-        E = extrapolator(self.shape_type)
+        E = self.get_geometry().E
         N = mul(E, IP)
 
         # Filling nodal_values dict
@@ -2,6 +2,8 @@ from pyfem.model import *
 from numpy import fill_diagonal
 
 class ModelLinPerm(Model):
+    state_vars = ("wp",)
+    param_vars = ("k", "gw")
 
     def __init__(self, *args, **kwargs):
         Model.__init__(self);
@@ -18,15 +20,6 @@ class ModelLinPerm(Model):
     def name(self):
         return "MatModelLinPerm"
 
-    def copy(self):
-        the_copy        = ModelLinPerm()
-        the_copy.ndim   = self.ndim
-        the_copy.k      = self.k
-        the_copy.wp     = self.wp
-        the_copy.gw     = self.gw 
-        the_copy.attr = self.attr.copy()
-        return the_copy
-
     def check(self):
         return True
 
@@ -47,7 +40,9 @@ class ModelLinPerm(Model):
         RETURNS:
             K: An ndim x ndim numpy array as the permeability matrix
         """
-        
+        return self.params.cached(("K", self.ndim), self.calcK_)
+
+    def calcK_(self):
         ndim = self.ndim
         K = zeros((ndim, ndim))
         fill_diagonal(K, self.k)
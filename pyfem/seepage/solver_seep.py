@@ -1,12 +1,12 @@
 from pyfem.solver import *
 from pyfem.tools.matvec import *
+from pyfem.tools.assembler import *
 from elem_model_seep import *
 import math
 from numpy.linalg import norm
 from scipy.sparse import lil_matrix
 from scipy import *
 import scipy
-from scipy.sparse.linalg import factorized
 
 class SolverSeep(Solver):
     def __init__(self):
@@ -14,12 +14,11 @@ class SolverSeep(Solver):
         self.name = "SolverSeep"
         self.DU   = None
         self.DF   = None
-        self.K    = None
         self.K11  = None
         self.K12  = None
         self.K21  = None
         self.K22  = None
-        self.LUsolver = None
+        self.assembler = None
         self.plane_stress = False
     
     def prime_and_check(self):
@@ -40,6 +39,9 @@ class SolverSeep(Solver):
         for e in self.elems:
             e.elem_model.prime_and_check()
 
+        # Contiguous storage for ip states
+        self.bind_ip_states()
+
         # Fill active elements collection
         self.aelems = []
         for e in self.elems:
@@ -59,6 +61,9 @@ class SolverSeep(Solver):
                 else:
                     self.udofs.append(dof)
 
+        # Optional bandwidth/fill reducing order of unknowns
+        self.renumber_udofs()
+
         self.dofs = []
         for dof in self.udofs:
             self.dofs.append(dof)
@@ -71,23 +76,18 @@ class SolverSeep(Solver):
 
         if not self.pdofs: raise Exception("SolveSeep.prime_and_check: No prescribed dofs=")
 
+        # Sparsity patterns of the K11..K22 blocks for current stage
+        self.assembler = PartitionedAssembler(len(self.udofs), self.ndofs)
+        for e in self.aelems:
+            self.assembler.add_map(e.elem_model.get_P_loc())
+        self.assembler.build()
+
     def mountK(self):
-        ndofs = len(self.dofs)
-        r, c, v = [], [], []
         dT = 1.0
         self.alpha = 1.0
 
-        for e in self.aelems:
-            Ke  = e.elem_model.calcP()*self.alpha*dT
-            loc = e.elem_model.get_P_loc()
-
-            for i in range(Ke.shape[0]):
-                for j in range(Ke.shape[1]):
-                    r.append(loc[i])
-                    c.append(loc[j])
-                    v.append(Ke[i,j])
-
-        self.K = scipy.sparse.coo_matrix((v, (r,c)), (ndofs, ndofs))
+        Kes = [ e.elem_model.calcP()*self.alpha*dT for e in self.aelems ]
+        self.K11, self.K12, self.K21, self.K22 = self.assembler.assemble(Kes)
 
     def solve(self):
         scheme = self.scheme
@@ -102,6 +102,7 @@ class SolverSeep(Solver):
         
         # Initialize SolveSeep object and check
         self.prime_and_check()
+        self.linear_solver.reset_stats()
 
         if self.verbose: 
             print "  active elems:", len(self.aelems)
@@ -182,8 +183,14 @@ class SolverSeep(Solver):
 
             if self.track_per_inc: 
                 self.write_history()
+            if self.output_per_inc:
+                self.write_frame(self.stage - 1 + float(self.inc)/self.nincs)
+
+        self.close_output()
 
-        if self.verbose: print "  end stage:", self.stage
+        if self.verbose:
+            print "  linear solver:", self.linear_solver
+            print "  end stage:", self.stage
 
     def solve_inc(self, DU, DF, calcK=True):
         """
@@ -200,15 +207,7 @@ class SolverSeep(Solver):
 
         if calcK:
             if incver: print "    building system...", ; sys.stdout.flush()
-            self.mountK()
-
-            # Mount K11.. K22 matrices
-            cK = self.K.tocsc()
-            self.K11 = cK[:nu , :nu ]
-            self.K12 = cK[:nu ,  nu:]
-            self.K21 = cK[ nu:, :nu ]
-            self.K22 = cK[ nu:,  nu:]
-            cK = None # Free memory
+            self.mountK() # Mounts K11.. K22 matrices
 
         F1 = DF[:nu]
         U2 = DU[nu:]
@@ -218,14 +217,11 @@ class SolverSeep(Solver):
         if nu:
             if incver: print "solving...", ; sys.stdout.flush()
 
-            if scheme == "MNR" and decomp: 
-                self.LUsolver = factorized(self.K11)
-
-            if scheme == "NR" or scheme == "FE": 
-                self.LUsolver = factorized(self.K11)
+            if decomp:
+                self.linear_solver.set_matrix(self.K11)
 
             RHS = F1 - self.K12*U2
-            U1  = scipy.sparse.linalg.spsolve(self.K11, RHS)
+            U1  = self.linear_solver.solve(RHS)
             F2 += self.K21*U1
 
         # Complete vectors
@@ -6,8 +6,19 @@ Copyright 2010-2013.
 """
 
 import os
+from collections import OrderedDict
 
 from tools.matvec import *
+from tools.linear_solver import *
+from tools.renumbering import *
+from tools.parallel import *
+from tools.vtk import *
+from tools.vtu import *
+from tools.xdmf import *
+from tools.output_writer import *
+from ip_state import *
+from post_group import *
+from checkpoint import *
 from node    import *
 from element import *
 from domain  import *
@@ -30,6 +41,21 @@ class Solver:
         self.scheme    = scheme
         self.verbose   = True
         self.track_per_inc = False
+        self.output_format   = "vtk"
+        self.output_compress = False
+        self.output_per_inc  = False
+        self.output_path     = ""
+        self.time_series     = None # XdmfSeries of the xdmf output
+        self.last_frame      = (None, None) # time and mesh key of the last frame of time_series
+        self.output_writer   = None # OutputWriter of set_async_output()
+        self._post_units     = None # (key, post groups and elements) of get_post_units()
+        self._node_elems     = None # (aelems, number of aelems, incidence) of get_node_elems()
+        self.linear_solver = LinearSolverLU()
+        self.renumbering   = None
+        self.renumbering_stats = {}
+        self.elem_loop     = ParallelElemLoop(nprocs=1)
+        self.ip_state_stores = []
+        self.unbound_models  = [] # material models with states outside the stores
 
         self.domain = None
         self.nodes  = None
@@ -78,6 +104,202 @@ class Solver:
     def set_track_per_inc(self, per_inc):
         self.track_per_inc = per_inc
 
+    def set_output_format(self, format="vtk", compress=False, per_inc=False, path=""):
+        """ Sets the format of the files written by write_output(): "vtk" for
+        legacy ASCII files, "vtu" for binary VTK XML files, optionally zlib
+        compressed, or "xdmf" for a time series in output.xmf and output.bin
+        that gets a frame for each stage or, with per_inc=True, for each
+        increment. per_inc applies only to the xdmf format. path is the
+        default output directory.
+        """
+        if format not in ("vtk", "vtu", "xdmf"):
+            raise Exception("Solver.set_output_format: Invalid format: %s" % format)
+        self.output_format   = format
+        self.output_compress = compress
+        self.output_per_inc  = per_inc
+        self.output_path     = path
+
+    def set_async_output(self, enabled=True, depth=2):
+        """ Writes output files in a background thread. The results are
+        copied when write_output() or write_frame() is called and written
+        while the solver continues; at most depth outputs wait to be
+        written. Pending files are written and the writer thread is stopped
+        before solve() returns, also if it fails; errors of the background
+        writer are raised by the next output call, flush_output() or
+        close_output().
+        """
+        if self.output_writer is not None:
+            self.output_writer.close()
+        self.output_writer = OutputWriter(depth) if enabled else None
+
+    def submit_output(self, func, *args):
+        """ Calls func(*args) in the background writer, if any, or at once.
+        Arguments must not be changed by the solver afterwards.
+        """
+        if self.output_writer is not None:
+            self.output_writer.submit(func, *args)
+        else:
+            func(*args)
+
+    def flush_output(self):
+        """ Waits until all output files have been written.
+        """
+        if self.output_writer is not None:
+            self.output_writer.flush()
+
+    def close_output(self):
+        """ Waits until all output files have been written and stops the
+        background writer thread. The thread is started again by the next
+        output call.
+        """
+        if self.output_writer is not None:
+            self.output_writer.close()
+
+    def get_output_stats(self):
+        """ Returns a dictionary with the number of jobs and the write and
+        wait times of the background writer.
+        """
+        if self.output_writer is None:
+            return {}
+        return self.output_writer.get_stats()
+
+    def set_linear_solver(self, lsolver, **kwargs):
+        """ Sets the solver used for the linear systems at each iteration.
+
+        :param lsolver: A linear solver name ("lu", "cholesky", "cg") or a
+                        LinearSolver object.
+        """
+        if isinstance(lsolver, basestring):
+            lsolver = new_linear_solver(lsolver, **kwargs)
+        self.linear_solver = lsolver
+
+    def get_linear_solver_stats(self):
+        """ Returns a dictionary with counters and times of the linear solver.
+        """
+        return self.linear_solver.get_stats()
+
+    def set_parallel(self, nprocs=None, chunk_size=256):
+        """ Sets the number of worker processes used to evaluate element
+        stiffness matrices and element updates. If nprocs is None all cpus are
+        used; nprocs=1 gives the serial element loops. The workers are
+        created once per stage; the loops stay serial if some material model
+        is not bound to an IpStateStore.
+        """
+        self.elem_loop = ParallelElemLoop(nprocs=nprocs, chunk_size=chunk_size)
+
+    def get_elem_loop_stats(self):
+        """ Returns a dictionary with counters and times of the element loops.
+        """
+        return self.elem_loop.get_stats()
+
+    def bind_ip_states(self):
+        """ Moves the state variables of the material models at all ips into
+        contiguous arrays, one IpStateStore for each material model class.
+        Stores are rebuilt only if material models were replaced.
+        """
+        models = [ ip.mat_model for e in self.elems for ip in e.elem_model.ips if ip.mat_model ]
+        stores = set(id(store) for store in self.ip_state_stores)
+        nbound = sum(store.nips for store in self.ip_state_stores)
+        if len(models)==nbound and all(id(mdl.state_store) in stores for mdl in models):
+            self.unbound_models = []
+            return
+
+        for store in self.ip_state_stores:
+            store.unbind()
+        self.ip_state_stores = make_ip_state_stores(models)
+        self.unbound_models  = [ mdl for mdl in models if mdl.state_store is None ]
+
+        # Models without state_vars are committed with get_state/set_state
+        for mdl in self.unbound_models:
+            if not mdl.has_state_pair():
+                raise Exception("Solver.bind_ip_states: Material model %s has no state_vars nor get_state/set_state methods" % mdl.__class__.__name__)
+
+    def commit_state(self):
+        """ Keeps the current state of all ips as the converged state. Material
+        updates after the commit are trial updates that are discarded by
+        rollback_state() with a few array copies for each IpStateStore.
+        """
+        for store in self.ip_state_stores:
+            store.commit()
+        for mdl in self.unbound_models:
+            mdl.commit_state()
+
+    def rollback_state(self):
+        """ Restores the state of all ips saved by the last commit_state().
+        """
+        for store in self.ip_state_stores:
+            store.rollback()
+        for mdl in self.unbound_models:
+            mdl.rollback_state()
+
+    def checkpoint(self, path):
+        """ Writes the current state of the analysis to a binary (.npz) file:
+        dof values and boundary conditions, element activation and the
+        state of all ips.
+
+        >>> solver.checkpoint("stage7.npz")
+        """
+        write_checkpoint(self, path)
+
+    def restart(self, path):
+        """ Restores a state written by checkpoint(). The domain must be
+        built with the same mesh and element models, e.g. by the script that
+        wrote the checkpoint, before the stages that follow are solved.
+
+        >>> solver.restart("stage7.npz")
+        """
+        read_checkpoint(self, path)
+
+    def set_renumbering(self, method):
+        """ Sets the method used to renumber the unknown dofs before equation
+        ids are assigned: None (mesh order), "rcm" (reverse Cuthill-McKee) or
+        "mindegree" (minimum degree).
+        """
+        if method not in (None, "rcm", "mindegree"):
+            raise Exception("Solver.set_renumbering: Unknown renumbering method: %s" % method)
+        self.renumbering = method
+
+    def renumber_udofs(self):
+        """ Reorders self.udofs by ordering the graph of nodes with unknown dofs
+        connected through the active elements. Dofs of a node are kept together.
+        Bandwidth and profile of the unknowns block before and after the
+        renumbering are stored in self.renumbering_stats.
+        """
+        if not self.renumbering or not self.udofs:
+            return
+
+        # Local indexes of nodes with unknown dofs and dof positions
+        node_idx  = {}
+        node_dofs = []
+        node_pos  = []
+        for pos, dof in enumerate(self.udofs):
+            idx = node_idx.setdefault(dof.owner_id, len(node_idx))
+            if idx == len(node_dofs):
+                node_dofs.append([])
+                node_pos .append([])
+            node_dofs[idx].append(dof)
+            node_pos [idx].append(pos)
+
+        node_conns = []
+        dof_conns  = []
+        for e in self.aelems:
+            conn = [ node_idx[n.id] for n in e.elem_model.nodes if n.id in node_idx ]
+            node_conns.append(conn)
+            dof_conns .append([ pos for i in conn for pos in node_pos[i] ])
+
+        nu = len(self.udofs)
+        pattern = adjacency_matrix(nu, dof_conns)
+        order   = graph_ordering(adjacency_matrix(len(node_dofs), node_conns), self.renumbering)
+        perm    = [ pos for i in order for pos in node_pos[i] ]
+
+        bw0, pf0 = bandwidth_and_profile(pattern)
+        bw1, pf1 = bandwidth_and_profile(pattern[perm][:,perm])
+        self.udofs = [ dof for i in order for dof in node_dofs[i] ]
+        self.renumbering_stats = { "method": self.renumbering, "bandwidth": (bw0, bw1), "profile": (pf0, pf1) }
+
+        if self.verbose:
+            print "  renumbering (%s): bandwidth %d -> %d, profile %d -> %d" % (self.renumbering, bw0, bw1, pf0, pf1)
+
     set_inc_tracking = set_track_per_inc
 
     def prime_and_check(self):
@@ -89,76 +311,140 @@ class Solver:
         """
         pass
 
+    def get_post_units(self):
+        """ Returns the post groups and the ungrouped elements of the active
+        elements, see make_post_units(). They are rebuilt only if the active
+        elements or their models have changed.
+        """
+        key = [ (e.id, e.elem_model.__class__, e.elem_model.ips[0].mat_model.__class__ if e.elem_model.ips else None)
+                for e in self.aelems ]
+        if self._post_units is None or self._post_units[0] != key:
+            self._post_units = (key, make_post_units(self.aelems, len(self.nodes)))
+        return self._post_units[1]
+
     def get_nodal_and_elem_vals(self):
         """ Return nodal and element data from all active elements
         Returns:
-            a numpy array (nnodes x MAX_DATA) containing nodal data
+            a numpy array (nnodes x nlabels) containing nodal data
             a list containing nodal data labels
-            a numpy array (nelems x MAX_DATA) containing elements data
+            a numpy array (nelems x nelabels) containing elements data
             a list containing element data labels
-        """
 
-        MAX_DATA   = 45   # max number of columns in nodal_labels matrix
-        nlabels_idx = {}  # saves nodal values labels and positions
-        elabels_idx = {}  # saves elem values labels and positions
+        Ip values of element groups are extrapolated and averaged with one
+        sparse product for each group (see PostGroup).
+        """
         nnodes     = len(self.nodes)
         nelems     = len(self.elems)
-        nodal_vals = numpy.zeros((nnodes, MAX_DATA), dtype = numpy.float32)  # float32 is important for paraview
-        nodal_reps = numpy.zeros((nnodes, MAX_DATA), dtype = numpy.int)
-        elem_vals  = numpy.zeros((nelems, MAX_DATA), dtype = numpy.float32)  # float32 is important for paraview
-        nncomps    = 0 # number of nodal data components
-        necomps    = 0 # number of element data components
-
-        for elem in self.aelems:
-            # getting values from current element
-            e_nodal_vals, e_vals = elem.elem_model.get_nodal_and_elem_vals()
-
-            # updating global list for nodal values
-            for label in e_nodal_vals.keys():
-                if not nlabels_idx.has_key(label):
-                    nlabels_idx[label] = nncomps
-                    nncomps += 1
-
-            assert nncomps <= MAX_DATA
-
-            # filling nodal values and node repetitions
+        nodal_sums = OrderedDict() # label: sums of nodal values
+        nodal_reps = OrderedDict() # label: number of contributions
+        elem_cols  = OrderedDict() # label: element values
+        dof_vals   = {}            # key: values of a dof at all nodes
+
+        def add_nodal(label, vals, reps):
+            if label not in nodal_sums:
+                nodal_sums[label] = numpy.zeros(nnodes)
+                nodal_reps[label] = numpy.zeros(nnodes, dtype=int)
+            nodal_sums[label] += vals
+            nodal_reps[label] += reps
+
+        def add_elem(label, ids, vals):
+            if label not in elem_cols:
+                elem_cols[label] = numpy.zeros(nelems)
+            elem_cols[label][ids] = vals
+
+        for unit in self.get_post_units():
+            if isinstance(unit, PostGroup):
+                V = unit.get_ip_vals()
+                N = unit.P.dot(V) # nodal sums of all fields
+                for label in unit.nodal_labels:
+                    if label in unit.ip_labels:
+                        add_nodal(label, N[:, unit.ip_labels.index(label)], unit.count)
+                    else: # dof values
+                        if label not in dof_vals:
+                            dof_vals[label] = numpy.array([ node.keys[label].U if node.keys.has_key(label) else 0.0 for node in self.nodes ])
+                        add_nodal(label, dof_vals[label]*unit.count, unit.count)
+                Vm = V.reshape(len(unit.elems), unit.nips, -1).mean(axis=1)
+                for j, label in enumerate(unit.ip_labels):
+                    add_elem(label, unit.ids, Vm[:,j])
+                continue
+
+            # getting values from an ungrouped element
+            e_nodal_vals, e_vals = unit.elem_model.get_nodal_and_elem_vals()
+            ids = numpy.array([ node.id for node in unit.nodes ], dtype=int)
             for label, values in e_nodal_vals.iteritems():
-                idx = nlabels_idx[label]
-                for i, node in enumerate(elem.nodes):
-                    ss = values[i]
-                    nodal_vals[node.id, idx] += values[i]
-                    nodal_reps[node.id, idx] += 1
-
-            # updating global list for elem values
-            for label in e_vals.keys():
-                if not elabels_idx.has_key(label):
-                    elabels_idx[label] = necomps
-                    necomps += 1
-
-            assert necomps <= MAX_DATA
-
-            # filling element values
+                vals = numpy.zeros(nnodes)
+                reps = numpy.zeros(nnodes, dtype=int)
+                numpy.add.at(vals, ids, numpy.asarray(values, dtype=float))
+                numpy.add.at(reps, ids, 1)
+                add_nodal(label, vals, reps)
             for label, value in e_vals.iteritems():
-                idx = elabels_idx[label]
-                elem_vals[elem.id, idx] = value
+                add_elem(label, unit.id, value)
 
         # averaging nodal values
-        for i in range(nnodes):
-            for j in range(len(nlabels_idx)):
-                if nodal_reps[i,j]:
-                    nodal_vals[i,j] /= nodal_reps[i,j];
+        nodal_labels = nodal_sums.keys()
+        nodal_vals   = numpy.zeros((nnodes, len(nodal_labels)), dtype = numpy.float32)  # float32 is important for paraview
+        for j, label in enumerate(nodal_labels):
+            reps = nodal_reps[label]
+            has  = reps > 0
+            nodal_vals[has, j] = nodal_sums[label][has]/reps[has]
+
+        elem_labels = elem_cols.keys()
+        elem_vals   = numpy.zeros((nelems, len(elem_labels)), dtype = numpy.float32)  # float32 is important for paraview
+        for j, label in enumerate(elem_labels):
+            elem_vals[:, j] = elem_cols[label]
 
-        # Filling nodal labels list
-        nodal_labels = [ None ]*len(nlabels_idx)
-        for label, label_idx in nlabels_idx.iteritems():
-            nodal_labels[label_idx] = label
+        return nodal_vals, nodal_labels, elem_vals, elem_labels
 
-        # Filling elem labels list
-        elem_labels = [ None ]*len(elabels_idx)
-        for label, label_idx in elabels_idx.iteritems():
-            elem_labels[label_idx] = label
+    def get_node_elems(self):
+        """ Returns a list with the active elements around each node as pairs
+        (element, local node index). It is rebuilt only if the list of
+        active elements was replaced or changed size.
+        """
+        cache = self._node_elems
+        if cache is None or cache[0] is not self.aelems or cache[1] != len(self.aelems):
+            node_elems = [ [] for node in self.nodes ]
+            for elem in self.aelems:
+                for i, node in enumerate(elem.nodes):
+                    node_elems[node.id].append((elem, i))
+            cache = self._node_elems = (self.aelems, len(self.aelems), node_elems)
+        return cache[2]
+
+    def get_nodal_vals_at(self, nodes):
+        """ Returns the nodal values at the given nodes, as in
+        get_nodal_and_elem_vals(), evaluating only the active elements around
+        them. The cost depends on the number of nodes, not on the mesh size.
+        Returns:
+            a numpy array (len(nodes) x nlabels) containing nodal data
+            a list containing nodal data labels
+        """
+        node_elems = self.get_node_elems()
+
+        # elements around the nodes with their (local index, row) pairs
+        elems = OrderedDict()
+        for row, node in enumerate(nodes):
+            for elem, i in node_elems[node.id]:
+                elems.setdefault(elem.id, (elem, []))[1].append((i, row))
+
+        nrows = len(nodes)
+        sums  = OrderedDict() # label: sums of nodal values
+        reps  = OrderedDict() # label: number of contributions
+        for elem, pairs in elems.itervalues():
+            e_nodal_vals, e_vals = elem.elem_model.get_nodal_and_elem_vals()
+            for label, values in e_nodal_vals.iteritems():
+                if label not in sums:
+                    sums[label] = numpy.zeros(nrows)
+                    reps[label] = numpy.zeros(nrows, dtype=int)
+                for i, row in pairs:
+                    sums[label][row] += values[i]
+                    reps[label][row] += 1
+
+        nodal_labels = sums.keys()
+        nodal_vals   = numpy.zeros((nrows, len(nodal_labels)), dtype = numpy.float32)
+        for j, label in enumerate(nodal_labels):
+            has = reps[label] > 0
+            nodal_vals[has, j] = sums[label][has]/reps[label][has]
 
-        return nodal_vals, nodal_labels, elem_vals, elem_labels
+        return nodal_vals, nodal_labels
 
     def get_nodal_vals(self):
         MAX_DATA   = 45   # max number of columns in nodal_labels matrix
@@ -200,7 +486,21 @@ class Solver:
 
         return nodal_vals, nodal_labels
 
-    def write_output(self, path=""):
+    def write_output(self, path="", format=None, compress=None):
+        """ Writes the results of the current stage to the file outputN.vtk or,
+        with format="vtu", to the binary file outputN.vtu, N being the stage
+        number. With format="xdmf" the results are appended as a frame to the
+        time series in output.xmf. Format and compression default to the
+        ones set by set_output_format().
+        """
+        if format is None:
+            format = self.output_format
+        if compress is None:
+            compress = self.output_compress
+        if not path:
+            path = self.output_path
+        if format not in ("vtk", "vtu", "xdmf"):
+            raise Exception("Solver.write_output: Invalid format: %s" % format)
 
         # Fill active elements list
         if not self.aelems:
@@ -208,17 +508,7 @@ class Solver:
                 if e.elem_model.is_active:
                     self.aelems.append(e)
 
-        nnodes  = len(self.nodes)
-        naelems = len(self.aelems)
-        ndim    = self.ndim
-
         nodal_vals, nodal_labels, elem_vals, elem_labels = self.get_nodal_and_elem_vals()
-        nncomps = len(nodal_labels)
-        necomps = len(elem_labels)
-
-        ndata = 0
-        for elem in self.aelems:
-            ndata += 1 + len(elem.nodes)
 
         if path:
             if path[-1] != "/":
@@ -231,117 +521,155 @@ class Solver:
             path = "./"
 
         if self.stage==1:
-            filelist = [ f for f in os.listdir(path) if f.endswith((".vtk","dat",)) ]
+            filelist = [ f for f in os.listdir(path) if f.endswith((".vtk",".vtu","dat",)) ]
             for f in filelist:
                 os.remove(path + f)
 
         if path:
-            filename = path + "output" + str(self.stage) + ".vtk"
+            filename = path + "output" + str(self.stage) + "." + format
         else:
-            filename = "output" + str(self.stage) + ".vtk"
-
-        with open(filename, "w") as output:
+            filename = "output" + str(self.stage) + "." + format
 
-            print >> output, "# vtk DataFile Version 3.0"
-            print >> output, "pyfem output "
-            print >> output, "ASCII"
-            print >> output, "DATASET UNSTRUCTURED_GRID"
-            print >> output, ""
-            print >> output, "POINTS ", nnodes,  " float64"
-
-            # Write nodes
-            for node in self.nodes:
-                #print >> output, "{:20.10}".format(node.X[0]), "{:20.10}".format(node.X[1]), "{:20.10}".format(node.X[2])
-                print >> output, "%20.10f    %20.10f    %20.10f" % (node.X[0], node.X[1], node.X[2])
-            print >> output, ""
-
-            # Write connectivities
-            print >> output, "CELLS ",naelems, " ", ndata
-            for elem in self.aelems:
-                print >> output, len(elem.nodes), " ",
-                for node in elem.nodes:
-                    print >> output, node.id, " ",
-                print >> output
-            print >> output
-
-            # Write cell types
-            print >> output, "CELL_TYPES ", naelems
-            for elem in self.aelems:
-                print >> output, get_vtk_type(elem.shape_type)
-            print >> output
-
-
-            # Write point data
-            print >> output, "POINT_DATA ", nnodes
-
-            # Write vectors
-            print >> output, "VECTORS ", "Disp float64"
-            for node in self.nodes:
-                if node.keys.has_key("ux"):
-                    print >> output, "{:20.10}".format(node.keys["ux"].U),
-                    print >> output, "{:20.10}".format(node.keys["uy"].U),
-                    if ndim==3:
-                        print >> output, "{:20.10}".format(node.keys["uz"].U)
-                    else:
-                        print >> output, "{:20.10}".format(0.0)
-                else:
-                    print >> output, "{:20.10}{:20.10}{:20.10}".format(0.0, 0.0, 0.0)
-            print >> output
-
-            for i in range(nncomps):
-                print >> output, "SCALARS ", nodal_labels[i], " float64 1"
-                print >> output, "LOOKUP_TABLE default"
-                for j in range(nnodes):
-                    print >> output, "{:20.10}".format(float(nodal_vals[j,i]))
-                print >> output
-
-            if not self.track_per_inc:
-                self.write_history(nodal_vals, nodal_labels)
-
-            # Write element data
-            print >> output, "CELL_DATA ", naelems
-            for i in range(necomps):
-                print >> output, "SCALARS ", elem_labels[i], " float64 1"
-                print >> output, "LOOKUP_TABLE default"
-                for j in range(naelems):
-                    e_idx = self.aelems[j].id
-                    print >> output, "{:20.10}".format(float(elem_vals[e_idx, i]))
-                print >> output
+        if not self.track_per_inc:
+            self.write_history(nodal_vals, nodal_labels)
 
-            # Write cell tag
-            print >> output, "SCALARS tag int 1"
-            print >> output, "LOOKUP_TABLE default"
-            for j in range(naelems):
-                try:
-                    tag = int(self.aelems[j].tag)
-                except ValueError:
-                    tag = 0
-                print >> output, "%d"%(tag)
-            print >> output
-
-            # Write cell type
-            print >> output, "SCALARS cell_type int 1"
-            print >> output, "LOOKUP_TABLE default"
-            for j in range(naelems):
-                print >> output, "%d"%(self.aelems[j].shape_type)
-            print >> output
+        if format == "xdmf":
+            self.write_xdmf_output(path + "output", float(self.stage), nodal_vals, nodal_labels, elem_vals, elem_labels)
+        elif format == "vtu":
+            self.write_vtu_output(filename, nodal_vals, nodal_labels, elem_vals, elem_labels, compress)
+        else:
+            self.write_vtk_output(filename, nodal_vals, nodal_labels, elem_vals, elem_labels)
 
         # Writting tracked data
         for n in self.tracked_nodes:
             if n.data_table.filename:
-                n.data_table.write(path + n.data_table.filename)
+                self.write_table(n.data_table, path + n.data_table.filename)
 
         for e in self.tracked_elems:
             if e.data_table.filename:
-                e.data_table.write(path + e.data_table.filename)
+                self.write_table(e.data_table, path + e.data_table.filename)
 
         for c in self.tracked_coll_nodes:
             if c.data_book.filename:
-                c.data_book.write(path + c.data_book.filename)
+                self.write_table(c.data_book, path + c.data_book.filename)
 
         for c in self.tracked_coll_ips:
             if c.data_book.filename:
-                c.data_book.write(path + c.data_book.filename)
+                self.write_table(c.data_book, path + c.data_book.filename)
+
+    def write_table(self, table, filename):
+        """ Writes a tracked Table or Book. For a .npy file only the rows
+        added since the last output are appended; any other file gets the
+        whole data as JSON.
+        """
+        if filename.endswith(".npy"):
+            chunks, append = table.take_chunks()
+            self.submit_output(write_chunks, filename, chunks, append)
+        else:
+            self.submit_output(table.snapshot().write, filename)
+
+    def get_output_mesh(self):
+        """ Returns the points and the point ids, end offsets and VTK types of
+        the active elements.
+        """
+        X       = numpy.array([ node.X for node in self.nodes ], dtype=float)
+        conn    = [ node.id for elem in self.aelems for node in elem.nodes ]
+        offsets = numpy.cumsum([ len(elem.nodes) for elem in self.aelems ])
+        types   = [ get_vtk_type(elem.shape_type) for elem in self.aelems ]
+        return X, conn, offsets, types
+
+    def get_output_data(self, nodal_vals, nodal_labels, elem_vals, elem_labels):
+        """ Returns dictionaries with the point and cell data arrays of the
+        active elements.
+        """
+        nodes  = self.nodes
+        aelems = self.aelems
+        ndim   = self.ndim
+
+        # Point data
+        disp = numpy.zeros((len(nodes), 3))
+        for i, node in enumerate(nodes):
+            if node.keys.has_key("ux"):
+                for j, key in enumerate(["ux", "uy", "uz"][:ndim]):
+                    disp[i,j] = node.keys[key].U
+
+        point_data = OrderedDict()
+        point_data["Disp"] = disp
+        for i, label in enumerate(nodal_labels):
+            point_data[label] = nodal_vals[:,i]
+
+        # Cell data
+        ids  = [ elem.id for elem in aelems ]
+        tags = numpy.zeros(len(aelems), dtype=numpy.int32)
+        for j, elem in enumerate(aelems):
+            try:
+                tags[j] = int(elem.tag)
+            except ValueError:
+                pass
+
+        cell_data = OrderedDict()
+        for i, label in enumerate(elem_labels):
+            cell_data[label] = elem_vals[ids,i]
+        cell_data["tag"]       = tags
+        cell_data["cell_type"] = numpy.array([ elem.shape_type for elem in aelems ], dtype=numpy.int32)
+
+        return point_data, cell_data
+
+    def write_vtu_output(self, filename, nodal_vals, nodal_labels, elem_vals, elem_labels, compress=False):
+        """ Writes the nodal and element values of the active elements to a
+        binary VTU file.
+        """
+        X, conn, offsets, types = self.get_output_mesh()
+        point_data, cell_data   = self.get_output_data(nodal_vals, nodal_labels, elem_vals, elem_labels)
+        self.submit_output(write_vtu, filename, X, conn, offsets, types, point_data, cell_data, compress)
+
+    def write_xdmf_output(self, filename, time, nodal_vals, nodal_labels, elem_vals, elem_labels):
+        """ Appends the nodal and element values of the active elements as a
+        frame to the time series filename.xmf. A new series is started for
+        a new filename. The mesh is written again only if the active
+        elements have changed; a frame with the time of the last one is
+        skipped, e.g. at the end of a stage written per increment.
+        """
+        series = self.time_series
+        if series is None or series.filename != filename:
+            series = self.time_series = XdmfSeries(filename)
+            self.last_frame = (None, None)
+        last_time, last_key = self.last_frame
+        if last_time == time:
+            return
+
+        key = [ elem.id for elem in self.aelems ]
+        if key != last_key:
+            X, conn, offsets, types = self.get_output_mesh()
+            self.submit_output(series.set_mesh, key, X, conn, offsets, types)
+        point_data, cell_data = self.get_output_data(nodal_vals, nodal_labels, elem_vals, elem_labels)
+        self.submit_output(series.append, time, point_data, cell_data, "stage %d inc %d" % (self.stage, self.inc))
+        self.last_frame = (time, key)
+
+    def write_frame(self, time, path=""):
+        """ Appends the results of the current increment as a frame to the
+        time series in path/output.xmf; called by the solvers after every
+        increment if per_inc was set in set_output_format(). Nothing is
+        written if the output format is not xdmf.
+        """
+        if self.output_format != "xdmf":
+            return
+        if not path:
+            path = self.output_path or "./"
+        if path[-1] != "/":
+            path = path + "/"
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        vals = self.get_nodal_and_elem_vals()
+        self.write_xdmf_output(path + "output", time, *vals)
+
+    def write_vtk_output(self, filename, nodal_vals, nodal_labels, elem_vals, elem_labels):
+        """ Writes the nodal and element values of the active elements to a
+        legacy ASCII VTK file.
+        """
+        X, conn, offsets, types = self.get_output_mesh()
+        point_data, cell_data   = self.get_output_data(nodal_vals, nodal_labels, elem_vals, elem_labels)
+        self.submit_output(write_vtk, filename, X, conn, offsets, types, point_data, cell_data)
 
     def track(self, obj, filename=""):
         if isinstance(obj, Node):
@@ -387,11 +715,11 @@ class Solver:
         output.close()
 
     def write_history(self, *args):
-        if args:
-            nodal_vals, nodal_labels = args
-        else:
-            if self.tracked_coll_nodes or self.tracked_nodes:
-                nodal_vals, nodal_labels, elem_vals, elem_labels = self.get_nodal_and_elem_vals()
+        """ Adds rows with the current results to the tables of the tracked
+        entities. Nodal values of node collections are taken from args
+        (nodal_vals, nodal_labels) of the whole mesh if given; otherwise
+        they are evaluated only around the tracked nodes.
+        """
 
         # Writing history from nodes 
         for node in self.tracked_nodes:
@@ -405,29 +733,32 @@ class Solver:
 
         # Writing history from node collection
         for coll in self.tracked_coll_nodes:
-            dist = 0.0
-            X0   = coll[0].X
+            ids = numpy.array([ node.id for node in coll ], dtype=int)
+            X   = numpy.array([ node.X for node in coll ], dtype=float)
 
             coll.data_book.add_table()
             table = coll.data_book[-1]
             table["time"] = self.time
 
-            #  Write table
-            for node in coll:
-                dist += norm(node.X - X0)
-                X0 = node.X
-
-                # Get data
-                data = {"id": node.id, "dist": dist, "x": node.x, "y": node.y}
-
-                if self.ndim==3:
-                    data["z"] = node.z
-
-                for i, key in enumerate(nodal_labels):
-                    data[key] = float(nodal_vals[node.id, i])
+            if args:
+                nodal_vals, nodal_labels = args
+                vals = nodal_vals[ids]
+            else:
+                vals, nodal_labels = self.get_nodal_vals_at(coll)
 
-                # Write table row
-                table.add_row(data)
+            #  Write table
+            data = OrderedDict()
+            data["id"]   = ids
+            data["dist"] = numpy.concatenate([[0.0], numpy.cumsum(numpy.sqrt(((X[1:] - X[:-1])**2).sum(axis=1)))])
+            data["x"]    = X[:,0]
+            data["y"]    = X[:,1]
+            if self.ndim==3:
+                data["z"] = X[:,2]
+
+            for i, key in enumerate(nodal_labels):
+                data[key] = vals[:, i].astype(float)
+
+            table.add_rows(data)
 
         # Writing history from ip collection
         for coll in self.tracked_coll_ips:
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+import numpy
+import scipy.sparse
+
+def csr_pattern(rows, cols, nrows, ncols):
+    """ Returns the CSR pattern (indptr, indices) of the given entries and the
+    position of each entry in the CSR data array.
+    """
+    if len(rows) and (rows.min()<0 or cols.min()<0 or rows.max()>=nrows or cols.max()>=ncols):
+        raise Exception("csr_pattern: Equation index out of range")
+
+    # Unique (row, col) keys sorted in row major order give the CSR pattern
+    keys = rows*ncols + cols
+    ukeys, scatter = numpy.unique(keys, return_inverse=True)
+    urows = ukeys // ncols
+
+    indices = (ukeys % ncols).astype(numpy.int32)
+    indptr  = numpy.zeros(nrows+1, dtype=numpy.int32)
+    numpy.cumsum(numpy.bincount(urows, minlength=nrows), out=indptr[1:])
+    return indptr, indices, scatter
+
+def map_entries(maps):
+    """ Returns the row and column indexes of all entries of the element
+    matrices described by a list of (rloc, cloc) maps.
+    """
+    if not maps:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+    rows = numpy.concatenate([ numpy.repeat(r, len(c)) for r, c in maps ])
+    cols = numpy.concatenate([ numpy.tile  (c, len(r)) for r, c in maps ])
+    return rows, cols
+
+def stack_values(mats):
+    """ Returns a flat array with the entries of all given matrices.
+    """
+    if len(mats):
+        return numpy.concatenate([ numpy.ravel(M) for M in mats ])
+    return numpy.zeros(0)
+
+class SparseAssembler:
+    """ Assembles element matrices into a global sparse matrix.
+
+    The CSR sparsity pattern and the scatter index that maps every entry of
+    every element matrix to a position in the CSR data array are computed once
+    by build(). Each later call to assemble() only performs a vectorized
+    scatter-add into a preallocated data array.
+
+    >>> asm = SparseAssembler(ndofs)
+    >>> for e in elems: asm.add_map(e.elem_model.get_eqn_map())
+    >>> asm.build()
+    >>> K = asm.assemble([e.elem_model.stiff() for e in elems])
+    """
+    def __init__(self, nrows, ncols=None):
+        self.nrows   = nrows
+        self.ncols   = nrows if ncols is None else ncols
+        self.maps    = []    # list of (rloc, cloc) pairs
+        self.nvals   = 0     # total number of element matrix entries
+        self.indptr  = None
+        self.indices = None
+        self.scatter = None  # position in data array for each element entry
+        self.data    = None
+        self.matrix  = None
+
+    def add_map(self, rloc, cloc=None):
+        """ Adds the row and column equation maps of an element matrix.
+        Maps must be added in the same order the matrices are given to assemble().
+        """
+        if cloc is None: cloc = rloc
+        rloc = numpy.asarray(rloc, dtype=numpy.int64)
+        cloc = numpy.asarray(cloc, dtype=numpy.int64)
+        self.maps.append((rloc, cloc))
+        self.nvals += len(rloc)*len(cloc)
+
+    @property
+    def nnz(self):
+        return len(self.indices) if self.indices is not None else 0
+
+    def build(self):
+        """ Computes the CSR pattern and the scatter index from the added maps.
+        """
+        nrows, ncols = self.nrows, self.ncols
+
+        rows, cols = map_entries(self.maps)
+        self.indptr, self.indices, self.scatter = csr_pattern(rows, cols, nrows, ncols)
+        self.data    = numpy.zeros(len(self.indices))
+        self.matrix  = scipy.sparse.csr_matrix((self.data, self.indices, self.indptr), shape=(nrows, ncols), copy=False)
+
+    def assemble(self, mats):
+        """ Returns the global CSR matrix with the given element matrices.
+        Items in mats can be single element matrices or stacks of element
+        matrices with shape (nelems, nrows, ncols), given in the same order the
+        maps were added. The returned matrix object and its data array are
+        reused among calls.
+        """
+        if self.scatter is None:
+            raise Exception("SparseAssembler.assemble: Sparsity pattern was not built")
+
+        vals = stack_values(mats)
+        if len(vals) != self.nvals:
+            raise Exception("SparseAssembler.assemble: Matrix sizes do not match equation maps")
+
+        self.data[:] = numpy.bincount(self.scatter, weights=vals, minlength=len(self.data))
+        return self.matrix
+
+
+class PartitionedAssembler(SparseAssembler):
+    """ Assembles element matrices directly into the blocks of a global matrix
+    partitioned by unknown (first nu equations) and prescribed dofs:
+
+          [  K11   K12 ]
+          [            ]
+          [  K21   K22 ]
+
+    Each block has its own CSR pattern and scatter index, so the full matrix is
+    never built. The blocks related to prescribed dofs are usually small.
+
+    >>> asm = PartitionedAssembler(nu, ndofs)
+    >>> for e in elems: asm.add_map(e.elem_model.get_eqn_map())
+    >>> asm.build()
+    >>> K11, K12, K21, K22 = asm.assemble([e.elem_model.stiff() for e in elems])
+    """
+    def __init__(self, nu, ndofs):
+        SparseAssembler.__init__(self, ndofs)
+        self.nu     = nu
+        self.blocks = [] # list of (selection, scatter, data, matrix) for each block
+
+    @property
+    def nnz(self):
+        return sum(len(blk[2]) for blk in self.blocks)
+
+    def build(self):
+        """ Computes the CSR patterns and the scatter indexes of all blocks.
+        """
+        nu, ndofs = self.nu, self.nrows
+        rows, cols = map_entries(self.maps)
+        if len(rows) and (rows.min()<0 or cols.min()<0 or rows.max()>=ndofs or cols.max()>=ndofs):
+            raise Exception("PartitionedAssembler.build: Equation index out of range")
+
+        urow = rows < nu
+        ucol = cols < nu
+        ranges = [ (0, nu), (nu, ndofs) ]
+
+        self.blocks = []
+        for i, (r0, r1) in enumerate(ranges):
+            for j, (c0, c1) in enumerate(ranges):
+                rmask = urow if i==0 else ~urow
+                cmask = ucol if j==0 else ~ucol
+                sel = numpy.flatnonzero(rmask & cmask)
+                indptr, indices, scatter = csr_pattern(rows[sel]-r0, cols[sel]-c0, r1-r0, c1-c0)
+                data   = numpy.zeros(len(indices))
+                matrix = scipy.sparse.csr_matrix((data, indices, indptr), shape=(r1-r0, c1-c0), copy=False)
+                self.blocks.append( (sel, scatter, data, matrix) )
+
+    def assemble(self, mats):
+        """ Returns the blocks K11, K12, K21 and K22 with the given element
+        matrices. The returned matrix objects are reused among calls.
+        """
+        if not self.blocks:
+            raise Exception("PartitionedAssembler.assemble: Sparsity pattern was not built")
+
+        vals = stack_values(mats)
+        if len(vals) != self.nvals:
+            raise Exception("PartitionedAssembler.assemble: Matrix sizes do not match equation maps")
+
+        for sel, scatter, data, matrix in self.blocks:
+            data[:] = numpy.bincount(scatter, weights=vals[sel], minlength=len(data))
+
+        return tuple(blk[3] for blk in self.blocks)
+
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+import time
+
+import numpy
+import scipy.sparse
+import scipy.sparse.linalg
+
+class LinearSolver:
+    """ Base class for sparse linear system solvers.
+
+    The system matrix is given by set_matrix(), which performs any
+    factorization or setup work. Later calls to solve() reuse that work
+    until a new matrix is set. Times spent in setup and solution are
+    accumulated for reporting.
+
+    >>> lsolver = LinearSolverLU()
+    >>> lsolver.set_matrix(K11)
+    >>> U1 = lsolver.solve(F1)
+    """
+    name = "abstract"
+
+    def __init__(self):
+        self.A = None
+        self.nsetups    = 0
+        self.nsolves    = 0
+        self.setup_time = 0.0
+        self.solve_time = 0.0
+
+    def set_matrix(self, A):
+        t0 = time.time()
+        self.A = A
+        self.setup(A)
+        self.setup_time += time.time() - t0
+        self.nsetups    += 1
+
+    def solve(self, b):
+        if self.A is None:
+            raise Exception("LinearSolver.solve: System matrix was not set")
+
+        t0 = time.time()
+        x  = self.calc_solution(numpy.asarray(b, dtype=float))
+        self.solve_time += time.time() - t0
+        self.nsolves    += 1
+        return x
+
+    def setup(self, A):
+        pass
+
+    def calc_solution(self, b):
+        raise Exception("LinearSolver.calc_solution: Not available in %s" % self.__class__.__name__)
+
+    def set_dof_blocks(self, blocks):
+        """ Sets the block (e.g. node) id of every unknown. Used by solvers
+        that exploit the block structure of the system.
+        """
+        pass
+
+    def set_residual(self, residual):
+        """ Informs the current residual of the nonlinear iterations.
+        """
+        pass
+
+    def reset_residual(self):
+        """ Informs the start of a new sequence of nonlinear iterations.
+        """
+        pass
+
+    def reset_stats(self):
+        self.nsetups    = 0
+        self.nsolves    = 0
+        self.setup_time = 0.0
+        self.solve_time = 0.0
+
+    @property
+    def total_time(self):
+        return self.setup_time + self.solve_time
+
+    def get_stats(self):
+        """ Returns a dictionary with counters and times of the solver.
+        """
+        return { "name"      : self.name,
+                 "nsetups"   : self.nsetups,
+                 "nsolves"   : self.nsolves,
+                 "setup_time": self.setup_time,
+                 "solve_time": self.solve_time,
+                 "total_time": self.total_time }
+
+    def __str__(self):
+        return "%s: setups: %d (%.3fs) solves: %d (%.3fs)" % \
+               (self.name, self.nsetups, self.setup_time, self.nsolves, self.solve_time)
+
+
+class LinearSolverLU(LinearSolver):
+    """ Direct solver based on a sparse LU factorization. The factors are kept
+    and reused by all solutions with the same matrix.
+    """
+    name = "lu"
+
+    def __init__(self, permc_spec="COLAMD"):
+        LinearSolver.__init__(self)
+        self.permc_spec = permc_spec
+        self.lu = None
+
+    def setup(self, A):
+        self.lu = scipy.sparse.linalg.splu(scipy.sparse.csc_matrix(A), permc_spec=self.permc_spec)
+
+    def calc_solution(self, b):
+        return self.lu.solve(b)
+
+
+class LinearSolverCholesky(LinearSolver):
+    """ Direct solver for symmetric matrices. Uses CHOLMOD through
+    scikit-sparse when available; otherwise uses a sparse LU factorization in
+    symmetric mode, with a symmetric ordering and diagonal pivoting.
+    """
+    name = "cholesky"
+
+    def __init__(self):
+        LinearSolver.__init__(self)
+        self.factor = None
+
+    def setup(self, A):
+        A = scipy.sparse.csc_matrix(A)
+        try:
+            from sksparse.cholmod import cholesky
+        except ImportError:
+            lu = scipy.sparse.linalg.splu(A, permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0.0,
+                                         options=dict(SymmetricMode=True))
+            self.factor = lu.solve
+        else:
+            self.factor = cholesky(A)
+
+    def calc_solution(self, b):
+        return self.factor(b)
+
+
+class LinearSolverCG(LinearSolver):
+    """ Iterative conjugate gradient solver with Jacobi preconditioning for
+    symmetric positive definite matrices.
+    """
+    name = "cg"
+
+    def __init__(self, tol=1.0e-10, maxiter=None):
+        LinearSolver.__init__(self)
+        self.tol     = tol
+        self.maxiter = maxiter
+        self.M       = None
+        self.niters  = 0
+
+    def setup(self, A):
+        self.A = scipy.sparse.csr_matrix(A)
+        diag = self.A.diagonal()
+        diag[diag==0.0] = 1.0
+        self.M = scipy.sparse.diags(1.0/diag)
+
+    def calc_solution(self, b):
+        def count(xk):
+            self.niters += 1
+
+        x, info = scipy.sparse.linalg.cg(self.A, b, tol=self.tol, maxiter=self.maxiter, M=self.M, callback=count)
+        if info>0:
+            raise Exception("LinearSolverCG.solve: Solution did not converge after %d iterations" % info)
+        if info<0:
+            raise Exception("LinearSolverCG.solve: Illegal input or breakdown")
+        return x
+
+
+class LinearSolverPCG(LinearSolver):
+    """ Preconditioned conjugate gradient solver for symmetric positive
+    definite matrices. Memory grows linearly with the number of unknowns for
+    the jacobi and block_jacobi preconditioners.
+
+    Preconditioners:
+        jacobi      : inverse of the diagonal
+        block_jacobi: inverse of the diagonal blocks given by set_dof_blocks
+                      (e.g. the 3x3 blocks of every node in 3D)
+        ilu         : incomplete LDL' factorization, taken from an
+                      incomplete LU factorization in symmetric mode
+
+    The previous solution, optimally scaled, is used as initial guess. If
+    adaptive is True, the relative tolerance follows the convergence of the
+    nonlinear residual (Eisenstat-Walker forcing terms), bounded by tol and
+    max_tol.
+    """
+    name = "pcg"
+
+    def __init__(self, precond="jacobi", tol=1.0e-8, maxiter=None, warm_start=True,
+                 adaptive=True, max_tol=1.0e-3, gamma=0.9, block_size=3,
+                 drop_tol=1.0e-4, fill_factor=10.0):
+        LinearSolver.__init__(self)
+        if precond not in ("jacobi", "block_jacobi", "ilu"):
+            raise Exception("LinearSolverPCG: Unknown preconditioner: %s" % precond)
+
+        self.precond     = precond
+        self.tol         = tol
+        self.max_tol     = max_tol
+        self.gamma       = gamma
+        self.maxiter     = maxiter
+        self.warm_start  = warm_start
+        self.adaptive    = adaptive
+        self.block_size  = block_size
+        self.drop_tol    = drop_tol
+        self.fill_factor = fill_factor
+
+        self.blocks   = None
+        self.M        = None  # preconditioner function
+        self.x        = None  # last solution
+        self.cur_tol  = tol
+        self.residual = None
+        self.niters   = 0
+
+    def set_dof_blocks(self, blocks):
+        self.blocks = numpy.asarray(blocks)
+
+    def set_residual(self, residual):
+        if self.adaptive and self.residual:
+            eta = self.gamma*(residual/self.residual)**2
+            self.cur_tol = min(self.max_tol, max(self.tol, eta))
+        self.residual = residual
+
+    def reset_residual(self):
+        self.residual = None
+        self.cur_tol  = self.tol
+
+    def setup(self, A):
+        self.A = scipy.sparse.csr_matrix(A)
+        if   self.precond == "jacobi"      : self.M = self.jacobi(self.A)
+        elif self.precond == "block_jacobi": self.M = self.block_jacobi(self.A)
+        else                               : self.M = self.ilu(self.A)
+
+    def jacobi(self, A):
+        diag = A.diagonal()
+        diag[diag==0.0] = 1.0
+        inv_diag = 1.0/diag
+        return lambda r: inv_diag*r
+
+    def block_jacobi(self, A):
+        n = A.shape[0]
+        blocks = self.blocks
+        if blocks is None or len(blocks) != n:
+            blocks = numpy.arange(n)//self.block_size
+
+        # Block index and position inside the block for every row
+        ids, bidx = numpy.unique(blocks, return_inverse=True)
+        order = numpy.argsort(bidx, kind="mergesort")
+        counts = numpy.bincount(bidx)
+        starts = numpy.cumsum(counts) - counts
+        pos = numpy.empty(n, dtype=int)
+        pos[order] = numpy.arange(n) - numpy.repeat(starts, counts)
+        nb, bs = len(ids), counts.max()
+
+        # Dense diagonal blocks padded with identity
+        Ab = numpy.zeros((nb, bs, bs))
+        Ab[:, range(bs), range(bs)] = 1.0
+        Ab[bidx, pos, pos] = 0.0
+        C = A.tocoo()
+        inblock = bidx[C.row] == bidx[C.col]
+        rows, cols = C.row[inblock], C.col[inblock]
+        numpy.add.at(Ab, (bidx[rows], pos[rows], pos[cols]), C.data[inblock])
+        Abinv = numpy.linalg.inv(Ab)
+
+        def apply(r):
+            rb = numpy.zeros((nb, bs))
+            rb[bidx, pos] = r
+            zb = numpy.einsum('bij,bj->bi', Abinv, rb)
+            return zb[bidx, pos]
+        return apply
+
+    def ilu(self, A):
+        # Incomplete LU in symmetric mode, with a symmetric ordering and
+        # diagonal pivoting. For a symmetric A, L ~ U'D^-1 with D = diag(U),
+        # thus U^-1 D U'^-1 gives a symmetric preconditioner as CG requires.
+        ilu = scipy.sparse.linalg.spilu(A.tocsc(), drop_tol=self.drop_tol, fill_factor=self.fill_factor,
+                                        permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0.0,
+                                        options=dict(SymmetricMode=True))
+        U = ilu.U.tocsc()
+        D = U.diagonal()
+        if (D <= 0.0).any():
+            raise Exception("LinearSolverPCG.ilu: Non positive pivot in incomplete factorization")
+
+        # Triangular solves with U and U' through a factorization without fill
+        Usolve = scipy.sparse.linalg.splu(U, permc_spec="NATURAL", diag_pivot_thresh=0.0,
+                                          options=dict(SymmetricMode=True)).solve
+        perm = ilu.perm_c
+
+        def apply(r):
+            rp = numpy.empty(len(r))
+            rp[perm] = r
+            return Usolve(D*Usolve(rp, 'T'))[perm]
+        return apply
+
+    def calc_solution(self, b):
+        A, M = self.A, self.M
+        n    = len(b)
+        bnorm = numpy.linalg.norm(b)
+        if bnorm == 0.0:
+            self.x = numpy.zeros(n)
+            return self.x.copy()
+
+        # Initial guess from previous solution
+        x = numpy.zeros(n)
+        if self.warm_start and self.x is not None and len(self.x) == n:
+            Ax = A*self.x
+            xAx = numpy.dot(self.x, Ax)
+            if xAx > 0.0:
+                x = self.x*(numpy.dot(self.x, b)/xAx)
+
+        maxiter = self.maxiter or 10*n
+        r  = b - A*x
+        z  = M(r)
+        p  = z.copy()
+        rz = numpy.dot(r, z)
+        tol = self.cur_tol*bnorm
+
+        nits = 0
+        while numpy.linalg.norm(r) > tol:
+            if nits == maxiter:
+                raise Exception("LinearSolverPCG.solve: Solution did not converge after %d iterations" % maxiter)
+            Ap    = A*p
+            alpha = rz/numpy.dot(p, Ap)
+            x    += alpha*p
+            r    -= alpha*Ap
+            z     = M(r)
+            rz_new = numpy.dot(r, z)
+            p     = z + (rz_new/rz)*p
+            rz    = rz_new
+            nits += 1
+
+        self.niters += nits
+        self.x = x
+        return x.copy()
+
+    def reset_stats(self):
+        LinearSolver.reset_stats(self)
+        self.niters = 0
+
+    def get_stats(self):
+        stats = LinearSolver.get_stats(self)
+        stats["niters"] = self.niters
+        return stats
+
+    def __str__(self):
+        return LinearSolver.__str__(self) + " iterations: %d" % self.niters
+
+
+LINEAR_SOLVERS = {
+    "lu"      : LinearSolverLU,
+    "cholesky": LinearSolverCholesky,
+    "cg"      : LinearSolverCG,
+    "pcg"     : LinearSolverPCG,
+    }
+
+def new_linear_solver(name, **kwargs):
+    """ Returns a new linear solver object given its name.
+    """
+    if name not in LINEAR_SOLVERS:
+        raise Exception("new_linear_solver: Unknown linear solver: %s" % name)
+    return LINEAR_SOLVERS[name](**kwargs)
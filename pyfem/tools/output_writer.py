@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+import sys
+import time
+import threading
+import Queue
+
+
+class OutputWriter:
+    """ Runs output jobs in a background thread so the solver does not wait
+    while files are formatted and written.
+
+    A job is a function with its arguments; the arguments must be snapshots
+    that are not modified by the solver afterwards. Jobs run in the order
+    they were submitted. At most depth jobs are queued: submit() blocks
+    while the queue is full so the memory held by snapshots is bounded.
+    The first error raised by a job is raised again, with its traceback,
+    by the next call to submit() or flush(); jobs submitted after the
+    error are discarded.
+
+    >>> writer = OutputWriter(depth=2)
+    >>> writer.submit(write_vtu, filename, X, conn, offsets, types, point_data, cell_data)
+    >>> writer.flush()
+    """
+    def __init__(self, depth=2):
+        if depth < 1:
+            raise Exception("OutputWriter: Invalid queue depth: %s" % depth)
+        self.depth  = depth
+        self.queue  = Queue.Queue(maxsize=depth)
+        self.error  = None # exc_info of the first failed job
+        self.thread = None
+        self.njobs      = 0
+        self.write_time = 0.0 # time spent by the jobs
+        self.wait_time  = 0.0 # time the caller waited for a free slot or a flush
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="OutputWriter")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                if self.error is None:
+                    func, args, kwargs = job
+                    t0 = time.time()
+                    try:
+                        func(*args, **kwargs)
+                    except Exception:
+                        self.error = sys.exc_info()
+                    self.write_time += time.time() - t0
+                    self.njobs += 1
+            finally:
+                self.queue.task_done()
+
+    def check(self):
+        """ Raises the error of a failed job, if any.
+        """
+        if self.error is not None:
+            exc_type, exc_value, tb = self.error
+            self.error = None
+            raise exc_type, exc_value, tb
+
+    def submit(self, func, *args, **kwargs):
+        """ Queues func(*args, **kwargs) to run in the background.
+        """
+        self.check()
+        if self.thread is None or not self.thread.is_alive():
+            self.start()
+        t0 = time.time()
+        self.queue.put((func, args, kwargs))
+        self.wait_time += time.time() - t0
+
+    def flush(self):
+        """ Waits until all queued jobs have run.
+        """
+        if self.thread is not None:
+            t0 = time.time()
+            self.queue.join()
+            self.wait_time += time.time() - t0
+        self.check()
+
+    def close(self):
+        """ Flushes the queue and stops the background thread.
+        """
+        try:
+            self.flush()
+        finally:
+            if self.thread is not None and self.thread.is_alive():
+                self.queue.put(None)
+                self.thread.join()
+            self.thread = None
+
+    def get_stats(self):
+        return { "njobs": self.njobs, "depth": self.depth,
+                 "write_time": self.write_time, "wait_time": self.wait_time }
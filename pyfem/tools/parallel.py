@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+import os
+import time
+import multiprocessing
+import multiprocessing.sharedctypes
+
+import numpy
+
+# Data shared with the forked workers. Set by ParallelElemLoop.start()
+# before the pool is created.
+_groups  = None   # list of element groups
+_chunks  = None   # (group index or -1, first, last) element chunks
+_cgroups = None   # element group of each chunk of a group, None otherwise
+_elems   = None   # list of elements: elements of the groups, then ungrouped ones
+_DU      = None   # incremental displacements
+_Kbuffer = None   # element matrices
+_Koffset = None   # offsets of groups and ungrouped elements in _Kbuffer
+_Fbuffer = None   # element force vectors
+_Foffset = None   # offsets of elements in _Fbuffer
+
+
+def shared_array(n):
+    """ Returns a numpy array of n floats in shared memory.
+    """
+    return numpy.frombuffer(multiprocessing.sharedctypes.RawArray('d', max(n, 1)))[:n]
+
+
+def _stiff_chunk(c):
+    k, i0, i1 = _chunks[c]
+
+    # Chunk of an element group
+    if k >= 0:
+        Ks  = _cgroups[c].stiff()
+        pos = _Koffset[k] + i0*Ks[0].size
+        _Kbuffer[pos:pos+Ks.size] = Ks.ravel()
+        return
+
+    # Chunk of ungrouped elements
+    ofs  = _Koffset[len(_groups):]
+    base = sum(g.nelems for g in _groups)
+    for i in range(i0, i1):
+        _Kbuffer[ofs[i]:ofs[i+1]] = _elems[base+i].elem_model.stiff().ravel()
+
+
+def _update_chunk(c):
+    k, i0, i1 = _chunks[c]
+
+    # Chunk of an element group: elements are at _elems[base+i0:base+i1]
+    if k >= 0:
+        base = sum(gr.nelems for gr in _groups[:k])
+        dF   = _cgroups[c].calc_update(_DU)
+        _Fbuffer[_Foffset[base+i0]:_Foffset[base+i1]] = dF.ravel()
+        return
+
+    # Chunk of ungrouped elements
+    base = sum(gr.nelems for gr in _groups)
+    DF   = numpy.zeros(len(_DU))
+    for i in range(base+i0, base+i1):
+        em  = _elems[i].elem_model
+        loc = em.get_eqn_map()
+        em.update(_DU, DF)
+        _Fbuffer[_Foffset[i]:_Foffset[i]+len(loc)] = DF[loc]
+        DF[loc] = 0.0
+
+
+class ParallelElemLoop:
+    """ Evaluates element stiffness matrices and element updates in a pool of
+    worker processes.
+
+    The pool is created by start() for the element groups and ungrouped
+    elements of a stage, after the ip states are bound to IpStateStores,
+    and is reused by all calls until close(). Element groups and ungrouped
+    elements are split into chunks of chunk_size elements. The ip states
+    are transferred only through the store arrays, which live in shared
+    memory: workers update them in place, and commits and rollbacks made by
+    the main process are seen by the workers. Element matrices and element
+    force vectors are written by the workers into shared buffers allocated
+    by start() and collected by the main process in element order. The
+    element groups of the chunks are also built by start(), before the
+    fork, thus workers only index into them. Chunks do not depend on the
+    number of workers, thus results are the same for any number of workers.
+
+    The loops run serially in the main process with nprocs=1, before
+    start(), or if some ip material model is not bound to a store.
+
+    >>> ploop = ParallelElemLoop(nprocs=4)
+    >>> ploop.start(groups, elems, ndofs)
+    >>> Kes = ploop.stiff(groups, elems)
+    >>> ploop.update(groups, elems, DU, DFint)
+    >>> ploop.close()
+    """
+    def __init__(self, nprocs=None, chunk_size=256):
+        self.nprocs     = nprocs or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.pool       = None
+        self.nworkers   = 1  # number of processes used in the last stage
+        self.chunks     = [] # (group index or -1, first, last) element chunks
+        self.kshapes    = [] # shapes of the stiffness matrices in _Kbuffer
+        self.locs       = [] # equation maps of the elements
+        self.stiff_time  = 0.0
+        self.update_time = 0.0
+        self.nstiffs     = 0
+        self.nupdates    = 0
+
+    @property
+    def is_serial(self):
+        return self.nprocs < 2 or not hasattr(os, "fork")
+
+    def get_chunks(self, n):
+        size = self.chunk_size
+        return [ (i, min(i+size, n)) for i in range(0, n, size) ]
+
+    def start(self, groups, elems, ndofs):
+        """ Allocates the shared buffers for the element groups and ungrouped
+        elements of a stage and forks the workers. Workers see the domain as
+        it is now; only the store arrays and the buffers are shared later.
+        """
+        global _groups, _chunks, _cgroups, _elems, _DU, _Kbuffer, _Koffset, _Fbuffer, _Foffset
+        self.close()
+        self.nworkers = 1
+        if self.is_serial:
+            return
+
+        groups = list(groups)
+        elems  = [ e for g in groups for e in g.elems ] + list(elems)
+        if any(ip.mat_model and ip.mat_model.state_store is None for e in elems for ip in e.elem_model.ips):
+            return
+
+        gsizes = [ len(g.get_eqn_maps()[0]) for g in groups ]
+        esizes = [ len(e.elem_model.get_eqn_map()) for e in elems[sum(g.nelems for g in groups):] ]
+        ksizes = [ g.nelems*n*n for g, n in zip(groups, gsizes) ] + [ n*n for n in esizes ]
+        self.kshapes = [ (g.nelems, n, n) for g, n in zip(groups, gsizes) ] + [ (n, n) for n in esizes ]
+        self.locs    = [ e.elem_model.get_eqn_map() for e in elems ]
+
+        self.chunks = []
+        for k, g in enumerate(groups):
+            self.chunks += [ (k, i0, i1) for i0, i1 in self.get_chunks(g.nelems) ]
+        self.chunks += [ (-1, i0, i1) for i0, i1 in self.get_chunks(len(esizes)) ]
+
+        _groups, _elems = groups, elems
+        _chunks  = self.chunks
+        _cgroups = [ groups[k].__class__(groups[k].elems[i0:i1]) if k >= 0 else None for k, i0, i1 in self.chunks ]
+        _Koffset = numpy.cumsum([0] + ksizes)
+        _Foffset = numpy.cumsum([0] + [ len(loc) for loc in self.locs ])
+        _Kbuffer = shared_array(_Koffset[-1])
+        _Fbuffer = shared_array(_Foffset[-1])
+        _DU      = shared_array(ndofs)
+        self.pool     = multiprocessing.Pool(self.nprocs)
+        self.nworkers = self.nprocs
+
+    def close(self):
+        """ Stops the workers and releases the shared buffers.
+        """
+        global _groups, _chunks, _cgroups, _elems, _DU, _Kbuffer, _Koffset, _Fbuffer, _Foffset
+        pool = self.pool
+        self.pool = None
+        _groups = _chunks = _cgroups = _elems = _DU = _Kbuffer = _Koffset = _Fbuffer = _Foffset = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def stiff(self, groups, elems):
+        """ Returns a list with the stacked stiffness matrices of every element
+        group followed by the stiffness matrices of the ungrouped elements.
+        """
+        t0 = time.time()
+
+        if self.pool is None:
+            Kes  = [ g.stiff() for g in groups ]
+            Kes += [ e.elem_model.stiff() for e in elems ]
+        else:
+            self.pool.map(_stiff_chunk, range(len(self.chunks)), chunksize=1)
+            Kes = [ _Kbuffer[_Koffset[i]:_Koffset[i+1]].reshape(shape).copy() for i, shape in enumerate(self.kshapes) ]
+
+        self.stiff_time += time.time() - t0
+        self.nstiffs    += 1
+        return Kes
+
+    def update(self, groups, elems, DU, DFint):
+        """ Updates the element groups and the ungrouped elements with the
+        incremental displacements DU and adds the internal force increments
+        to DFint.
+        """
+        t0 = time.time()
+
+        if self.pool is None:
+            for g in groups:
+                g.update(DU, DFint)
+            for e in elems:
+                e.elem_model.update(DU, DFint)
+        else:
+            _DU[:] = DU
+            self.pool.map(_update_chunk, range(len(self.chunks)), chunksize=1)
+            for i, loc in enumerate(self.locs):
+                DFint[loc] += _Fbuffer[_Foffset[i]:_Foffset[i+1]]
+
+        self.update_time += time.time() - t0
+        self.nupdates    += 1
+
+    def reset_stats(self):
+        self.stiff_time  = 0.0
+        self.update_time = 0.0
+        self.nstiffs     = 0
+        self.nupdates    = 0
+
+    def get_stats(self):
+        """ Returns a dictionary with counters and times of the element loops.
+        """
+        return { "nprocs"     : self.nworkers,
+                 "nstiffs"    : self.nstiffs,
+                 "nupdates"   : self.nupdates,
+                 "stiff_time" : self.stiff_time,
+                 "update_time": self.update_time }
+
+    def __str__(self):
+        return "procs: %d stiffness: %d (%.3fs) updates: %d (%.3fs)" % \
+               (self.get_stats()["nprocs"], self.nstiffs, self.stiff_time, self.nupdates, self.update_time)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+import numpy
+import scipy.sparse
+import scipy.sparse.linalg
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+def adjacency_matrix(n, conns):
+    """ Returns the symmetric sparse adjacency matrix (with diagonal) of a graph
+    with n vertices where every list in conns is a clique (e.g. the nodes of an
+    element).
+    """
+    rows, cols = [], []
+    for conn in conns:
+        conn = numpy.asarray(conn, dtype=int)
+        rows.append(numpy.repeat(conn, len(conn)))
+        cols.append(numpy.tile  (conn, len(conn)))
+
+    rows = numpy.concatenate(rows + [numpy.arange(n)])
+    cols = numpy.concatenate(cols + [numpy.arange(n)])
+    vals = numpy.ones(len(rows))
+    A = scipy.sparse.csr_matrix((vals, (rows, cols)), shape=(n, n))
+    A.data[:] = 1.0
+    return A
+
+def graph_ordering(A, method="rcm"):
+    """ Returns a new ordering for the vertices of the graph with adjacency
+    matrix A: the list of old indices in the new order.
+
+    Methods:
+        rcm       : reverse Cuthill-McKee (reduces bandwidth and profile)
+        mindegree : multiple minimum degree on A+A^T (reduces fill-in)
+    """
+    n = A.shape[0]
+    if n == 0:
+        return numpy.zeros(0, dtype=int)
+
+    if method == "rcm":
+        return numpy.asarray(reverse_cuthill_mckee(scipy.sparse.csr_matrix(A), symmetric_mode=True), dtype=int)
+
+    if method == "mindegree":
+        # Ordering computed by SuperLU on a diagonally dominant matrix with the
+        # same pattern as A
+        A = scipy.sparse.csc_matrix(A, dtype=float)
+        deg = numpy.diff(A.indptr)
+        M = A + scipy.sparse.diags(deg + 1.0)
+        lu = scipy.sparse.linalg.splu(scipy.sparse.csc_matrix(M), permc_spec="MMD_AT_PLUS_A",
+                                      diag_pivot_thresh=0.0, options=dict(SymmetricMode=True))
+        return numpy.argsort(lu.perm_c)
+
+    raise Exception("graph_ordering: Unknown ordering method: %s" % method)
+
+def bandwidth_and_profile(A):
+    """ Returns the half bandwidth and the profile (number of entries inside the
+    lower envelope) of the sparse symmetric pattern A.
+    """
+    A = scipy.sparse.csr_matrix(A)
+    n = A.shape[0]
+    if n == 0:
+        return 0, 0
+
+    rows = numpy.repeat(numpy.arange(n), numpy.diff(A.indptr))
+    cols = A.indices
+    first = numpy.arange(n)
+    numpy.minimum.at(first, rows, cols)
+    bandwidth = int(abs(rows - cols).max()) if len(rows) else 0
+    profile   = int((numpy.arange(n) - first).sum())
+    return bandwidth, profile
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+from math import floor, sqrt
+
+
+class SpatialHash:
+    """ Index of items by their coordinates on a uniform grid of cubic cells
+    stored in a dictionary keyed by the integer cell coordinates. Items are
+    added one at a time; lookups only visit the cells around the query.
+
+    If cell_size is not given it is chosen from the bounding box of the
+    items so that cells hold about one item, and the grid is rebuilt each
+    time the number of items doubles; the cost of additions stays O(1)
+    amortized for any scale of the coordinates.
+
+    >>> index = SpatialHash()
+    >>> index.add((0.0, 1.0, 0.0), P)
+    >>> index.find((0.0, 1.0, 0.0), tol=1.0E-8)
+    >>> index.nearest((0.1, 0.9, 0.0))
+    >>> index.within((0.0, 0.0, 0.0), 2.0)
+    """
+    def __init__(self, cell_size=None):
+        self.auto      = cell_size is None
+        self.cell_size = cell_size or 1.0
+        self.cells     = {}  # (i, j, k): list of (x, y, z, item)
+        self.n         = 0   # number of items
+        self.nbuilt    = 0   # number of items at the last rebuild
+        self.lo        = None # bounding box of the items
+        self.hi        = None
+
+    def __len__(self):
+        return self.n
+
+    def key(self, x, y, z):
+        h = self.cell_size
+        return (int(floor(x/h)), int(floor(y/h)), int(floor(z/h)))
+
+    def add(self, X, item):
+        x, y, z = (list(X) + [0.0, 0.0])[:3]
+        x, y, z = float(x), float(y), float(z)
+        if self.lo is None:
+            self.lo = [x, y, z]
+            self.hi = [x, y, z]
+        else:
+            for i, v in enumerate((x, y, z)):
+                if v < self.lo[i]: self.lo[i] = v
+                if v > self.hi[i]: self.hi[i] = v
+
+        self.cells.setdefault(self.key(x, y, z), []).append((x, y, z, item))
+        self.n += 1
+        if self.auto and self.n >= 2*self.nbuilt + 16:
+            self.rebuild()
+
+    def rebuild(self):
+        """ Chooses the cell size from the bounding box of the items and
+        distributes them again.
+        """
+        exts = [ hi - lo for lo, hi in zip(self.lo, self.hi) if hi - lo > 0.0 ]
+        if exts:
+            self.cell_size = max(exts)/max(self.n**(1.0/len(exts)), 1.0)
+        entries    = [ entry for entries in self.cells.itervalues() for entry in entries ]
+        self.cells = {}
+        for entry in entries:
+            self.cells.setdefault(self.key(*entry[:3]), []).append(entry)
+        self.nbuilt = self.n
+
+    def box(self, X, r):
+        """ Returns the entries in the cells that intersect the box of half
+        side r centered at X.
+        """
+        x, y, z = (list(X) + [0.0, 0.0])[:3]
+        i0, j0, k0 = self.key(x-r, y-r, z-r)
+        i1, j1, k1 = self.key(x+r, y+r, z+r)
+        ncells = (i1-i0+1)*(j1-j0+1)*(k1-k0+1)
+
+        if ncells > len(self.cells): # scan the occupied cells instead
+            return [ entry for (i, j, k), entries in self.cells.iteritems()
+                     if i0<=i<=i1 and j0<=j<=j1 and k0<=k<=k1 for entry in entries ]
+
+        found = []
+        cells = self.cells
+        for i in range(i0, i1+1):
+            for j in range(j0, j1+1):
+                for k in range(k0, k1+1):
+                    entries = cells.get((i, j, k))
+                    if entries: found.extend(entries)
+        return found
+
+    def find(self, X, tol=1.0E-8):
+        """ Returns the item whose coordinates differ from X by at most tol,
+        the closest one if there are several, or None.
+        """
+        x, y, z = (list(X) + [0.0, 0.0])[:3]
+        best, dmin = None, None
+        for px, py, pz, item in self.box((x, y, z), tol):
+            if abs(px-x) <= tol and abs(py-y) <= tol and abs(pz-z) <= tol:
+                d = (px-x)**2 + (py-y)**2 + (pz-z)**2
+                if dmin is None or d < dmin:
+                    best, dmin = item, d
+        return best
+
+    def within(self, X, r):
+        """ Returns a list with the items at a distance from X not greater
+        than r.
+        """
+        x, y, z = (list(X) + [0.0, 0.0])[:3]
+        r2 = r*r
+        return [ item for px, py, pz, item in self.box((x, y, z), r)
+                 if (px-x)**2 + (py-y)**2 + (pz-z)**2 <= r2 ]
+
+    def nearest(self, X):
+        """ Returns the item closest to X and its distance, or (None, None) if
+        the index is empty. The search grows by rings of cells around X
+        until no closer item can be found.
+        """
+        if not self.n:
+            return None, None
+        x, y, z = (list(X) + [0.0, 0.0])[:3]
+        h = self.cell_size
+
+        # ring beyond which there are no items
+        rmax = max(max(abs(v - lo), abs(v - hi)) for v, lo, hi in zip((x, y, z), self.lo, self.hi))
+        rmax = int(rmax/h) + 2
+
+        ci, cj, ck = self.key(x, y, z)
+        best, dmin = None, None
+        for r in range(rmax + 1):
+            if len(self.cells) < (2*r+1)**3:
+                # the rings cover more cells than are occupied: scan them all
+                for entries in self.cells.itervalues():
+                    for px, py, pz, item in entries:
+                        d = (px-x)**2 + (py-y)**2 + (pz-z)**2
+                        if dmin is None or d < dmin:
+                            best, dmin = item, d
+                break
+            for i in range(ci-r, ci+r+1):
+                for j in range(cj-r, cj+r+1):
+                    for k in range(ck-r, ck+r+1):
+                        if max(abs(i-ci), abs(j-cj), abs(k-ck)) != r: continue
+                        for px, py, pz, item in self.cells.get((i, j, k), ()):
+                            d = (px-x)**2 + (py-y)**2 + (pz-z)**2
+                            if dmin is None or d < dmin:
+                                best, dmin = item, d
+            # items in the next rings are at least r*h away
+            if dmin is not None and dmin <= (r*h)**2:
+                break
+        return best, sqrt(dmin)
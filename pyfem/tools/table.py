@@ -1,5 +1,6 @@
 from collections import *
 import json
+import numpy
 
 def json_dump(object, filename):
     with open(filename, 'w') as outfile:
@@ -10,56 +11,188 @@ def json_load(filename):
         object = json.load(infile)
     return object
 
-class Table(OrderedDict):
+def col_dtype(val):
+    """ Returns the dtype of a column for a value: int64 for integers and
+    float64 otherwise.
+    """
+    if isinstance(val, (int, long, numpy.integer)) and not isinstance(val, (bool, numpy.bool_)):
+        return numpy.dtype(numpy.int64)
+    return numpy.dtype(numpy.float64)
+
+class Table:
+    """ Table with named columns stored in growable numpy arrays. table[key]
+    returns a column as an array with nrows values. Scalar values set with
+    table[key] = value are kept as attributes of the table, e.g. the time of
+    a table in a Book.
+
+    write() exports the whole table to JSON. flush() appends only the rows
+    added since the last flush to a binary file of .npy records that is
+    read by read_table().
+
+    >>> table.add_row({"time": 0.1, "ux": 0.02})
+    >>> table.flush("node.npy")
+    """
     def __init__(self):
-        OrderedDict.__init__(self)
         self.filename = ""
-        self.nrows = 0
+        self.nrows    = 0
+        self.attrs    = OrderedDict() # key: scalar value
+        self.cols     = OrderedDict() # key: array with at least nrows values
+        self.nflushed = 0             # number of rows written by flush()
+        self.flushed  = False
+
+    # Mapping interface
+    def __getitem__(self, key):
+        if key in self.cols:
+            return self.cols[key][:self.nrows]
+        return self.attrs[key]
+
+    def __setitem__(self, key, val):
+        if numpy.ndim(val) == 0:
+            if key in self.cols:
+                raise Exception("Table: %s is a column" % key)
+            self.attrs[key] = val
+            return
+        arr = numpy.array(val)
+        if not self.cols and self.nrows == 0:
+            self.nrows = len(arr)
+        if len(arr) != self.nrows:
+            raise Exception("Table: Column %s has %d rows instead of %d" % (key, len(arr), self.nrows))
+        if arr.dtype.kind not in "iuf":
+            arr = arr.astype(float)
+        self.attrs.pop(key, None)
+        self.cols[key] = arr
+
+    def __contains__(self, key):
+        return key in self.cols or key in self.attrs
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.attrs) + len(self.cols)
+
+    def keys(self):
+        return self.attrs.keys() + self.cols.keys()
+
+    def values(self):
+        return [ self[key] for key in self.keys() ]
+
+    def items(self):
+        return [ (key, self[key]) for key in self.keys() ]
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    # Rows
+    def reserve(self, nrows):
+        """ Grows the columns, doubling their capacity, to hold nrows rows.
+        """
+        for key, col in self.cols.iteritems():
+            if len(col) < nrows:
+                new = numpy.zeros(max(nrows, 2*len(col), 8), dtype=col.dtype)
+                new[:self.nrows] = col[:self.nrows]
+                self.cols[key] = new
+
+    def add_col(self, key, val=0.0):
+        """ Adds a column filled with zeros with the dtype of val.
+        """
+        self.attrs.pop(key, None)
+        self.cols[key] = numpy.zeros(max(self.nrows, 8), dtype=col_dtype(val))
+
+    def set_value(self, key, row, val):
+        col = self.cols[key]
+        if col.dtype.kind in "iu" and col_dtype(val).kind == "f":
+            col = self.cols[key] = col.astype(float)
+        col[row] = val
 
     def add_keys(self, keys):
         assert self.nrows == 0
         if isinstance(keys, str):
             keys = [keys]
         for l in keys:
-            self[l] = []
+            self.add_col(l)
 
     def add_row(self, row_dict=None):
-        if self.nrows == 0:
-            self.add_keys(row_dict.keys())
-
         if row_dict is None:
-            for col in self.values():
-                col.append(0.0)
-        else:
-            for key, val in row_dict.iteritems():
-                self[key].append(val)
+            row_dict = {}
+
+        for key, val in row_dict.iteritems():
+            if key not in self.cols:
+                self.add_col(key, val)
+
+        self.reserve(self.nrows + 1)
+        for key, col in self.cols.iteritems():
+            col[self.nrows] = 0
+        for key, val in row_dict.iteritems():
+            self.set_value(key, self.nrows, val)
 
         self.nrows += 1
 
+    def add_rows(self, cols):
+        """ Adds rows given as a dictionary of columns with the same length.
+        Missing columns are filled with zeros.
+        """
+        n = len(cols.values()[0]) if cols else 0
+        for key, vals in cols.iteritems():
+            vals = numpy.asarray(vals)
+            if key not in self.cols:
+                self.add_col(key, vals.dtype.type(0) if vals.dtype.kind in "iu" else 0.0)
+            elif self.cols[key].dtype.kind in "iu" and vals.dtype.kind == "f":
+                self.cols[key] = self.cols[key].astype(float)
+
+        self.reserve(self.nrows + n)
+        for key, col in self.cols.iteritems():
+            col[self.nrows:self.nrows+n] = cols[key] if key in cols else 0
+        self.nrows += n
+
     def open_new_row(self):
+        for key, col in self.cols.items():
+            if col.dtype.kind in "iu":
+                self.cols[key] = col.astype(float)
+        self.reserve(self.nrows + 1)
+        for col in self.cols.values():
+            col[self.nrows] = numpy.nan
         self.nrows += 1
-        for col in self.values():
-            col.append(None)
 
     def set_data(self, data_dict, overwrite=True):
         assert(self.nrows > 0)
 
         for key, data in data_dict.iteritems():
-            if key in self:
+            if key in self.cols:
                 if overwrite:
-                    self[key][-1] = data
+                    self.set_value(key, self.nrows-1, data)
             else:
-                self[key] = [0.0] * self.nrows
-                self[key][-1] = data
+                self.add_col(key, data)
+                self.set_value(key, self.nrows-1, data)
 
     def get_col(self, key, scalar = 1.0):
-        col = self[key]
-        col[:] = [x*scalar for x in col]
-        return col
+        return self[key]*scalar
 
     def add_cols(self, str_keys, *data):
         pass
 
+    def snapshot(self):
+        """ Returns a copy of the table with copies of its columns.
+        """
+        table = Table()
+        table.attrs    = OrderedDict(self.attrs)
+        table.cols     = OrderedDict((key, self[key].copy()) for key in self.cols)
+        table.filename = self.filename
+        table.nrows    = self.nrows
+        return table
+
+    # Output
+    def to_dict(self):
+        """ Returns an OrderedDict with the attributes and the columns as lists.
+        """
+        data = OrderedDict(self.attrs)
+        for key in self.cols:
+            data[key] = self[key].tolist()
+        return data
+
     def write_txt(self, filename):
         with open(filename, 'w') as outfile:
             pass
@@ -73,7 +206,39 @@ class Table(OrderedDict):
 
         #print json.dumps(self)
         with open(filename, 'w') as outfile:
-            json.dump(self, outfile, indent=4, sort_keys=False)
+            json.dump(self.to_dict(), outfile, indent=4, sort_keys=False)
+
+    def get_chunk(self, index=0):
+        """ Returns the chunk (index, attributes, rows) with copies of the rows
+        not yet flushed, or None if there are none, and marks them as
+        flushed. A table is written at least once, even if empty.
+        """
+        if self.flushed and self.nflushed == self.nrows:
+            return None
+        dtype = [ (str(key), col.dtype) for key, col in self.cols.iteritems() ]
+        rows  = numpy.zeros(self.nrows - self.nflushed, dtype=dtype)
+        for key, col in self.cols.iteritems():
+            rows[str(key)] = col[self.nflushed:self.nrows]
+        chunk = (index, OrderedDict(self.attrs), rows)
+        self.nflushed = self.nrows
+        self.flushed  = True
+        return chunk
+
+    def take_chunks(self):
+        """ Returns the chunks not yet flushed and whether they are appended to
+        previous chunks; see write_chunks().
+        """
+        append = self.flushed
+        chunk  = self.get_chunk()
+        return [ chunk ] if chunk else [], append
+
+    def flush(self, filename=""):
+        """ Appends the rows added since the last flush to a binary file.
+        The file is created at the first flush.
+        """
+        if not filename:
+            filename = self.filename
+        write_chunks(filename, *self.take_chunks())
 
     def plot(self, xkey, ykeys, xlabel=None, ylabel=None):
         import pylab
@@ -91,16 +256,49 @@ class Table(OrderedDict):
         pylab.show()
 
 class Book(list):
+    """ List of tables, e.g. one for each output of a node collection.
+    flush() appends the tables and rows added since the last flush to a
+    binary file that is read by read_book().
+    """
     def __init__(self):
         self.filename = ""
+        self.flushed  = False
 
     def add_table(self):
         self.append(Table())
 
+    def snapshot(self):
+        """ Returns a copy of the book with copies of its tables.
+        """
+        book = Book()
+        book.extend(table.snapshot() for table in self)
+        book.filename = self.filename
+        return book
+
+    def to_list(self):
+        return [ table.to_dict() for table in self ]
+
     def write(self, filename):
         #print json.dumps(self)
         with open(filename, 'w') as outfile:
-            json.dump(self, outfile, indent=4, sort_keys=False)
+            json.dump(self.to_list(), outfile, indent=4, sort_keys=False)
+
+    def take_chunks(self):
+        """ Returns the chunks of all tables not yet flushed and whether they
+        are appended to previous chunks; see write_chunks().
+        """
+        append = self.flushed
+        chunks = [ table.get_chunk(i) for i, table in enumerate(self) ]
+        self.flushed = True
+        return [ chunk for chunk in chunks if chunk ], append
+
+    def flush(self, filename=""):
+        """ Appends the tables and rows added since the last flush to a binary
+        file. The file is created at the first flush.
+        """
+        if not filename:
+            filename = self.filename
+        write_chunks(filename, *self.take_chunks())
 
     def plot(self, key, coef=1.0, xlabel='d', ylabel=None, legend=[]):
         if not ylabel: ylabel = key
@@ -120,3 +318,53 @@ class Book(list):
             pylab.legend(curves, legend, 'lower right', shadow=True)
         pylab.grid(True)
         pylab.show()
+
+def write_chunks(filename, chunks, append=False):
+    """ Writes table chunks (index, attributes, rows) to a binary file, after
+    the chunks already in the file if append is True. Each chunk is stored
+    as two .npy records: a header with the table index and the attributes,
+    and a structured array with the rows.
+    """
+    with open(filename, 'ab' if append else 'wb') as outfile:
+        for index, attrs, rows in chunks:
+            dtype  = [ ("table", numpy.int64) ] + [ (str(key), col_dtype(val)) for key, val in attrs.iteritems() ]
+            header = numpy.zeros(1, dtype=dtype)
+            header["table"] = index
+            for key, val in attrs.iteritems():
+                header[str(key)] = val
+            numpy.save(outfile, header, allow_pickle=False)
+            numpy.save(outfile, rows, allow_pickle=False)
+
+def read_chunks(filename):
+    """ Returns the list of chunks (index, attributes, rows) in a file written
+    by write_chunks().
+    """
+    chunks = []
+    with open(filename, 'rb') as infile:
+        infile.seek(0, 2)
+        size = infile.tell()
+        infile.seek(0)
+        while infile.tell() < size:
+            header = numpy.load(infile, allow_pickle=False)
+            rows   = numpy.load(infile, allow_pickle=False)
+            attrs  = OrderedDict((key, header[key][0].item()) for key in header.dtype.names[1:])
+            chunks.append((int(header["table"][0]), attrs, rows))
+    return chunks
+
+def read_book(filename):
+    """ Returns the Book stored in a file written by Book.flush().
+    """
+    book = Book()
+    for index, attrs, rows in read_chunks(filename):
+        while len(book) <= index:
+            book.add_table()
+        table = book[index]
+        table.attrs.update(attrs)
+        table.add_rows(OrderedDict((key, rows[key]) for key in rows.dtype.names))
+    return book
+
+def read_table(filename):
+    """ Returns the Table stored in a file written by Table.flush().
+    """
+    book = read_book(filename)
+    return book[0] if book else Table()
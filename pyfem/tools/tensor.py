@@ -140,6 +140,19 @@ def dyad(T1, T2):
     else:
         return tensor2(numpy.dot(T1, T2))
 
+def J1_batch(T):
+    """ Returns J1() of n tensors given as an (n, 6) array.
+    """
+    return T[:,0] + T[:,1] + T[:,2]
+
+def J2D_batch(T):
+    """ Returns J2D() of n tensors given as an (n, 6) array.
+    """
+    sr2 = 1.414213562373
+    S = T - numpy.outer(J1_batch(T)/3.0, tensor2.I)
+    return 0.5*S[:,0]*S[:,0] + 0.5*S[:,1]*S[:,1] + 0.5*S[:,2]*S[:,2] + \
+           (S[:,3]/sr2)**2 + (S[:,4]/sr2)**2 + (S[:,5]/sr2)**2
+
 #a = tensor2([1,1,1,1,1,1]).copy()
 #print type(a)
 #print a
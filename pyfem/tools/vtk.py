@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+import numpy
+
+
+def write_vtk(filename, points, conn, offsets, types, point_data, cell_data):
+    """ Writes an unstructured grid to a legacy ASCII VTK file. Cells are
+    given as in write_vtu(). Point data arrays with three columns are
+    written as vectors; integer cell data arrays are written as int.
+    """
+    points  = numpy.asarray(points, dtype=float)
+    conn    = numpy.asarray(conn, dtype=int)
+    ends    = numpy.asarray(offsets, dtype=int)
+    begs    = numpy.concatenate([[0], ends[:-1]]).astype(int)
+    ncells  = len(ends)
+
+    lines = []
+    lines.append("# vtk DataFile Version 3.0")
+    lines.append("pyfem output ")
+    lines.append("ASCII")
+    lines.append("DATASET UNSTRUCTURED_GRID")
+    lines.append("")
+    lines.append("POINTS  %d  float64" % len(points))
+
+    # Points
+    for x, y, z in points.tolist():
+        lines.append("%20.10f    %20.10f    %20.10f" % (x, y, z))
+    lines.append("")
+
+    # Connectivities
+    lines.append("CELLS  %d   %d" % (ncells, ncells + len(conn)))
+    conn = conn.tolist()
+    for beg, end in zip(begs.tolist(), ends.tolist()):
+        lines.append("  ".join(str(n) for n in [end-beg] + conn[beg:end]))
+    lines.append("")
+
+    # Cell types
+    lines.append("CELL_TYPES  %d" % ncells)
+    lines.extend(str(t) for t in types)
+    lines.append("")
+
+    # Point data
+    lines.append("POINT_DATA  %d" % len(points))
+    for label, arr in point_data.iteritems():
+        arr = numpy.asarray(arr)
+        if arr.ndim == 2 and arr.shape[1] == 3:
+            lines.append("VECTORS  %s float64" % label)
+            lines.extend("{:20.10} {:20.10} {:20.10}".format(*row) for row in arr.tolist())
+        else:
+            lines.append("SCALARS  %s  float64 1" % label)
+            lines.append("LOOKUP_TABLE default")
+            lines.extend("{:20.10}".format(float(v)) for v in arr.tolist())
+        lines.append("")
+
+    # Cell data
+    lines.append("CELL_DATA  %d" % ncells)
+    for label, arr in cell_data.iteritems():
+        arr = numpy.asarray(arr)
+        if arr.dtype.kind in "iu":
+            lines.append("SCALARS %s int 1" % label)
+            lines.append("LOOKUP_TABLE default")
+            lines.extend("%d" % v for v in arr.tolist())
+        else:
+            lines.append("SCALARS  %s  float64 1" % label)
+            lines.append("LOOKUP_TABLE default")
+            lines.extend("{:20.10}".format(float(v)) for v in arr.tolist())
+        lines.append("")
+
+    with open(filename, "w") as output:
+        output.write("\n".join(lines))
+        output.write("\n")
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+import sys
+import zlib
+from collections import OrderedDict
+
+import numpy
+
+VTU_BLOCK_SIZE = 1 << 20 # uncompressed size of zlib blocks in bytes
+
+_vtu_types = { "f": "Float", "i": "Int", "u": "UInt" }
+
+def vtu_type(arr):
+    """ Returns the VTK XML type name of a numpy array, e.g. Float64.
+    """
+    return "%s%d" % (_vtu_types[arr.dtype.kind], 8*arr.dtype.itemsize)
+
+
+def encode_vtu_array(arr, compress=False, level=1):
+    """ Returns the bytes of an array in the appended data section of a VTU
+    file: a UInt64 header with the data size followed by the raw data or,
+    if compress is True, the header of the zlib blocks followed by the
+    compressed blocks.
+    """
+    data = numpy.ascontiguousarray(arr).tostring()
+    if not compress:
+        return numpy.array([len(data)], dtype=numpy.uint64).tostring() + data
+
+    bs     = VTU_BLOCK_SIZE
+    blocks = [ zlib.compress(data[i:i+bs], level) for i in range(0, len(data), bs) ]
+    last   = len(data) - (len(blocks)-1)*bs if blocks else 0
+    header = numpy.array([len(blocks), bs, last] + [len(b) for b in blocks], dtype=numpy.uint64)
+    return header.tostring() + "".join(blocks)
+
+
+def write_vtu(filename, points, conn, offsets, types, point_data=None, cell_data=None, compress=False):
+    """ Writes an unstructured grid to a VTK XML (.vtu) file with all arrays
+    in a raw binary appended section, optionally zlib compressed.
+
+    :param points:     (npoints, 3) coordinates.
+    :param conn:       Point ids of all cells, one cell after another.
+    :param offsets:    End position of each cell in conn.
+    :param types:      VTK cell types.
+    :param point_data: Dictionary of name: (npoints,) or (npoints, ncomps) arrays.
+    :param cell_data:  Dictionary of name: (ncells,) or (ncells, ncomps) arrays.
+
+    >>> write_vtu("output1.vtu", X, conn, offsets, types, {"Disp": U}, {"tag": tags})
+    """
+    npoints = len(points)
+    ncells  = len(offsets)
+    arrays  = [] # (section, name, array)
+    for name, arr in (point_data or {}).iteritems():
+        arrays.append(("PointData", name, numpy.asarray(arr)))
+    for name, arr in (cell_data or {}).iteritems():
+        arrays.append(("CellData", name, numpy.asarray(arr)))
+    arrays.append(("Points", None, numpy.asarray(points, dtype=numpy.float64).reshape(npoints, 3)))
+    arrays.append(("Cells", "connectivity", numpy.asarray(conn,    dtype=numpy.int64)))
+    arrays.append(("Cells", "offsets",      numpy.asarray(offsets, dtype=numpy.int64)))
+    arrays.append(("Cells", "types",        numpy.asarray(types,   dtype=numpy.uint8)))
+
+    # Encoded data and xml tags
+    blocks   = []
+    sections = OrderedDict((sec, []) for sec in ("PointData", "CellData", "Points", "Cells"))
+    offset   = 0
+    for sec, name, arr in arrays:
+        ncomps = arr.shape[1] if arr.ndim == 2 else 1
+        attrs  = 'type="%s"' % vtu_type(arr)
+        if name is not None:
+            attrs += ' Name="%s"' % name
+        tag = '<DataArray %s NumberOfComponents="%d" format="appended" offset="%d"/>' % (attrs, ncomps, offset)
+        sections[sec].append(tag)
+        blocks.append(encode_vtu_array(arr, compress))
+        offset += len(blocks[-1])
+
+    byte_order = "LittleEndian" if sys.byteorder == "little" else "BigEndian"
+    compressor = ' compressor="vtkZLibDataCompressor"' if compress else ''
+
+    with open(filename, "wb") as output:
+        output.write('<?xml version="1.0"?>\n')
+        output.write('<VTKFile type="UnstructuredGrid" version="1.0" byte_order="%s" header_type="UInt64"%s>\n' % (byte_order, compressor))
+        output.write('<UnstructuredGrid>\n')
+        output.write('<Piece NumberOfPoints="%d" NumberOfCells="%d">\n' % (npoints, ncells))
+        for sec, tags in sections.iteritems():
+            output.write('<%s>\n' % sec)
+            for tag in tags:
+                output.write(tag + '\n')
+            output.write('</%s>\n' % sec)
+        output.write('</Piece>\n')
+        output.write('</UnstructuredGrid>\n')
+        output.write('<AppendedData encoding="raw">\n_')
+        for block in blocks:
+            output.write(block)
+        output.write('\n</AppendedData>\n')
+        output.write('</VTKFile>\n')
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+PyFem - Finite element software.
+Raul Durand & Dorival Pedroso.
+Copyright 2010-2013.
+"""
+
+import os
+import sys
+
+import numpy
+
+# XDMF topology code and whether the number of points follows it, by VTK type
+_xdmf_cell_types = {
+     1: (1, True),   # vertex
+     2: (1, True),   # poly vertex
+     3: (2, True),   # line
+     5: (4, False),  # triangle
+     9: (5, False),  # quad
+    10: (6, False),  # tetra
+    12: (9, False),  # hexahedron
+    13: (8, False),  # wedge
+    14: (7, False),  # pyramid
+    21: (34, False), # quadratic edge
+    22: (36, False), # quadratic triangle
+    23: (37, False), # quadratic quad
+    24: (38, False), # quadratic tetra
+    25: (48, False), # quadratic hexahedron
+    28: (35, False), # biquadratic quad
+}
+
+_xdmf_number_types = { "f": "Float", "i": "Int", "u": "UInt" }
+
+_xdmf_head = '<?xml version="1.0"?>\n<Xdmf Version="3.0">\n<Domain>\n' \
+             '<Grid Name="TimeSeries" GridType="Collection" CollectionType="Temporal">\n'
+_xdmf_tail = '</Grid>\n</Domain>\n</Xdmf>\n'
+
+
+def xdmf_topology(conn, offsets, types):
+    """ Returns the XDMF mixed topology array of cells given as in VTK by the
+    point ids conn, the end offsets and the VTK types of all cells.
+    """
+    conn  = numpy.asarray(conn,    dtype=numpy.int64)
+    ends  = numpy.asarray(offsets, dtype=numpy.int64)
+    begs  = numpy.concatenate([[0], ends[:-1]]).astype(numpy.int64)
+    topo  = []
+    for vtk_type, beg, end in zip(types, begs.tolist(), ends.tolist()):
+        if vtk_type not in _xdmf_cell_types:
+            raise Exception("xdmf_topology: Cell type %d not supported" % vtk_type)
+        code, count = _xdmf_cell_types[vtk_type]
+        topo.append(code)
+        if count: topo.append(end - beg)
+        topo.extend(conn[beg:end].tolist())
+    return numpy.array(topo, dtype=numpy.int64)
+
+
+class XdmfSeries:
+    """ Time series of results on an unstructured grid. Arrays are appended
+    to a binary file, filename.bin, and described by an XDMF index,
+    filename.xmf. The xml of each frame is written into the index just
+    before its closing tags, which are written again after it, thus the
+    index is always valid and never rewritten. The mesh is written once
+    and again only if it changes, e.g. after elements are deactivated, so
+    every frame costs only the size of its field arrays.
+
+    >>> series = XdmfSeries("output")
+    >>> series.set_mesh(key, X, conn, offsets, types)
+    >>> series.append(1.0, {"Disp": U}, {"tag": tags})
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.xmf      = filename + ".xmf"
+        self.bin      = filename + ".bin"
+        self.offset   = 0    # size of the binary file
+        self.nframes  = 0
+        self.mesh_key = None
+        self.mesh_xml = ""   # xml of the current topology and geometry
+        self.ncells   = 0
+        open(self.bin, "wb").close()
+        with open(self.xmf, "w") as output:
+            output.write(_xdmf_head + _xdmf_tail)
+
+    def write_array(self, arr):
+        """ Appends an array to the binary file and returns the xml of the
+        corresponding data item.
+        """
+        arr  = numpy.ascontiguousarray(arr)
+        dims = " ".join(str(n) for n in arr.shape)
+        with open(self.bin, "ab") as f:
+            f.write(arr.tostring())
+        endian = "Little" if sys.byteorder == "little" else "Big"
+        xml = '<DataItem Dimensions="%s" NumberType="%s" Precision="%d" Format="Binary" Endian="%s" Seek="%d">%s</DataItem>' % \
+              (dims, _xdmf_number_types[arr.dtype.kind], arr.dtype.itemsize, endian, self.offset, os.path.basename(self.bin))
+        self.offset += arr.nbytes
+        return xml
+
+    def set_mesh(self, key, points, conn, offsets, types):
+        """ Sets the mesh of the following frames. The mesh is written only if
+        key differs from the one of the current mesh.
+        """
+        if key == self.mesh_key:
+            return
+        topo = xdmf_topology(conn, offsets, types)
+        self.mesh_key = key
+        self.ncells   = len(offsets)
+        self.mesh_xml = '<Topology TopologyType="Mixed" NumberOfElements="%d">%s</Topology>\n' % (self.ncells, self.write_array(topo)) + \
+                        '<Geometry GeometryType="XYZ">%s</Geometry>\n' % self.write_array(numpy.asarray(points, dtype=numpy.float64))
+
+    def append(self, time, point_data=None, cell_data=None, name=""):
+        """ Appends a frame with point and cell data arrays to the binary file
+        and to the index file.
+        """
+        if self.mesh_key is None:
+            raise Exception("XdmfSeries.append: Mesh was not set")
+        xml = [ '<Grid Name="%s" GridType="Uniform">\n' % (name or "frame %d" % self.nframes),
+                '<Time Value="%r"/>\n' % float(time),
+                self.mesh_xml ]
+        for center, data in (("Node", point_data or {}), ("Cell", cell_data or {})):
+            for label, arr in data.iteritems():
+                arr   = numpy.asarray(arr)
+                atype = "Vector" if arr.ndim == 2 and arr.shape[1] == 3 else "Scalar"
+                xml.append('<Attribute Name="%s" AttributeType="%s" Center="%s">%s</Attribute>\n' % (label, atype, center, self.write_array(arr)))
+        xml.append('</Grid>\n')
+        xml.append(_xdmf_tail)
+
+        # Frame written over the closing tags
+        with open(self.xmf, "r+b") as output:
+            output.seek(-len(_xdmf_tail), 2)
+            output.write("".join(xml))
+        self.nframes += 1
@@ -0,0 +1,47 @@
+# Include PyFEM libraries
+from pyfem import *
+import os
+
+# Output written in the background compared with the inline output
+def run(background, track=""):
+    block = Block2D([[0,0], [1,0], [1,1], [0,1]])
+    block.set_divisions(4, 4)
+    mesh = Mesh(block)
+    mesh.set_verbose(False)
+    mesh.generate()
+
+    dom = Domain(mesh)
+    dom.elems.set_elem_model(EqElasticSolid(E=1.0E4, nu=0.25))
+
+    solver = SolverEq(dom, nincs=2)
+    solver.set_verbose(False)
+    solver.set_track_per_inc(True)
+    solver.set_async_output(background, depth=1)
+    solver.track(dom.nodes[-1], track or "node.json")
+    for stage in range(2):
+        dom.faces.sub(y=0.0).set_bc(ux=0.0, uy=0.0)
+        dom.faces.sub(y=1.0).set_bc(ty=-1.0)
+        solver.solve(write=True)
+        if background: # the writer thread is stopped by solve()
+            assert not solver.output_writer.thread
+
+    # All files are written when solve() returns
+    files = {}
+    for f in ["output1.vtk", "output2.vtk", track or "node.json"]:
+        files[f] = open(f).read()
+        os.remove(f)
+    return files, solver.get_output_stats()
+
+files0, stats0 = run(False)
+files1, stats1 = run(True)
+assert files0 == files1
+assert stats0 == {} and stats1["njobs"] == 4
+
+# Errors of the background writer are raised by the solver
+try:
+    run(True, track="no_such_dir/node.json")
+    assert False
+except IOError:
+    os.remove("output1.vtk")
+import threading
+assert not [ t for t in threading.enumerate() if t.name == "OutputWriter" ]
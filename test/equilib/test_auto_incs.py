@@ -0,0 +1,41 @@
+# Include PyFEM libraries
+from pyfem import *
+
+# Mohr-Coulomb block under a corner load solved with automatic increments
+def solve_block(fz, **kwargs):
+    block = Block3D()
+    block.make_box([0,0,0], [1,1,0.5])
+    block.set_divisions(2,2,2)
+    mesh = Mesh(block)
+    mesh.generate()
+
+    domain = Domain(mesh)
+    domain.elems.set_elem_model(EqMohrCoulombSolid(c=0.084, phi=0.125, E=100., nu=0.25))
+    domain.nodes.sub(z=0.0).set_bc(ux=0, uy=0, uz=0)
+    domain.nodes.sub(x=1.0).sub(y=1.0).set_bc(fz=fz)
+    domain.nodes.sub(x=[0.0, 1.0]).set_bc(ux=0, uy=0)
+    domain.nodes.sub(y=[0.0, 1.0]).set_bc(ux=0, uy=0)
+
+    domain.set_solver(SolverEq())
+    domain.solver.set_scheme("NR")
+    domain.solver.set_incs(4)
+    domain.solver.set_auto_incs(**kwargs)
+    domain.solver.solve()
+    return domain.solver
+
+# Below the limit load
+solver  = solve_block(-0.2, dlam_max=0.5, nits_fast=6)
+history = solver.inc_history
+print "  increments:", history
+assert history[-1][0] == 1.0
+assert abs(sum(h[1] for h in history) - 1.0) < 1.0E-12
+assert max(h[1] for h in history) <= 0.5
+assert max(h[1] for h in history) > 0.25 # enlarged after fast increments
+assert sum(h[2] for h in history) == solver.nits
+
+# Above the limit load the increment is reduced down to the minimum
+try:
+    solve_block(-0.4, dlam_min=1.0E-3)
+    assert False
+except Exception as e:
+    assert "minimum" in str(e)
@@ -0,0 +1,45 @@
+# Include PyFEM libraries
+from pyfem import *
+
+# Cracking concrete truss solved with the NR, MNR and BFGS schemes
+def solve_truss(scheme, line_search=False):
+    L = 8.0
+    H = 4.0
+    block = Block2D([[0,0], [L,0], [L,H], [0,H]])
+    block.set_divisions(8, 4)
+    block.make_truss(htag='h', vtag='v', dtag='d')
+
+    msh = Mesh(block)
+    msh.set_verbose(False)
+    msh.generate()
+
+    dom = Domain(mesh=msh)
+    dom.elems.set_elem_model(EqConcreteTruss(E=20e3, A=0.03, sig_yc=200., sig_yt=40.))
+
+    solver = SolverEq(domain=dom, scheme=scheme, nincs=2)
+    solver.set_verbose(False)
+    solver.set_precision(1e-3)
+    solver.set_line_search(line_search)
+
+    dom.nodes.sub(x=0).set_bc(ux=0, uy=0)
+    dom.nodes.sub(x=L).set_bc(ux=0, uy=0)
+    dom.nodes.sub(x=L/2., y=H).set_bc(fy=-12.0)
+    solver.solve()
+
+    stats = solver.inc_stats
+    assert len(stats) == 2
+    assert all(st["converged"] for st in stats)
+    assert sum(st["its"] for st in stats) == solver.nits
+    return sum(st["its"] for st in stats), sum(st["nfactors"] for st in stats)
+
+nr   = solve_truss("NR")
+mnr  = solve_truss("MNR")
+bfgs = solve_truss("BFGS", line_search=True)
+print "  NR (its, factorizations):", nr, " MNR:", mnr, " BFGS:", bfgs
+
+assert nr[1] == nr[0]
+assert mnr[1] == 2 and bfgs[1] == 2   # one factorization per increment
+assert bfgs[0] < mnr[0]
+
+# BFGS with line search stays close to NR, which refactorizes at every iteration
+assert bfgs[0] <= 3*nr[0]
@@ -0,0 +1,70 @@
+# Include PyFEM libraries
+from pyfem import *
+import os
+
+# Staged analysis of a Mohr-Coulomb block restarted from a checkpoint
+def make_domain():
+    block = Block3D()
+    block.make_box([0,0,0], [1,1,0.5])
+    block.set_divisions(2,2,2)
+    mesh = Mesh(block)
+    mesh.set_verbose(False)
+    mesh.generate()
+
+    domain = Domain(mesh)
+    domain.elems.set_elem_model(EqMohrCoulombSolid(c=0.084, phi=0.125, E=100., nu=0.25))
+    domain.set_solver(SolverEq(scheme="NR", nincs=4))
+    domain.solver.set_verbose(False)
+    return domain
+
+def stage1(domain):
+    domain.nodes.sub(z=0.0).set_bc(ux=0, uy=0, uz=0)
+    domain.nodes.sub(x=[0.0, 1.0]).set_bc(ux=0, uy=0)
+    domain.nodes.sub(y=[0.0, 1.0]).set_bc(ux=0, uy=0)
+    domain.nodes.sub(x=1.0).sub(y=1.0).set_bc(fz=-0.1)
+    domain.solver.solve()
+    domain.elems[4].elem_model.deactivate() # excavation with deactivation forces
+
+def stage2(domain):
+    domain.nodes.sub(z=0.0).set_bc(ux=0, uy=0, uz=0)
+    domain.nodes.sub(x=[0.0, 1.0]).set_bc(ux=0, uy=0)
+    domain.nodes.sub(y=[0.0, 1.0]).set_bc(ux=0, uy=0)
+    domain.nodes.sub(x=1.0).sub(y=1.0).set_bc(fz=-0.1)
+    domain.solver.solve()
+    return array([ dof.U for node in domain.nodes for dof in node.dofs ])
+
+# Whole analysis
+dom1 = make_domain()
+stage1(dom1)
+dom1.solver.checkpoint("checkpoint.npz")
+U1 = stage2(dom1)
+
+# Restarted analysis
+dom2 = make_domain()
+dom2.solver.restart("checkpoint.npz")
+assert dom2.solver.stage == 1
+assert sum(not e.elem_model.is_active for e in dom2.elems) == 1
+U2 = stage2(dom2)
+os.remove("checkpoint.npz")
+
+print "  max difference:", abs(U1-U2).max()
+assert abs(U1).max() > 0.0
+assert (U1 == U2).all()
+assert dom1.solver.ip_state_stores[0].arrays["sig"].tolist() == dom2.solver.ip_state_stores[0].arrays["sig"].tolist()
+
+# A different domain is rejected
+dom3 = make_domain()
+dom3.solver.checkpoint("checkpoint.npz")
+block = Block2D([[0,0],[1,0],[1,1],[0,1]])
+mesh  = Mesh(block)
+mesh.set_verbose(False)
+mesh.generate()
+dom4  = Domain(mesh)
+dom4.elems.set_elem_model(EqElasticSolid(E=100., nu=0.25))
+dom4.set_solver(SolverEq())
+try:
+    dom4.solver.restart("checkpoint.npz")
+    assert False
+except Exception as e:
+    assert "does not match" in str(e)
+os.remove("checkpoint.npz")
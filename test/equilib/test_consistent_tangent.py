@@ -0,0 +1,75 @@
+# Include PyFEM libraries
+from pyfem import *
+from pyfem.equilib.mat_model_drucker_prager import MatModelDruckerPrager
+from scipy.optimize import brentq
+import numpy
+
+# Consistent Drucker-Prager tangent compared with finite differences of an
+# exact return mapping
+numpy.random.seed(1)
+mdl = MatModelDruckerPrager(E=1.0E4, nu=0.25, alpha=0.1, kappa=10.0, tangent="consistent")
+De  = numpy.asarray(mdl.calcDe())
+
+def exact_return(sig_tr):
+    DV = De.dot(mdl.yield_deriv_batch(array([sig_tr]))[0])
+    f  = lambda g: mdl.yield_func_batch(array([sig_tr - g*DV]))[0]
+    if f(0.0) <= 0.0: return sig_tr, 0.0
+    b = 1.0E-6
+    while f(b) > 0.0: b *= 2.0
+    g = brentq(f, 0.0, b, xtol=1.0E-16, rtol=1.0E-15)
+    return sig_tr - g*DV, g
+
+sig0 = array([-20., -20., -20., 0., 0., 0.])
+for k in range(10):
+    deps   = numpy.random.uniform(-2.0E-3, 2.0E-3, 6)
+    sig, g = exact_return(sig0 + De.dot(deps))
+    if g == 0.0: continue
+    state = { "sig": array([sig]), "plast": array([1.0]), "dg": array([g]) }
+    D     = mdl.stiff_batch(state)[0]
+
+    h   = 1.0E-8
+    Dfd = numpy.empty((6,6))
+    for j in range(6):
+        e = deps.copy()
+        e[j] += h
+        Dfd[:,j] = (exact_return(sig0 + De.dot(e))[0] - sig)/h
+    assert abs(D - Dfd).max() < 1.0E-5*abs(Dfd).max()
+
+# Newton-Raphson iterations with consistent and continuum tangents. Both
+# converge for these loads; the consistent tangent needs fewer iterations.
+def solve_block(elem_model):
+    block = Block3D()
+    block.make_box([0,0,0], [1,1,0.5])
+    block.set_divisions(2,2,2)
+    mesh = Mesh(block)
+    mesh.generate()
+
+    domain = Domain(mesh)
+    domain.elems.set_elem_model(elem_model)
+    domain.nodes.sub(z=0.0).set_bc(ux=0, uy=0, uz=0)
+    domain.nodes.sub(x=1.0).sub(y=1.0).set_bc(fz=-0.12)
+    domain.nodes.sub(x=[0.0, 1.0]).set_bc(ux=0, uy=0)
+    domain.nodes.sub(y=[0.0, 1.0]).set_bc(ux=0, uy=0)
+
+    domain.set_solver(SolverEq())
+    domain.solver.set_scheme("NR")
+    domain.solver.set_incs(10)
+    domain.solver.solve()
+    return domain.solver.nits
+
+# Mohr-Coulomb
+nits1 = solve_block(EqMohrCoulombSolid(c=0.084, phi=0.125, E=100., nu=0.25, tangent="consistent"))
+nits2 = solve_block(EqMohrCoulombSolid(c=0.084, phi=0.125, E=100., nu=0.25, tangent="continuum"))
+print "  Mohr-Coulomb NR iterations: consistent", nits1, " continuum", nits2
+assert nits2 > nits1
+
+# Drucker-Prager
+nits1 = solve_block(EqDruckerPragerSolid(alpha=0.1, kappa=0.2, E=100., nu=0.25, tangent="consistent"))
+nits2 = solve_block(EqDruckerPragerSolid(alpha=0.1, kappa=0.2, E=100., nu=0.25, tangent="continuum"))
+print "  Drucker-Prager NR iterations: consistent", nits1, " continuum", nits2
+assert nits2 > nits1
+
+# Both models default to the consistent tangent
+from pyfem.equilib.mat_model_mohr_coulomb import MatModelMohrCoulomb
+assert MatModelDruckerPrager(E=100., nu=0.25, alpha=0.1, kappa=0.2).tangent == "consistent"
+assert MatModelMohrCoulomb(c=0.084, phi=0.125, E=100., nu=0.25).params.tangent == "consistent"
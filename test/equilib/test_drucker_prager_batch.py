@@ -0,0 +1,38 @@
+# Include PyFEM libraries
+from pyfem import *
+from pyfem.equilib.mat_model_drucker_prager import MatModelDruckerPrager
+import numpy
+
+# Batched Drucker-Prager stress update compared with the ip by ip update
+numpy.random.seed(1)
+n = 200
+
+mdl = MatModelDruckerPrager(E=1.0E4, nu=0.25, alpha=0.2, kappa=10.0, T=10.0)
+mdl.prime_and_check()
+
+models = []
+for i in range(n):
+    m = mdl.copy()
+    m.prime_and_check()
+    p = -numpy.random.uniform(0.0, 20.0)
+    m.set_state(sxx=p, syy=p, szz=p)
+    models.append(m)
+
+state = { "sig"  : array([ m.sig for m in models ]),
+          "eps"  : array([ m.eps for m in models ]),
+          "plast": array([ m.plast for m in models ], dtype=float),
+          "dg"   : array([ m.dg for m in models ]) }
+
+for k in range(3):
+    deps = numpy.random.uniform(-2.0E-3, 2.0E-3, (n, 6))
+    dsig = mdl.stress_update_batch(state, deps)
+    D    = mdl.stiff_batch(state)
+    for i, m in enumerate(models):
+        dsig_i = m.stress_update(deps[i])
+        assert norm(dsig[i] - dsig_i) <= 1.0E-8*max(1.0, norm(dsig_i))
+        assert norm(state["sig"][i] - m.sig) <= 1.0E-8*max(1.0, norm(m.sig))
+        assert abs(state["dg"][i] - m.dg) <= 1.0E-10
+        assert bool(state["plast"][i]) == m.plast
+        assert abs(D[i] - m.stiff()).max() <= 1.0E-8*abs(D[i]).max()
+
+print "  plastic ips:", int(state["plast"].sum()), "of", n
@@ -0,0 +1,86 @@
+# Include PyFEM libraries
+from pyfem import *
+import copy
+
+# Elastic cube with ip states kept in contiguous stores
+block = Block3D()
+block.make_box([0,0,0], [1,1,1])
+block.set_divisions(2,2,2)
+
+mesh = Mesh(block)
+mesh.generate()
+
+domain = Domain(mesh)
+domain.elems.set_elem_model(EqElasticSolid(E=1.0E4, nu=0.25))
+domain.elems.set_state(sxx=-1.0)
+
+domain.faces.sub(z=0.0).set_bc(ux=0.0, uy=0.0, uz=0.0)
+domain.faces.sub(z=1.0).set_bc(tz=-1.0)
+
+domain.set_solver(SolverEq())
+domain.solver.solve()
+
+stores = domain.solver.ip_state_stores
+ips    = domain.elems.ips
+assert len(stores) == 1
+assert stores[0].arrays["sig"].shape == (len(ips), 6)
+
+# Models are views into the store
+mdl = ips[0].mat_model
+assert mdl.state_store is stores[0]
+assert (mdl.sig == stores[0].arrays["sig"][mdl.state_row]).all()
+assert mdl.get_vals()["szz"] == stores[0].arrays["sig"][mdl.state_row, 2]
+
+# Parameters and elastic matrix are shared by all ips
+assert all(ip.mat_model.params is mdl.params for ip in ips)
+assert mdl.stiff() is ips[-1].mat_model.stiff()
+assert "E" not in mdl.__dict__
+
+# Copies are not bound
+cp = copy.deepcopy(mdl)
+cp.sig[2] = 100.0
+assert cp.state_store is None
+assert mdl.sig[2] != 100.0
+
+# State changes go to the store
+st = mdl.get_state()
+mdl.set_state(sxx=5.0)
+assert stores[0].arrays["sig"][mdl.state_row, 0] == 5.0
+mdl.set_state(**st)
+assert stores[0].arrays["sig"][mdl.state_row, 0] == st["sxx"]
+
+# A second stage reuses the stores
+domain.faces.sub(z=0.0).set_bc(ux=0.0, uy=0.0, uz=0.0)
+domain.solver.solve()
+assert domain.solver.ip_state_stores[0] is stores[0]
+
+# Trial updates are discarded by a rollback to the committed state
+solver = domain.solver
+sig0 = stores[0].arrays["sig"].copy()
+mdl.set_state(sxx=7.0)
+solver.rollback_state()
+assert (stores[0].arrays["sig"] == sig0).all()
+mdl.set_state(sxx=7.0)
+solver.commit_state()
+solver.rollback_state()
+assert mdl.get_vals()["sxx"] == 7.0
+
+# Rollback restores all state variables of the plastic bar models
+from pyfem.equilib.mat_model_soft_bar import ModelPlasticBar
+from pyfem.ip_state import make_ip_state_stores
+bars   = [ ModelPlasticBar(E=1.0, A=1.0, sig_max=1.0) for i in range(3) ]
+stores = make_ip_state_stores(bars)
+assert len(stores) == 1 and all(bar.state_store is stores[0] for bar in bars)
+stores[0].commit()
+bars[0].stress_update(array([2.0]))
+assert bars[0].sig[0] > 1.0 and bars[0].eps[0] == 2.0 and bars[0].z != 0.0
+stores[0].rollback()
+assert bars[0].sig[0] == 0.0 and bars[0].eps[0] == 0.0 and bars[0].z == 0.0
+
+# Models without state_vars need a get_state/set_state pair
+class StatelessModel(Model): pass
+try:
+    StatelessModel().commit_state()
+    assert False
+except Exception as e:
+    assert "get_state" in str(e)
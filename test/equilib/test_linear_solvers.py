@@ -0,0 +1,49 @@
+# Include PyFEM libraries
+from pyfem import *
+
+# Solves the same elastic cube with every linear solver backend
+def solve_cube(lsolver):
+    block = Block3D()
+    block.make_box([0,0,0], [1,1,1])
+    block.set_divisions(3,3,3)
+
+    mesh = Mesh(block)
+    mesh.generate()
+
+    domain = Domain(mesh)
+    domain.elems.set_elem_model(EqElasticSolid(E=1.0E5, nu=0.3))
+
+    domain.faces.sub(x=0.0).set_bc(ux=0.0, uy=0.0, uz=0.0)
+    domain.faces.sub(x=1.0).set_bc(tx=1.0)
+
+    domain.set_solver(SolverEq())
+    domain.solver.set_linear_solver(lsolver)
+    domain.solver.solve()
+
+    print "  ", domain.solver.get_linear_solver_stats()
+    return array([ n.keys["ux"].U for n in domain.nodes ])
+
+U_lu = solve_cube("lu")
+for name in ["cholesky", "cg"]:
+    U = solve_cube(name)
+    assert abs(U - U_lu).max() < 1.0e-8*abs(U_lu).max()
+
+# Preconditioned conjugate gradients
+for precond in ["jacobi", "block_jacobi", "ilu"]:
+    U = solve_cube(LinearSolverPCG(precond=precond, tol=1.0e-12))
+    assert abs(U - U_lu).max() < 1.0e-8*abs(U_lu).max()
+
+# The ilu preconditioner is symmetric
+import scipy.sparse
+n = 40
+A = scipy.sparse.diags([-1.0, -1.0, 4.5, -1.0, -1.0], [-6, -1, 0, 1, 6], shape=(n, n)).tocsr()
+M = LinearSolverPCG(precond="ilu", drop_tol=0.1).ilu(A)
+Mm = array([ M(e) for e in eye(n) ]).T
+assert abs(Mm - Mm.T).max() < 1.0e-12*abs(Mm).max()
+
+# Iterations are counted also when converging at the last allowed iteration
+lsolver = LinearSolverPCG(precond="jacobi", maxiter=1, warm_start=False, adaptive=False)
+lsolver.set_matrix(scipy.sparse.diags([1.0, 2.0, 3.0]))
+x = lsolver.solve(array([1.0, 1.0, 1.0]))
+assert abs(x - [1.0, 0.5, 1.0/3.0]).max() < 1.0e-12
+assert lsolver.niters == 1
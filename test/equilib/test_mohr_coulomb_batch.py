@@ -0,0 +1,63 @@
+# Include PyFEM libraries
+from pyfem import *
+from pyfem.equilib.mat_model_mohr_coulomb import MatModelMohrCoulomb
+from pyfem.tools.tensor import tensor2
+import numpy
+
+# Batched Mohr-Coulomb return mapping: yield function in terms of p, q and
+# Lode angle, returned stresses and consistent tangent
+numpy.random.seed(2)
+n = 300
+
+mdl = MatModelMohrCoulomb(E=100., nu=0.25, c=0.084, phi=0.5)
+
+def new_state(sig):
+    return { "sig"   : sig.copy(),
+             "eps"   : numpy.zeros((len(sig), 6)),
+             "sig_tr": numpy.zeros((len(sig), 6)),
+             "plast" : numpy.zeros(len(sig)),
+             "ret"   : numpy.zeros(len(sig)) }
+
+def copy_state(state):
+    return dict((k, v.copy()) for k, v in state.items())
+
+# Invariant based yield function equals the principal stress one
+sig = numpy.random.uniform(-1.0, 0.1, (n, 6))
+F   = mdl.yield_func_batch(sig)
+for i in range(n):
+    assert abs(F[i] - mdl.yield_func(tensor2(sig[i]))) < 1.0E-10
+
+# Return mapping from admissible states
+state = new_state(sig)
+mdl.stress_update_batch(state, numpy.zeros((n, 6)))
+state0 = copy_state(state)
+
+deps = numpy.random.uniform(-1.0E-2, 1.0E-2, (n, 6))
+dsig = mdl.stress_update_batch(state, deps)
+rets = numpy.bincount(state["ret"].astype(int), minlength=5)
+assert (rets[1:]>0).all()  # all return types are present
+assert mdl.yield_func_batch(state["sig"]).max() < 1.0E-6
+assert abs(dsig - (state["sig"] - state0["sig"])).max() < 1.0E-12
+
+# Consistent tangent against finite differences
+D = mdl.stiff_batch(state)
+h = 1.0E-8
+for j in range(6):
+    st    = copy_state(state0)
+    deps2 = deps.copy()
+    deps2[:,j] += h
+    mdl.stress_update_batch(st, deps2)
+    same = st["ret"]==state["ret"]
+    err  = abs((st["sig"] - state["sig"])/h - D[:,:,j])[same].max()
+    assert err < 1.0E-4*abs(D).max()
+
+# The ip by ip update gives the same results
+for i in range(0, n, 10):
+    m = MatModelMohrCoulomb(E=100., nu=0.25, c=0.084, phi=0.5)
+    m.sig = tensor2(state0["sig"][i])
+    m.stress_update(deps[i])
+    assert abs(m.sig - state["sig"][i]).max() < 1.0E-12
+    assert m.ret == state["ret"][i]
+    assert abs(m.stiff() - D[i]).max() <= 1.0E-10*abs(D).max()
+
+print "  returns (elastic, plane, edges, apex):", rets
@@ -0,0 +1,54 @@
+# Include PyFEM libraries
+from pyfem import *
+import numpy
+
+# Nodal and element values compared with the extrapolation element by element
+block = Block3D()
+block.make_box([0,0,0], [1,1,0.5])
+block.set_divisions(2,2,2)
+mesh = Mesh(block)
+mesh.set_verbose(False)
+mesh.generate()
+
+dom = Domain(mesh)
+dom.elems.set_elem_model(EqMohrCoulombSolid(c=0.084, phi=0.125, E=100., nu=0.25))
+
+solver = SolverEq(dom, nincs=2)
+solver.set_verbose(False)
+for stage in range(2):
+    dom.nodes.sub(z=0.0).set_bc(ux=0, uy=0, uz=0)
+    dom.nodes.sub(x=[0.0, 1.0]).set_bc(ux=0, uy=0)
+    dom.nodes.sub(y=[0.0, 1.0]).set_bc(ux=0, uy=0)
+    dom.nodes.sub(x=1.0).sub(y=1.0).set_bc(fz=-0.1)
+    solver.solve()
+    if stage == 0:
+        dom.elems[4].elem_model.deactivate()
+
+nodal_vals, nodal_labels, elem_vals, elem_labels = solver.get_nodal_and_elem_vals()
+assert nodal_vals.shape == (len(dom.nodes), len(nodal_labels))
+assert elem_vals.shape  == (len(dom.elems), len(elem_labels))
+
+sums = numpy.zeros(nodal_vals.shape)
+reps = numpy.zeros(nodal_vals.shape)
+for elem in dom.elems:
+    if not elem.elem_model.is_active: continue
+    e_nodal_vals, e_vals = elem.elem_model.get_nodal_and_elem_vals()
+    for label, values in e_nodal_vals.iteritems():
+        for i, node in enumerate(elem.nodes):
+            sums[node.id, nodal_labels.index(label)] += values[i]
+            reps[node.id, nodal_labels.index(label)] += 1
+    for label, value in e_vals.iteritems():
+        assert abs(elem_vals[elem.id, elem_labels.index(label)] - value) <= 1.0E-6*(1.0 + abs(value))
+
+ref = numpy.where(reps > 0, sums/numpy.maximum(reps, 1), 0.0)
+assert numpy.allclose(nodal_vals, ref, rtol=1.0E-5, atol=1.0E-7)
+assert (elem_vals[4] == 0.0).all()
+assert "srJ2D" in nodal_labels and "uz" in nodal_labels
+
+# Values evaluated only around some nodes
+nodes = dom.nodes.sub(z=0.5)
+vals, labels = solver.get_nodal_vals_at(nodes)
+ids = [ node.id for node in nodes ]
+assert sorted(labels) == sorted(nodal_labels)
+for j, label in enumerate(labels):
+    assert numpy.allclose(vals[:,j], nodal_vals[ids, nodal_labels.index(label)], rtol=1.0E-5, atol=1.0E-7)
@@ -0,0 +1,49 @@
+# Include PyFEM libraries
+from pyfem import *
+
+# Pull out of an embedded bar with Mohr-Coulomb joints using serial and
+# parallel element loops
+def solve_pull(nprocs):
+    block = Block3D()
+    block.make_box((0,0,0),(1,6,1))
+    block.set_divisions(1,5,1)
+
+    iblock = BlockInset()
+    iblock.set_coords([ (0.5, 2.045256, 0.2),  (0.5, 6.0 , 0.8)])
+
+    mesh = Mesh()
+    mesh.blocks.append(block)
+    mesh.blocks.append(iblock)
+    mesh.generate()
+
+    domain = Domain()
+    domain.load_mesh(mesh)
+
+    domain.elems.solids.set_elem_model(EqElasticSolid(E=1.E4, nu=0.0))
+    domain.elems.solids.set_state(sxx=-100.0, syy=-100.0, szz=-100.0)
+    domain.elems.lines.set_elem_model(EqElasticTruss(E=1.0E7, A=0.005))
+    domain.elems.joints.set_elem_model(EqMohrCoulombJoint(Ks=100.0E3, Kn=100.0E3, Dm=0.15, C=20.0, phi=0.52))
+
+    hook_node = domain.elems.lines.nodes
+    hook_node.sort_in_y()
+    hook_node = hook_node[-1]
+
+    domain.set_solver(SolverEq())
+    domain.solver.set_scheme("NR")
+    domain.solver.set_parallel(nprocs, chunk_size=2)
+    domain.elems.solids.nodes.set_bc(ux=0.0, uy=0.0, uz=0.0)
+    hook_node.set_bc(fy=60.0)
+    domain.solver.set_incs(4)
+    domain.solver.solve()
+
+    print "  ", domain.solver.get_elem_loop_stats()
+    assert domain.solver.elem_loop.pool is None # workers are closed after the stage
+    U = array([ n.keys["uy"].U for n in domain.nodes ])
+    S = array([ ip.mat_model.sig for ip in domain.elems.joints.ips ])
+    return U, S
+
+U1, S1 = solve_pull(1)
+for nprocs in [2, 3]:
+    U, S = solve_pull(nprocs)
+    assert (U == U1).all()
+    assert (S == S1).all()
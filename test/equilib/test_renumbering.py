@@ -0,0 +1,36 @@
+# Include PyFEM libraries
+from pyfem import *
+
+# Solves a two-block beam with different dof renumbering methods
+def solve_beam(method):
+    block0 = Block3D()
+    block0.make_box([0,0,0], [2,1,1])
+    block0.set_divisions(4,2,2)
+
+    block1 = Block3D()
+    block1.make_box([2,0,0], [4,1,1])
+    block1.set_divisions(4,2,2)
+
+    mesh = Mesh(block0, block1)
+    mesh.generate()
+
+    domain = Domain(mesh)
+    domain.elems.set_elem_model(EqElasticSolid(E=1.0E5, nu=0.3))
+
+    domain.faces.sub(x=0.0).set_bc(ux=0.0, uy=0.0, uz=0.0)
+    domain.faces.sub(x=4.0).set_bc(tz=-1.0)
+
+    domain.set_solver(SolverEq())
+    domain.solver.set_renumbering(method)
+    domain.solver.solve()
+
+    U = array([ n.keys["uz"].U for n in domain.nodes ])
+    return U, domain.solver.renumbering_stats
+
+U0, stats = solve_beam(None)
+for method in ["rcm", "mindegree"]:
+    U, stats = solve_beam(method)
+    assert abs(U - U0).max() < 1.0e-10*abs(U0).max()
+
+    bw0, bw1 = stats["bandwidth"]
+    if method == "rcm": assert bw1 <= bw0
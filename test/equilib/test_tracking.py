@@ -0,0 +1,52 @@
+# Include PyFEM libraries
+from pyfem import *
+import os, json
+
+# Tracked histories written as JSON and flushed incrementally in binary form
+block = Block2D([[0,0], [1,0], [1,1], [0,1]])
+block.set_divisions(4, 4)
+mesh = Mesh(block)
+mesh.set_verbose(False)
+mesh.generate()
+
+dom = Domain(mesh)
+dom.elems.set_elem_model(EqElasticSolid(E=1.0E4, nu=0.25))
+
+solver = SolverEq(dom, nincs=2)
+solver.set_verbose(False)
+solver.set_track_per_inc(True)
+top = dom.nodes.sub(y=1.0)
+top.sort_in_x()
+solver.track(top[-1], "node.npy")
+solver.track(top, "top.npy")
+solver.track(dom.elems[0], "elem.json")
+
+sizes = []
+for stage in range(3):
+    dom.faces.sub(y=0.0).set_bc(ux=0.0, uy=0.0)
+    dom.faces.sub(y=1.0).set_bc(ty=-1.0)
+    solver.solve(write=True)
+    sizes.append(os.path.getsize("node.npy"))
+    chunks = read_chunks("top.npy")
+    assert len(chunks) == 2*(stage+1) # only the new tables are appended
+
+# Binary files hold the same data as the tables
+node = read_table("node.npy")
+assert node.nrows == top[-1].data_table.nrows == 6
+assert (node["uy"] == top[-1].data_table["uy"]).all()
+assert sizes[2] - sizes[1] == sizes[1] - sizes[0] # constant cost per flush
+
+book = read_book("top.npy")
+assert len(book) == len(top.data_book) == 6
+for table0, table1 in zip(top.data_book, book):
+    assert table0["time"] == table1["time"]
+    assert table1["id"].dtype.kind == "i"
+    assert (table0["dist"] == table1["dist"]).all() and (table0["syy"] == table1["syy"]).all()
+assert abs(book[-1]["dist"][-1] - 1.0) < 1.0E-12
+
+# JSON export
+elem = json.load(open("elem.json"))
+assert elem["syy"] == dom.elems[0].data_table["syy"].tolist()
+
+for f in ["node.npy", "top.npy", "elem.json", "output1.vtk", "output2.vtk", "output3.vtk"]:
+    os.remove(f)
@@ -0,0 +1,58 @@
+# Include PyFEM libraries
+from pyfem import *
+import os, re, zlib, numpy
+
+# Binary VTU output compared with the solver values
+def read_vtu_arrays(filename):
+    data = open(filename, "rb").read()
+    head, appended = data.split('<AppendedData encoding="raw">\n_')
+    compressed = "vtkZLibDataCompressor" in head
+    arrays = {}
+    cells  = head[head.index("<CellData>"):head.index("</CellData>")]
+    for tag in re.findall(r'<DataArray [^>]*/>', head):
+        attrs  = dict(re.findall(r'(\w+)="([^"]*)"', tag))
+        name   = ("cell:" if tag in cells else "") + attrs.get("Name", "Points")
+        dtype  = numpy.dtype(attrs["type"].lower())
+        offset = int(attrs["offset"])
+        if compressed:
+            nblocks = int(numpy.frombuffer(appended[offset:offset+8], numpy.uint64)[0])
+            header  = numpy.frombuffer(appended[offset:offset+8*(3+nblocks)], numpy.uint64)
+            pos, raw = offset + 8*(3+nblocks), ""
+            for size in header[3:]:
+                raw += zlib.decompress(appended[pos:pos+int(size)])
+                pos += int(size)
+        else:
+            size = int(numpy.frombuffer(appended[offset:offset+8], numpy.uint64)[0])
+            raw  = appended[offset+8:offset+8+size]
+        arr = numpy.frombuffer(raw, dtype)
+        arrays[name] = arr.reshape(-1, int(attrs["NumberOfComponents"]))
+    return arrays
+
+block = Block2D([[0,0], [1,0], [1,1], [0,1]])
+block.set_divisions(4, 4)
+mesh = Mesh(block)
+mesh.set_verbose(False)
+mesh.generate()
+
+dom = Domain(mesh)
+dom.elems.set_elem_model(EqElasticSolid(E=1.0E4, nu=0.25))
+dom.faces.sub(y=0.0).set_bc(ux=0.0, uy=0.0)
+dom.faces.sub(y=1.0).set_bc(ty=-1.0)
+
+solver = SolverEq(dom)
+solver.set_verbose(False)
+solver.solve()
+nodal_vals, nodal_labels, elem_vals, elem_labels = solver.get_nodal_and_elem_vals()
+
+for compress in (False, True):
+    solver.write_output("vtu_output", format="vtu", compress=compress)
+    arrays = read_vtu_arrays("vtu_output/output1.vtu")
+    assert arrays["Points"].shape == (len(dom.nodes), 3)
+    assert arrays["types"].ravel().tolist() == [9]*len(dom.elems)
+    assert arrays["offsets"].ravel()[-1] == len(arrays["connectivity"])
+    assert (arrays["Disp"][:,1] == [ node.keys["uy"].U for node in dom.nodes ]).all()
+    assert (arrays["sxx"].ravel() == nodal_vals[:, nodal_labels.index("sxx")]).all()
+    assert (arrays["cell:sxx"].ravel() == elem_vals[:len(dom.elems), elem_labels.index("sxx")]).all()
+
+os.remove("vtu_output/output1.vtu")
+os.rmdir("vtu_output")
@@ -0,0 +1,58 @@
+# Include PyFEM libraries
+from pyfem import *
+import os, re, numpy
+
+# Time series output written per increment over two stages
+block = Block2D([[0,0], [1,0], [1,1], [0,1]])
+block.set_divisions(4, 4)
+mesh = Mesh(block)
+mesh.set_verbose(False)
+mesh.generate()
+
+dom = Domain(mesh)
+dom.elems.set_elem_model(EqElasticSolid(E=1.0E4, nu=0.25))
+
+solver = SolverEq(dom, nincs=3)
+solver.set_verbose(False)
+solver.set_output_format("xdmf", per_inc=True, path="xdmf_output")
+
+for stage in range(2):
+    dom.faces.sub(y=0.0).set_bc(ux=0.0, uy=0.0)
+    dom.faces.sub(y=1.0).set_bc(ty=-1.0)
+    solver.solve(write=True) # the frame of the stage end is not repeated
+    if stage == 0:
+        dom.elems[0].elem_model.deactivate()
+        xmf0 = open("xdmf_output/output.xmf").read()
+
+# Frames are appended before the closing tags of the index
+xmf  = open("xdmf_output/output.xmf").read()
+tail = "</Grid>\n</Domain>\n</Xdmf>\n"
+assert xmf0.endswith(tail) and xmf.endswith(tail)
+assert xmf.startswith(xmf0[:-len(tail)])
+frames = re.findall(r'<Grid Name="stage[^>]*>.*?</Grid>', xmf, re.S)
+times  = [ float(t) for t in re.findall(r'<Time Value="([^"]*)"', xmf) ]
+assert len(frames) == 6
+assert all(abs(t - (i+1)/3.0) < 1.0E-12 for i, t in enumerate(times))
+
+# Mesh written again only after the deactivation
+topos = [ re.search(r'<Topology.*?Seek="(\d+)"', f, re.S).group(1) for f in frames ]
+assert len(set(topos[:3])) == 1 and len(set(topos[3:])) == 1 and topos[0] != topos[3]
+assert 'NumberOfElements="15"' in frames[-1]
+
+# Displacements of the last frame
+item = re.search(r'<Attribute Name="Disp".*?Precision="(\d)".*?Seek="(\d+)">', frames[-1], re.S)
+bin  = open("xdmf_output/output.bin", "rb")
+bin.seek(int(item.group(2)))
+disp = numpy.fromstring(bin.read(len(dom.nodes)*3*8), dtype=numpy.float64).reshape(-1, 3)
+bin.close()
+assert (disp[:,1] == [ node.keys["uy"].U for node in dom.nodes ]).all()
+
+os.remove("xdmf_output/output.xmf")
+os.remove("xdmf_output/output.bin")
+
+# No time series with other formats written per increment
+solver.set_output_format("vtk", per_inc=True, path="xdmf_output")
+dom.faces.sub(y=0.0).set_bc(ux=0.0, uy=0.0)
+solver.solve()
+assert os.listdir("xdmf_output") == []
+os.rmdir("xdmf_output")
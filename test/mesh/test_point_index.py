@@ -0,0 +1,34 @@
+# Include PyFEM libraries
+from pyfem import *
+import random
+
+# Point lookups through the spatial index compared with a linear search
+random.seed(1)
+points = CollectionPoint()
+for i in range(500):
+    points.add_new([random.uniform(0, 1.0E-3), random.uniform(0, 1.0E-3), 0.0], border=i%2==0)
+
+def dist(P, X):
+    return ((P.x-X[0])**2 + (P.y-X[1])**2 + (P.z-X[2])**2)**0.5
+
+for P in points:
+    assert points.get_from_all([P.x, P.y, P.z]) is P
+    assert points.get_from_all([P.x + 3.0E-8, P.y, P.z], tol=5.0E-8) is P
+    assert (points.get_from_border([P.x, P.y, P.z]) is P) == (P.id%2 == 0)
+
+for i in range(50):
+    X = [random.uniform(-1.0E-3, 2.0E-3), random.uniform(-1.0E-3, 2.0E-3), 0.0]
+    assert points.get_from_all(X) is None
+    nearest = min(points, key=lambda P: dist(P, X))
+    assert dist(points.get_nearest(X), X) == dist(nearest, X)
+    inside = [ P for P in points if dist(P, X) <= 2.0E-4 ]
+    assert points.get_within(X, 2.0E-4) == inside
+
+# Lines sharing end points
+lines = [ BlockLine([[0,0,0], [1,0,0]]), BlockLine([[1,0,0], [1,1,0]]), BlockLine([[0,0,0], [1,1,0]]) ]
+for line in lines:
+    line.set_divisions(4)
+mesh = Mesh(*lines)
+mesh.set_verbose(False)
+mesh.generate()
+assert len(mesh.points) == 3 + 3*3
@@ -0,0 +1,66 @@
+# Include libraries
+from pyfem import *
+
+# Limit load of a plastic truss with the arc-length method
+mesh = Mesh()
+
+Verts = [
+        {'coord':[ 0.0, 0.0 ], 'tag':'0'},
+        {'coord':[ 1.5, 3.5 ], 'tag':'0'},
+        {'coord':[ 0.0, 5.0 ], 'tag':'0'},
+        {'coord':[ 5.0, 5.0 ], 'tag':'0'}]
+
+Cells = [
+        {'con':[0,1], 'type':LIN2, 'tag':'-1'},
+        {'con':[1,3], 'type':LIN2, 'tag':'-1'},
+        {'con':[0,2], 'type':LIN2, 'tag':'-2'},
+        {'con':[2,3], 'type':LIN2, 'tag':'-2'},
+        {'con':[2,1], 'type':LIN2, 'tag':'-3'}]
+
+mesh.from_data(verts=Verts, cells=Cells)
+
+dom = Domain()
+dom.load_mesh(mesh)
+dom.elems.sub(tag="-1").set_elem_model(EqPlasticTruss(E=200000.0, A=0.004, sig_y=200e3))
+dom.elems.sub(tag="-2").set_elem_model(EqPlasticTruss(E=200000.0, A=0.003, sig_y=200e3))
+dom.elems.sub(tag="-3").set_elem_model(EqPlasticTruss(E=200000.0, A=0.002, sig_y=200e3))
+
+dom.nodes.sub(x=0).sub(y=0).set_bc(ux=0, uy=0)
+dom.nodes.sub(x=5).sub(y=5).set_bc(ux=0, uy=0)
+dom.nodes.sub(x=1.5).sub(y=3.5).set_bc(fy=-150.0)
+
+# Arc steps are solved with NR; the scheme of the solver is kept
+import glob
+nout   = len(glob.glob("output*.vtk"))
+solver = SolverEq(dom, scheme="MNR")
+solver.set_verbose(False)
+solver.solve(to_limit=True)
+assert solver.scheme == "MNR"
+assert len(glob.glob("output*.vtk")) == nout
+
+# Load factor found by bisection of full stages
+lf = solver.limit_factor
+assert abs(lf - 6.6963) < 0.01*6.6963
+
+# Load factors increase along the path up to the limit point
+lams = [ h[0] for h in solver.inc_history ]
+assert max(lams) == lf
+assert all(l1 > l0 for l0, l1 in zip(lams[:-2], lams[1:-1]))
+
+# A singular stiffness at the first predictor is reported as is
+mesh = Mesh()
+mesh.from_data(verts=Verts[:2], cells=Cells[:1])
+dom = Domain()
+dom.load_mesh(mesh)
+dom.elems.set_elem_model(EqPlasticTruss(E=200000.0, A=0.004, sig_y=200e3))
+dom.nodes.sub(x=0).sub(y=0).set_bc(ux=0, uy=0)
+dom.nodes.sub(x=1.5).sub(y=3.5).set_bc(fx=-150.0)
+
+solver = SolverEq(dom, scheme="MNR")
+solver.set_verbose(False)
+try:
+    solver.solve(to_limit=True)
+    assert False
+except RuntimeError:
+    pass
+assert solver.scheme == "MNR"